@@ -2,129 +2,117 @@
 Machine Learning Continuous Improvement Module
 ================================================
 Learns from actual project outcomes to improve future estimates
+
+Training data lives in an ml_training_store.TrainingStore (loaded once per
+process, append-only JSONL + memory-mapped feature matrix).
+
+Model artifacts are versioned: each save writes models/cost_estimator_ml.vNNNN.pkl
+and then replaces models/cost_estimator_ml.pkl (the served model) with the same
+bytes via a temp file + os.replace, so a reader never sees a half-written
+pickle. Artifacts carry their version, feature names and training row count;
+an artifact built for a different feature set is refused.
+
+Knobs (environment):
+  ML_MODEL_KEEP   default 5 versioned artifacts kept (0 = keep all)
 """
 
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-import json
+import glob
+import threading
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 import pickle
 
+from ml_training_store import FEATURE_NAMES, TrainingStore, feature_matrix, get_training_store, project_features
+
+ARTIFACT_FORMAT = 2
+# Rows scored per model.predict call in predict_batch / iter_predict_batch
+BATCH_CHUNK_ROWS = 10_000
+
 class CostEstimatorML:
     """ML model for cost estimation with continuous learning"""
     
-    def __init__(self, model_path='models/cost_estimator_ml.pkl'):
+    def __init__(self, model_path='models/cost_estimator_ml.pkl', store: Optional[TrainingStore] = None):
         self.model_path = model_path
         self.model = None
         self.scaler = StandardScaler()
         self.training_history = []
+        self.model_version = 0
+        self._model_stamp = None
+        self._swap_lock = threading.Lock()
+        self.store = store if store is not None else get_training_store()
         self.load_model()
     
     def extract_features(self, project_data: Dict) -> np.array:
         """Extract features from project data for ML model"""
-        features = [
-            project_data.get('area_sf', 0),
-            project_data.get('bedrooms', 0),
-            project_data.get('bathrooms', 0),
-            project_data.get('garage_bays', 0),
-            project_data.get('wall_height', 10),
-            project_data.get('perimeter_lf', 0),
-            project_data.get('roof_area_sf', 0),
-            project_data.get('windows', 0),
-            project_data.get('doors', 0),
-            
-            # Quality indicators (0-3 scale)
-            self._quality_to_numeric(project_data.get('finish_quality', 'standard')),
-            self._complexity_to_numeric(project_data.get('design_complexity', 'moderate')),
-            self._project_type_to_numeric(project_data.get('project_type', 'residential')),
-            
-            # Special features (binary)
-            1 if project_data.get('has_pool', False) else 0,
-            1 if project_data.get('has_elevator', False) else 0,
-            1 if project_data.get('has_smart_home', False) else 0,
-            
-            # Location factors
-            project_data.get('stories', 1),
-            project_data.get('year', datetime.now().year),
-        ]
-        
-        return np.array(features).reshape(1, -1)
+        return np.array(project_features(project_data), dtype=np.float64).reshape(1, -1)
     
-    def _quality_to_numeric(self, quality: str) -> int:
-        mapping = {'economy': 0, 'standard': 1, 'premium': 2, 'luxury': 3}
-        return mapping.get(quality, 1)
-    
-    def _complexity_to_numeric(self, complexity: str) -> int:
-        mapping = {'simple': 0, 'moderate': 1, 'complex': 2, 'luxury': 3}
-        return mapping.get(complexity, 1)
-    
-    def _project_type_to_numeric(self, ptype: str) -> int:
-        return 1 if ptype == 'commercial' else 0
+    def train(self, projects: Optional[List[Dict]] = None):
+        """Train/retrain model on project data (default: the training store)"""
+        if projects is None:
+            projects = self.store.records()
+            X = np.array(self.store.features())
+            y = self.store.targets()
+        else:
+            X = np.array([project_features(p) for p in projects], dtype=np.float64)
+            y = np.array([p['actual_cost'] for p in projects], dtype=np.float64)
+        
+        self.train_arrays(X, y, [p.get('project_name') for p in projects])
     
-    def train(self, projects: List[Dict]):
-        """Train/retrain model on project data"""
-        if len(projects) < 3:
+    def train_arrays(self, X: np.ndarray, y: np.ndarray, names: List[str], holdout_mape: Optional[float] = None):
+        """Fit on a feature matrix + targets, swap the new model in and save it
+        
+        holdout_mape: validation MAPE of this configuration on unseen rows
+        (ml_retrain), kept in the history for the next candidate to beat.
+        """
+        if len(y) < 3:
             print("⚠️  Need at least 3 projects to train ML model")
             return
         
-        # Extract features and targets
-        X = []
-        y = []
-        
-        for project in projects:
-            features = self.extract_features(project)
-            X.append(features[0])
-            y.append(project['actual_cost'])
-        
-        X = np.array(X)
-        y = np.array(y)
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Train ensemble model
-        self.model = GradientBoostingRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=4,
-            random_state=42
-        )
-        
-        self.model.fit(X_scaled, y)
+        model, scaler = fit_model(X, y)
         
         # Calculate training accuracy
-        predictions = self.model.predict(X_scaled)
-        mape = np.mean(np.abs((y - predictions) / y)) * 100
+        mape = mape_pct(y, model.predict(scaler.transform(X)))
         
-        print(f"✅ Model trained on {len(projects)} projects")
+        print(f"✅ Model trained on {len(y)} projects")
         print(f"   Training MAPE: {mape:.1f}%")
         
+        with self._swap_lock:
+            self.model, self.scaler = model, scaler
+        
         # Save training history
         self.training_history.append({
             'timestamp': datetime.now().isoformat(),
-            'num_projects': len(projects),
+            'num_projects': len(y),
             'mape': float(mape),
-            'projects': [p['project_name'] for p in projects]
+            'holdout_mape': holdout_mape,
+            'projects': list(names)
         })
         
         self.save_model()
     
+    def served(self) -> Tuple[object, StandardScaler]:
+        """(model, scaler) as one consistent pair, even while a reload swaps them"""
+        with self._swap_lock:
+            return self.model, self.scaler
+    
     def predict(self, project_data: Dict) -> Tuple[float, Dict]:
         """Predict cost for new project"""
-        if self.model is None:
+        model, scaler = self.served()
+        if model is None:
             return None, {'error': 'Model not trained yet'}
         
         features = self.extract_features(project_data)
-        features_scaled = self.scaler.transform(features)
+        features_scaled = scaler.transform(features)
         
-        prediction = self.model.predict(features_scaled)[0]
+        prediction = model.predict(features_scaled)[0]
         
         # Estimate confidence based on training data similarity
         confidence = self._estimate_confidence(features, project_data)
@@ -132,9 +120,28 @@ class CostEstimatorML:
         return prediction, {
             'confidence': confidence,
             'method': 'machine_learning',
-            'model_version': len(self.training_history)
+            'model_version': self.model_version
         }
     
+    def predict_batch(self, projects: List[Dict]) -> Tuple[np.ndarray, List[str]]:
+        """Predict cost for many projects: one feature matrix, one scale, one model.predict"""
+        model, scaler = self.served()
+        if model is None:
+            raise ValueError('Model not trained yet')
+        X = feature_matrix(projects)
+        predictions = model.predict(scaler.transform(X)) if len(projects) else np.empty(0)
+        return predictions, confidence_labels(X[:, 0])
+    
+    def iter_predict_batch(self, projects: List[Dict], chunk_rows: int = BATCH_CHUNK_ROWS):
+        """predict_batch in chunks: yields (offset, predictions, confidences) per chunk"""
+        model, scaler = self.served()
+        if model is None:
+            raise ValueError('Model not trained yet')
+        chunk_rows = max(1, int(chunk_rows))
+        for start in range(0, len(projects), chunk_rows):
+            X = feature_matrix(projects[start:start + chunk_rows])
+            yield start, model.predict(scaler.transform(X)), confidence_labels(X[:, 0])
+    
     def _estimate_confidence(self, features: np.array, project_data: Dict) -> str:
         """Estimate prediction confidence"""
         # Simple heuristic based on project characteristics
@@ -152,73 +159,151 @@ class CostEstimatorML:
         """Incremental learning from new actual cost"""
         project_data['actual_cost'] = actual_cost
         
-        # Load existing training data
-        training_data = self.load_training_data()
-        training_data.append(project_data)
-        
-        # Retrain model
-        self.train(training_data)
-        
-        # Save updated training data
-        self.save_training_data(training_data)
+        # Append to the training store, then retrain on all of it
+        total = self.store.append([project_data])
+        self.train()
         
         print(f"✅ Model updated with {project_data.get('project_name', 'project')}")
-        print(f"   Total training examples: {len(training_data)}")
+        print(f"   Total training examples: {total}")
+    
+    def _versioned_path(self, version: int) -> str:
+        root, ext = os.path.splitext(self.model_path)
+        return f"{root}.v{version:04d}{ext}"
+    
+    def _existing_versions(self) -> List[int]:
+        root, ext = os.path.splitext(self.model_path)
+        versions = []
+        for path in glob.glob(f"{glob.escape(root)}.v*{ext}"):
+            tag = path[len(root) + 2:len(path) - len(ext)]
+            if tag.isdigit():
+                versions.append(int(tag))
+        return sorted(versions)
     
     def save_model(self):
-        """Save trained model to disk"""
-        os.makedirs('models', exist_ok=True)
+        """Save trained model to disk as a new version and make it the served model"""
+        os.makedirs(os.path.dirname(self.model_path) or '.', exist_ok=True)
         
-        with open(self.model_path, 'wb') as f:
-            pickle.dump({
-                'model': self.model,
-                'scaler': self.scaler,
-                'history': self.training_history
-            }, f)
+        versions = self._existing_versions()
+        version = max([self.model_version] + versions) + 1
+        payload = pickle.dumps({
+            'format': ARTIFACT_FORMAT,
+            'version': version,
+            'created': datetime.now().isoformat(),
+            'feature_names': list(FEATURE_NAMES),
+            'n_training': self.training_history[-1]['num_projects'] if self.training_history else 0,
+            'model': self.model,
+            'scaler': self.scaler,
+            'history': self.training_history
+        })
+        _atomic_write(self._versioned_path(version), payload)
+        _atomic_write(self.model_path, payload)
+        self.model_version = version
+        self._model_stamp = _stamp(self.model_path)
+        
+        keep = int(os.environ.get('ML_MODEL_KEEP', '5'))
+        if keep > 0:
+            for old in (versions + [version])[:-keep]:
+                try:
+                    os.remove(self._versioned_path(old))
+                except OSError:
+                    pass
         
-        print(f"💾 Model saved to {self.model_path}")
+        print(f"💾 Model v{version} saved to {self.model_path}")
     
-    def load_model(self):
-        """Load trained model from disk"""
-        if os.path.exists(self.model_path):
-            with open(self.model_path, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.scaler = data['scaler']
-                self.training_history = data['history']
-            print(f"✅ Model loaded from {self.model_path}")
-        else:
+    def load_model(self, path: Optional[str] = None) -> bool:
+        """Load the served model (or a specific artifact) from disk; True if loaded"""
+        path = path or self.model_path
+        if not os.path.exists(path):
             print("ℹ️  No saved model found, will train from scratch")
+            return False
+        stamp = _stamp(path)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            names = data.get('feature_names')
+            if names is not None and list(names) != list(FEATURE_NAMES):
+                raise ValueError(f"artifact features {names} don't match {list(FEATURE_NAMES)}")
+        except Exception as e:
+            print(f"⚠️  Could not load model from {path}: {e}")
+            return False
+        history = data.get('history', [])
+        with self._swap_lock:
+            self.model, self.scaler = data['model'], data['scaler']
+            self.training_history = history
+            self.model_version = int(data.get('version', len(history)))
+        if path == self.model_path:
+            self._model_stamp = stamp
+        print(f"✅ Model v{self.model_version} loaded from {path}")
+        return True
+    
+    def reload_if_changed(self) -> bool:
+        """Reload the served model if another process replaced it; True if reloaded"""
+        if _stamp(self.model_path) == self._model_stamp:
+            return False
+        return self.load_model()
     
     def save_training_data(self, data: List[Dict]):
         """Save training data"""
-        os.makedirs('data', exist_ok=True)
-        with open('data/training_projects.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        self.store.replace(data)
     
     def load_training_data(self) -> List[Dict]:
         """Load training data"""
-        if os.path.exists('data/training_projects.json'):
-            with open('data/training_projects.json', 'r') as f:
-                return json.load(f)
-        return []
+        return self.store.records()
     
     def get_feature_importance(self) -> Dict[str, float]:
         """Get feature importance from trained model"""
         if self.model is None:
             return {}
         
-        feature_names = [
-            'area_sf', 'bedrooms', 'bathrooms', 'garage_bays', 'wall_height',
-            'perimeter_lf', 'roof_area_sf', 'windows', 'doors',
-            'finish_quality', 'design_complexity', 'project_type',
-            'has_pool', 'has_elevator', 'has_smart_home',
-            'stories', 'year'
-        ]
-        
         importances = self.model.feature_importances_
         
-        return dict(zip(feature_names, importances))
+        return dict(zip(FEATURE_NAMES, importances))
+
+
+def fit_model(X: np.ndarray, y: np.ndarray) -> Tuple[GradientBoostingRegressor, StandardScaler]:
+    """Fresh scaler + gradient-boosting model fitted on (X, y)"""
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    model = GradientBoostingRegressor(
+        n_estimators=100,
+        learning_rate=0.1,
+        max_depth=4,
+        random_state=42
+    )
+    model.fit(X_scaled, y)
+    return model, scaler
+
+
+def mape_pct(y: np.ndarray, predictions: np.ndarray) -> float:
+    """Mean absolute percentage error, in percent"""
+    return float(np.mean(np.abs((y - predictions) / y)) * 100)
+
+
+def confidence_labels(areas: np.ndarray) -> List[str]:
+    """Vectorized _estimate_confidence: 'high' within 3000-7000 SF, 'medium' within 2000-8000, else 'low'"""
+    areas = np.asarray(areas, dtype=np.float64)
+    labels = np.where((areas >= 3000) & (areas <= 7000), 'high',
+                      np.where((areas >= 2000) & (areas <= 8000), 'medium', 'low'))
+    return labels.tolist()
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _atomic_write(path: str, payload: bytes):
+    """Write to a temp file next to `path`, fsync, then os.replace onto it"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
 
 def initialize_with_known_projects():
@@ -0,0 +1,249 @@
+"""
+Background Retraining for CostEstimatorML
+=========================================
+/train used to retrain and pickle the model inside the request handler, so its
+latency grew with the project history and concurrent posts raced on
+models/cost_estimator_ml.pkl. RetrainScheduler splits that up:
+
+- submit(projects): appends to the training store and returns; nothing else
+  happens on the request path.
+- A scheduler thread waits for submissions to go quiet (debounce_s after the
+  last one, but no longer than max_wait_s after the first pending one), then
+  runs one retrain for everything appended so far. Submissions that arrive
+  while a retrain runs are picked up by the next one.
+- The retrain runs in a separate process (train_candidate): it fits a
+  candidate on the snapshot minus a seeded holdout and measures its holdout
+  MAPE. The served model was trained on most of those rows, so it isn't scored
+  on them; instead every artifact records the holdout MAPE it was validated
+  with, and a candidate worse than that * (1 + tolerance) and by more than
+  min_delta MAPE points is rejected.
+  Otherwise the model is refitted on all rows and saved, with its holdout
+  MAPE, as a new versioned artifact (atomic replace of the served pickle).
+- The parent then hot-swaps the new artifact in (CostEstimatorML.reload_if_changed).
+
+Only one retrain runs at a time, so artifact writes never race.
+
+Knobs (environment):
+  ML_RETRAIN_DEBOUNCE_S   default 30
+  ML_RETRAIN_MAX_WAIT_S   default 300
+  ML_RETRAIN_HOLDOUT      default 0.2 (fraction of rows held out; needs >= 10 rows)
+  ML_RETRAIN_TOLERANCE    default 0.10 (candidate holdout MAPE may exceed served by 10%)
+  ML_RETRAIN_MIN_DELTA    default 1.0 (MAPE points; smaller regressions are noise)
+  ML_RETRAIN_PROCESS      "false" = retrain on the scheduler thread instead of a child process
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from ml_continuous_improvement import CostEstimatorML, fit_model, mape_pct
+from ml_training_store import TrainingStore
+
+# Below this many rows every candidate is accepted (no meaningful holdout)
+MIN_HOLDOUT_ROWS = 10
+
+
+def train_candidate(model_path: str, data_dir: str, rows: int, holdout: float = 0.2,
+                    tolerance: float = 0.10, min_delta: float = 1.0, seed: int = 42) -> Dict[str, Any]:
+    """Validate and (if accepted) save a model trained on the first `rows` store rows.
+
+    Runs in the retrain process; returns a JSON-friendly result dict.
+    """
+    store = TrainingStore(data_dir, read_only=True)
+    rows = min(rows, store.count())
+    X = np.array(store.features()[:rows])
+    y = store.targets()[:rows]
+    names = [p.get('project_name') for p in store.records()[:rows]]
+    current = CostEstimatorML(model_path=model_path, store=store)
+    result: Dict[str, Any] = {'rows': rows, 'served_version': current.model_version, 'accepted': False}
+    if rows < 3:
+        result['reason'] = 'fewer than 3 projects'
+        return result
+
+    candidate_mape = None
+    n_hold = int(rows * holdout) if rows >= MIN_HOLDOUT_ROWS else 0
+    if n_hold:
+        order = np.random.default_rng(seed).permutation(rows)
+        hold, train = order[:n_hold], order[n_hold:]
+        model, scaler = fit_model(X[train], y[train])
+        candidate_mape = mape_pct(y[hold], model.predict(scaler.transform(X[hold])))
+        result['holdout_rows'] = int(n_hold)
+        result['candidate_mape'] = round(candidate_mape, 3)
+        served_mape = current.training_history[-1].get('holdout_mape') if current.training_history else None
+        if current.model is not None and served_mape is not None:
+            result['served_mape'] = round(served_mape, 3)
+            if candidate_mape > served_mape * (1 + tolerance) and candidate_mape - served_mape > min_delta:
+                result['reason'] = 'holdout MAPE regressed'
+                return result
+
+    current.train_arrays(X, y, names, holdout_mape=candidate_mape)
+    result['accepted'] = True
+    result['version'] = current.model_version
+    return result
+
+
+class RetrainScheduler:
+    """Debounced background retraining with validation and hot swap."""
+
+    def __init__(self, ml_model: CostEstimatorML, debounce_s: float = 30.0, max_wait_s: float = 300.0,
+                 holdout: float = 0.2, tolerance: float = 0.10, min_delta: float = 1.0,
+                 use_process: bool = True) -> None:
+        self.ml_model = ml_model
+        self.debounce_s = max(0.0, float(debounce_s))
+        self.max_wait_s = max(self.debounce_s, float(max_wait_s))
+        self.holdout = holdout
+        self.tolerance = tolerance
+        self.min_delta = min_delta
+        self.use_process = use_process
+        self._cond = threading.Condition()
+        self._pending_since: Optional[float] = None
+        self._last_submit = 0.0
+        self._running = False
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.runs = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.last: Optional[Dict[str, Any]] = None
+
+    # -------------------- PRODUCER --------------------
+
+    def submit(self, projects: Iterable[Dict[str, Any]]) -> int:
+        """Append projects to the training store and schedule a retrain; returns the row count."""
+        total = self.ml_model.store.append(projects)
+        with self._cond:
+            now = time.monotonic()
+            self._last_submit = now
+            if self._pending_since is None:
+                self._pending_since = now
+            self._cond.notify_all()
+        self._ensure_thread()
+        return total
+
+    def run_now(self) -> None:
+        """Retrain as soon as the scheduler is free, skipping the debounce."""
+        with self._cond:
+            self._pending_since = self._last_submit = time.monotonic() - self.max_wait_s
+            self._cond.notify_all()
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="ml-retrain", daemon=True)
+                self._thread.start()
+
+    # -------------------- SCHEDULER --------------------
+
+    def _due_in(self) -> Optional[float]:
+        if self._pending_since is None:
+            return None
+        due = min(self._last_submit + self.debounce_s, self._pending_since + self.max_wait_s)
+        return max(0.0, due - time.monotonic())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop:
+                    delay = self._due_in()
+                    if delay == 0.0:
+                        break
+                    self._cond.wait(delay)
+                if self._stop:
+                    return
+                self._pending_since = None
+                self._running = True
+            try:
+                self._retrain_once()
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+    def _retrain_once(self) -> None:
+        store = self.ml_model.store
+        args = (self.ml_model.model_path, store.data_dir, store.count(), self.holdout, self.tolerance,
+                self.min_delta)
+        t0 = time.perf_counter()
+        try:
+            if self.use_process:
+                result = self._pool().submit(train_candidate, *args).result()
+            else:
+                result = train_candidate(*args)
+        except Exception as e:
+            self.errors += 1
+            result = {'accepted': False, 'error': str(e)}
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None
+        else:
+            if result.get('accepted'):
+                self.accepted += 1
+                self.ml_model.reload_if_changed()
+            else:
+                self.rejected += 1
+                print(f"⚠️  Retrain candidate rejected: {result.get('reason')}")
+        self.runs += 1
+        result['seconds'] = round(time.perf_counter() - t0, 3)
+        self.last = result
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: a fork of a threaded server process can inherit held locks
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    # -------------------- CONTROL --------------------
+
+    def flush(self, timeout: float = 60.0) -> bool:
+        """Wait until nothing is pending or running (True) or `timeout` passes (False)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending_since is not None or self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = self._pending_since is not None
+            due_in = self._due_in()
+        return {"pending": pending, "due_in_s": round(due_in, 3) if due_in is not None else None,
+                "running": self._running, "runs": self.runs, "accepted": self.accepted,
+                "rejected": self.rejected, "errors": self.errors, "last": self.last,
+                "model_version": self.ml_model.model_version,
+                "debounce_s": self.debounce_s, "max_wait_s": self.max_wait_s}
+
+
+def scheduler_from_env(ml_model: CostEstimatorML) -> RetrainScheduler:
+    """RetrainScheduler for ml_model configured from ML_RETRAIN_* knobs."""
+    return RetrainScheduler(
+        ml_model,
+        debounce_s=float(os.environ.get("ML_RETRAIN_DEBOUNCE_S", "30")),
+        max_wait_s=float(os.environ.get("ML_RETRAIN_MAX_WAIT_S", "300")),
+        holdout=float(os.environ.get("ML_RETRAIN_HOLDOUT", "0.2")),
+        tolerance=float(os.environ.get("ML_RETRAIN_TOLERANCE", "0.10")),
+        min_delta=float(os.environ.get("ML_RETRAIN_MIN_DELTA", "1.0")),
+        use_process=os.environ.get("ML_RETRAIN_PROCESS", "true").lower() != "false",
+    )
@@ -0,0 +1,296 @@
+"""
+ML Training Store
+=================
+In-memory training set for CostEstimatorML, loaded once per process and
+updated in place on every write, instead of re-reading and re-parsing the
+whole project history on each request.
+
+Files (under ML_DATA_DIR):
+  training_projects.jsonl   one project per line, append-only; the source of truth
+  training_features.f64     float64 feature matrix (rows x len(FEATURE_NAMES)),
+                            append-only, opened as a read-only np.memmap
+  training_projects.json    legacy format; migrated to JSONL on first load
+
+The feature file is derived data: if its size doesn't match the JSONL row
+count (crash between the two appends, feature set changed) it is rebuilt.
+A torn last JSONL line (crash mid-write) is skipped.
+
+Another process appending to the JSONL is picked up on the next access
+(mtime/size stamp check); writes from this process refresh the store directly.
+A read_only store (e.g. in the retrain process) never rewrites the feature
+file; if the file is behind the JSONL it computes the matrix in memory.
+
+Knobs (environment):
+  ML_DATA_DIR   default data
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FEATURE_NAMES: Tuple[str, ...] = (
+    'area_sf', 'bedrooms', 'bathrooms', 'garage_bays', 'wall_height',
+    'perimeter_lf', 'roof_area_sf', 'windows', 'doors',
+    'finish_quality', 'design_complexity', 'project_type',
+    'has_pool', 'has_elevator', 'has_smart_home',
+    'stories', 'year',
+)
+
+QUALITY_LEVELS = {'economy': 0, 'standard': 1, 'premium': 2, 'luxury': 3}
+COMPLEXITY_LEVELS = {'simple': 0, 'moderate': 1, 'complex': 2, 'luxury': 3}
+
+JSONL_NAME = 'training_projects.jsonl'
+FEATURES_NAME = 'training_features.f64'
+LEGACY_NAME = 'training_projects.json'
+
+
+def project_features(project: Dict[str, Any]) -> List[float]:
+    """Feature vector for one project, in FEATURE_NAMES order."""
+    return [
+        project.get('area_sf', 0),
+        project.get('bedrooms', 0),
+        project.get('bathrooms', 0),
+        project.get('garage_bays', 0),
+        project.get('wall_height', 10),
+        project.get('perimeter_lf', 0),
+        project.get('roof_area_sf', 0),
+        project.get('windows', 0),
+        project.get('doors', 0),
+
+        # Quality indicators (0-3 scale)
+        QUALITY_LEVELS.get(project.get('finish_quality', 'standard'), 1),
+        COMPLEXITY_LEVELS.get(project.get('design_complexity', 'moderate'), 1),
+        1 if project.get('project_type', 'residential') == 'commercial' else 0,
+
+        # Special features (binary)
+        1 if project.get('has_pool', False) else 0,
+        1 if project.get('has_elevator', False) else 0,
+        1 if project.get('has_smart_home', False) else 0,
+
+        # Location factors
+        project.get('stories', 1),
+        project.get('year', datetime.now().year),
+    ]
+
+
+# Column-wise form of project_features: (FEATURE_NAMES key, default, value -> number)
+_COLUMNS: Tuple[Tuple[str, Any, Any], ...] = (
+    ('area_sf', 0, None), ('bedrooms', 0, None), ('bathrooms', 0, None), ('garage_bays', 0, None),
+    ('wall_height', 10, None), ('perimeter_lf', 0, None), ('roof_area_sf', 0, None),
+    ('windows', 0, None), ('doors', 0, None),
+    ('finish_quality', 'standard', lambda v: QUALITY_LEVELS.get(v, 1)),
+    ('design_complexity', 'moderate', lambda v: COMPLEXITY_LEVELS.get(v, 1)),
+    ('project_type', 'residential', lambda v: 1 if v == 'commercial' else 0),
+    ('has_pool', False, bool), ('has_elevator', False, bool), ('has_smart_home', False, bool),
+    ('stories', 1, None), ('year', None, None),
+)
+
+
+def feature_matrix(projects: List[Dict[str, Any]]) -> np.ndarray:
+    """(len(projects), len(FEATURE_NAMES)) float64 matrix, filled one column at a time.
+
+    Same values as stacking project_features() rows, without building a
+    per-project list.
+    """
+    n = len(projects)
+    out = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+    this_year = datetime.now().year
+    for j, (key, default, convert) in enumerate(_COLUMNS):
+        if default is None:
+            default = this_year
+        values = (p.get(key, default) for p in projects)
+        if convert is not None:
+            values = (convert(v) for v in values)
+        out[:, j] = np.fromiter(values, dtype=np.float64, count=n)
+    return out
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class TrainingStore:
+    """Training projects + feature matrix, loaded once and kept current on append."""
+
+    def __init__(self, data_dir: str = 'data', read_only: bool = False) -> None:
+        self.data_dir = data_dir
+        self.read_only = read_only
+        self.jsonl_path = os.path.join(data_dir, JSONL_NAME)
+        self.features_path = os.path.join(data_dir, FEATURES_NAME)
+        self.legacy_path = os.path.join(data_dir, LEGACY_NAME)
+        self._records: List[Dict[str, Any]] = []
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._loaded = False
+        self._matrix: Optional[np.ndarray] = None
+        self._summary: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+
+    # -------------------- LOAD --------------------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded and _stamp(self.jsonl_path) == self._stamp:
+            return
+        with self._lock:
+            if self._loaded and _stamp(self.jsonl_path) == self._stamp:
+                return
+            if not self.read_only and not os.path.exists(self.jsonl_path) and os.path.exists(self.legacy_path):
+                with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                    self._write_all(json.load(f))
+            records: List[Dict[str, Any]] = []
+            if os.path.exists(self.jsonl_path):
+                with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue
+            self._records = records
+            self._stamp = _stamp(self.jsonl_path)
+            self._summary = _summarize(records)
+            self._matrix = None
+            expected = len(records) * len(FEATURE_NAMES) * 8
+            size = os.path.getsize(self.features_path) if os.path.exists(self.features_path) else None
+            if not self.read_only and size != expected and (records or size is not None):
+                self._write_features(records)
+            self._loaded = True
+            self.loads += 1
+
+    # -------------------- READ --------------------
+
+    def count(self) -> int:
+        self._ensure_loaded()
+        return len(self._records)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Copy of the project list (the dicts themselves are shared; don't mutate them)."""
+        self._ensure_loaded()
+        return list(self._records)
+
+    def features(self) -> np.ndarray:
+        """(rows, len(FEATURE_NAMES)) float64 matrix, memory-mapped read-only."""
+        self._ensure_loaded()
+        with self._lock:
+            if self._matrix is None:
+                rows = len(self._records)
+                needed = rows * len(FEATURE_NAMES) * 8
+                if rows == 0:
+                    self._matrix = np.empty((0, len(FEATURE_NAMES)), dtype=np.float64)
+                elif self.read_only and (not os.path.exists(self.features_path)
+                                         or os.path.getsize(self.features_path) < needed):
+                    self._matrix = feature_matrix(self._records)
+                else:
+                    self._matrix = np.memmap(self.features_path, dtype=np.float64, mode='r',
+                                             shape=(rows, len(FEATURE_NAMES)))
+            return self._matrix
+
+    def targets(self) -> np.ndarray:
+        self._ensure_loaded()
+        return np.fromiter((float(p['actual_cost']) for p in self._records), dtype=np.float64,
+                           count=len(self._records))
+
+    def summary(self) -> Dict[str, Any]:
+        """Running totals for /stats (count, total value, mean cost/SF, count per project type)."""
+        self._ensure_loaded()
+        return dict(self._summary, project_types=dict(self._summary.get('project_types', {})))
+
+    # -------------------- WRITE --------------------
+
+    def append(self, projects: Iterable[Dict[str, Any]]) -> int:
+        """Append projects to the JSONL and feature files; returns the new row count."""
+        if self.read_only:
+            raise RuntimeError(f"training store {self.data_dir} is read-only")
+        projects = list(projects)
+        self._ensure_loaded()
+        with self._lock:
+            if not projects:
+                return len(self._records)
+            os.makedirs(self.data_dir, exist_ok=True)
+            lines = ''.join(json.dumps(p, default=str) + '\n' for p in projects)
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._matrix = None
+            with open(self.features_path, 'ab') as f:
+                f.write(feature_matrix(projects).tobytes())
+            self._records.extend(projects)
+            for p in projects:
+                _add_to_summary(self._summary, p)
+            self._stamp = _stamp(self.jsonl_path)
+            return len(self._records)
+
+    def replace(self, projects: Iterable[Dict[str, Any]]) -> None:
+        """Rewrite the whole store (used by save_training_data)."""
+        if self.read_only:
+            raise RuntimeError(f"training store {self.data_dir} is read-only")
+        projects = list(projects)
+        with self._lock:
+            self._matrix = None
+            self._write_all(projects)
+            self._records = projects
+            self._summary = _summarize(projects)
+            self._stamp = _stamp(self.jsonl_path)
+            self._loaded = True
+
+    def _write_all(self, projects: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        tmp = self.jsonl_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for p in projects:
+                f.write(json.dumps(p, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.jsonl_path)
+        self._write_features(projects)
+
+    def _write_features(self, projects: List[Dict[str, Any]]) -> None:
+        self._matrix = None
+        tmp = self.features_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(feature_matrix(projects).tobytes())
+        os.replace(tmp, self.features_path)
+
+
+def _summarize(projects: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {'total_projects': 0, 'total_value': 0.0, 'sum_cost_per_sf': 0.0,
+                               'project_types': {}}
+    for p in projects:
+        _add_to_summary(summary, p)
+    return summary
+
+
+def _add_to_summary(summary: Dict[str, Any], project: Dict[str, Any]) -> None:
+    cost = float(project.get('actual_cost', 0) or 0)
+    area = float(project.get('area_sf', 0) or 0)
+    summary['total_projects'] += 1
+    summary['total_value'] += cost
+    summary['sum_cost_per_sf'] += cost / area if area else 0.0
+    ptype = project.get('project_type', 'residential')
+    summary['project_types'][ptype] = summary['project_types'].get(ptype, 0) + 1
+
+
+_STORES: Dict[str, TrainingStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_training_store(data_dir: Optional[str] = None) -> TrainingStore:
+    """Process-wide store per data directory (ML_DATA_DIR by default)."""
+    data_dir = data_dir or os.environ.get('ML_DATA_DIR', 'data')
+    with _STORES_LOCK:
+        store = _STORES.get(data_dir)
+        if store is None:
+            store = _STORES[data_dir] = TrainingStore(data_dir)
+        return store
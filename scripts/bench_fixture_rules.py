@@ -0,0 +1,130 @@
+"""
+Benchmark: fixture rule matching on large synthetic plan text.
+
+Generates a rules YAML with N rules (the shipped fixture rules plus synthetic
+word rules) and multi-megabyte plan text, then times:
+  - legacy: parse YAML, re.search per rule, str.count per keyword (per call)
+  - compiled: get_fixture_rules (cached, literal prefilter) + FixtureRules.scan
+
+Writes output/BENCH/FIXTURE_RULES.json.
+
+Usage:
+  python scripts/bench_fixture_rules.py --rules 120 --mb 1 4
+"""
+import argparse
+import json
+import pathlib
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from web.backend.blueprint_parsers.fixture_rules import get_fixture_rules, load_rule_list
+from web.backend.takeoff_engine import TakeoffEngine
+
+OUT_DIR = ROOT / "output" / "BENCH"
+VOCAB = ("wall", "door", "window", "slab", "footing", "header", "stud", "joist", "beam", "note",
+         "typical", "provide", "install", "per", "detail", "section", "elevation", "finish",
+         "which", "where", "sink", "toilet", "lavatory", "shower", "hose bibb", "floor drain")
+
+
+def make_rules(n_rules: int, rng: random.Random) -> tuple:
+    """Shipped rules plus synthetic word rules; returns (rules, synthetic words)."""
+    rules = load_rule_list(str(ROOT / "data" / "fixtures.rules.yaml"))
+    words = []
+    k = 0
+    while len(rules) < n_rules:
+        word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+        rules.append({"pattern": rf"(?i)\b{word}(s)?\b|\b{word}-{k}\b", "trade": "misc",
+                      "item": f"synthetic_{k}", "unit": "ea", "qty": 1})
+        words.append(word)
+        k += 1
+    return rules, words
+
+
+def make_text(n_bytes: int, extra_words: list, rng: random.Random, pages: int = 40) -> list:
+    """Plan-like word soup; a handful of synthetic rule words are mixed in."""
+    words = list(VOCAB) + list(extra_words)
+    per_page = max(1, n_bytes // pages)
+    out = []
+    for _ in range(pages):
+        buf, size = [], 0
+        while size < per_page:
+            w = rng.choice(words)
+            buf.append(w)
+            size += len(w) + 1
+        out.append(" ".join(buf))
+    return out
+
+
+def legacy(rules_path: str, keywords: list, blob: str):
+    with open(rules_path, "r", encoding="utf-8") as f:
+        rules = (yaml.safe_load(f) or {}).get("rules", [])
+    hits = [r for r in rules if r.get("pattern") and re.search(r["pattern"], blob, flags=re.IGNORECASE)]
+    low = blob.lower()
+    return sum(low.count(kw) for kw in keywords), len(hits)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rules", type=int, nargs="+", default=[120])
+    ap.add_argument("--mb", type=float, nargs="+", default=[1.0, 4.0])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = TakeoffEngine.FIXTURE_KEYWORDS
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rules in args.rules:
+            rules_path = pathlib.Path(tmp) / f"rules_{n_rules}.yaml"
+            rules, words = make_rules(n_rules, rng)
+            rules_path.write_text(yaml.safe_dump({"rules": rules}), encoding="utf-8")
+            for mb in args.mb:
+                pages = make_text(int(mb * 1_000_000), words[:10], rng)
+                blob = "\n".join(pages)
+
+                t0 = time.perf_counter()
+                kw_legacy, n_legacy = legacy(str(rules_path), keywords, blob)
+                t_legacy = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                matcher = get_fixture_rules(str(rules_path), keywords)
+                t_compile = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                scan = matcher.scan(pages)
+                t_scan = time.perf_counter() - t0
+
+                row = {
+                    "rules": n_rules,
+                    "text_mb": round(len(blob) / 1e6, 2),
+                    "legacy_s": round(t_legacy, 4),
+                    "compile_s": round(t_compile, 4),
+                    "scan_s": round(t_scan, 4),
+                    "legacy_rules_matched": n_legacy,
+                    "rules_matched": len(scan["rule_hits"]),
+                    "rule_matches": sum(h["count"] for h in scan["rule_hits"]),
+                    "keywords_legacy": kw_legacy,
+                    "keywords": scan["fixtures"],
+                }
+                rows.append(row)
+                print(f"rules={n_rules:4d} text={row['text_mb']:5.2f}MB legacy={t_legacy:6.3f}s "
+                      f"compiled={t_scan:6.3f}s (+{t_compile:.3f}s compile) "
+                      f"matched={row['rules_matched']}/{n_legacy} keywords={scan['fixtures']}/{kw_legacy}")
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = OUT_DIR / "FIXTURE_RULES.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"generated": datetime.now().isoformat(), "results": rows}, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: sequential vs process-pool page extraction.
+
+Generates synthetic vector plan sets (N pages x M segments) and times
+ai_takeoff_pipeline.extract_drawings and TakeoffEngine.extract_geometry for
+each worker count. Writes output/BENCH/PARALLEL_EXTRACTION.json.
+
+Usage:
+  python scripts/bench_parallel_extraction.py --pages 10 50 150 --workers 1 2 4 --segments 2000
+"""
+import argparse
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import fitz  # PyMuPDF
+
+from web.backend.ai_takeoff_pipeline import extract_drawings
+from web.backend.blueprint_parsers.pdf_document import PdfDocument
+from web.backend.takeoff_engine import TakeoffEngine
+
+OUT_DIR = ROOT / "output" / "BENCH"
+
+
+def make_plan_pdf(path: str, pages: int, segments: int) -> None:
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=2592, height=1728)  # 36x24 in sheet
+        shape = page.new_shape()
+        for k in range(segments):
+            x = 20 + (k * 37 + p * 11) % 2500
+            y = 20 + (k * 53) % 1650
+            if k % 2:
+                shape.draw_line((x, y), (x + 40, y))
+            else:
+                shape.draw_line((x, y), (x, y + 40))
+        for k in range(segments // 50):
+            x = 30 + (k * 97) % 2400
+            y = 30 + (k * 61) % 1600
+            shape.draw_rect(fitz.Rect(x, y, x + 60, y + 45))
+        shape.finish(width=0.5)
+        shape.commit()
+    doc.save(path)
+    doc.close()
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, nargs="+", default=[10, 50, 150])
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--segments", type=int, default=2000, help="line segments per page")
+    ap.add_argument("--repeat", type=int, default=2)
+    args = ap.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf_path = os.path.join(tmp, f"plans_{pages}.pdf")
+            make_plan_pdf(pdf_path, pages, args.segments)
+            base = {}
+            for workers in args.workers:
+                t_draw = _timed(lambda: extract_drawings(pdf_path, workers=workers), args.repeat)
+
+                def _geom():
+                    eng = TakeoffEngine(max_pages=pages, workers=workers)
+                    with PdfDocument.from_path(pdf_path) as doc:
+                        _, pg, _ = eng.load_pdf(document=doc)
+                        eng.extract_geometry(pg)
+
+                t_geom = _timed(_geom, args.repeat)
+                base.setdefault("draw", t_draw)
+                base.setdefault("geom", t_geom)
+                row = {
+                    "pages": pages,
+                    "workers": workers,
+                    "extract_drawings_s": round(t_draw, 4),
+                    "extract_geometry_s": round(t_geom, 4),
+                    "speedup_extract_drawings": round(base["draw"] / t_draw, 2) if t_draw else None,
+                    "speedup_extract_geometry": round(base["geom"] / t_geom, 2) if t_geom else None,
+                }
+                rows.append(row)
+                print(f"pages={pages:4d} workers={workers:2d} "
+                      f"extract_drawings={t_draw:8.3f}s (x{row['speedup_extract_drawings']}) "
+                      f"extract_geometry={t_geom:8.3f}s (x{row['speedup_extract_geometry']})")
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = OUT_DIR / "PARALLEL_EXTRACTION.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated": datetime.now().isoformat(),
+            "cpu_count": os.cpu_count(),
+            "segments_per_page": args.segments,
+            "results": rows,
+        }, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
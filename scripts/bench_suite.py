@@ -0,0 +1,392 @@
+"""
+Benchmark suite: takeoff, pricing, assemblies and benchmarking hot paths.
+
+Generates synthetic inputs of controlled size and measures, per case, the best
+wall time over --repeat runs, throughput (units/s) and peak traced memory:
+
+  takeoff.load_pdf+extract_geometry   TakeoffEngine over a synthetic vector PDF
+  extract_drawings                    ai_takeoff_pipeline.extract_drawings (same PDF)
+  estimate_scale_from_walls           double-line room grids (see bench_wall_pairs.py)
+  price_quantities                    N quantity lines, unit costs + vendor quotes
+  expand_from_files                   data/assemblies/*.yaml over N plan-feature sets
+  benchmarking.metrics                N estimate lines + vendor quotes (bootstrap bands)
+  benchmarking.metrics[table]         same, from a pre-built EstimateTable (batch runs)
+  monte_carlo.100k_samples            100k-sample bootstrap with trade shocks over N estimate lines
+  ml.predict_batch                    CostEstimatorML.predict_batch over N projects
+
+Synthetic PDFs are sized by --pages, --segments (lines per page), --rects
+(rectangles per page) and --words (text words per page); --profile picks a
+preset. Peak memory is measured in a separate run under tracemalloc (Python
+and NumPy allocations; MuPDF's C heap is not traced), so timings are not
+slowed by tracing.
+
+Every run is appended to output/BENCH/SUITE_HISTORY.jsonl and written to
+output/BENCH/SUITE_LATEST.json. Comparison mode checks the run against a
+baseline (the previous history entry with the same profile, or a JSON file)
+and exits 1 when a case is slower, or uses more memory, than the baseline by
+more than --threshold.
+
+Usage:
+  python scripts/bench_suite.py --profile small
+  python scripts/bench_suite.py --profile medium --compare                # vs previous run
+  python scripts/bench_suite.py --compare output/BENCH/SUITE_LATEST.json --threshold 0.15
+  python scripts/bench_suite.py --compare-only OLD.json NEW.json
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import fitz  # PyMuPDF
+
+from bench_wall_pairs import make_plan
+from web.backend.ai_takeoff_pipeline import estimate_scale_from_walls, extract_drawings
+from web.backend.assemblies_engine import expand_from_files
+from web.backend.benchmarking import EstimateTable, metrics
+from web.backend.monte_carlo import group_index, shock_covariance, simulate_totals
+from web.backend.blueprint_parsers.pdf_document import PdfDocument
+from web.backend.pricing_engine import price_quantities
+from web.backend.takeoff_engine import TakeoffEngine
+from ml_continuous_improvement import CostEstimatorML
+from ml_training_store import TrainingStore
+
+OUT_DIR = ROOT / "output" / "BENCH"
+HISTORY = OUT_DIR / "SUITE_HISTORY.jsonl"
+LATEST = OUT_DIR / "SUITE_LATEST.json"
+
+PROFILES: Dict[str, Dict[str, int]] = {
+    "small": {"pages": 3, "segments": 2000, "rects": 40, "words": 200,
+              "wall_segments": 20_000, "lines": 2_000, "plans": 200, "est_rows": 500,
+              "ml_rows": 10_000},
+    "medium": {"pages": 20, "segments": 5000, "rects": 100, "words": 800,
+               "wall_segments": 100_000, "lines": 20_000, "plans": 2_000, "est_rows": 5_000,
+               "ml_rows": 100_000},
+    "large": {"pages": 100, "segments": 10000, "rects": 200, "words": 2000,
+              "wall_segments": 500_000, "lines": 100_000, "plans": 10_000, "est_rows": 20_000,
+              "ml_rows": 250_000},
+}
+
+TRADES = ["concrete", "framing", "drywall", "plumbing", "electrical", "hvac", "roofing", "paint"]
+WORDS = ["PLAN", "WALL", "TYP", "SEE", "DETAIL", "GYP", "BD", "SINK", "WC", "LAV", "DOOR", "WINDOW",
+         "NOTE", "SCALE", "ROOM", "BATH", "KITCHEN", "HOSE", "BIBB", "OUTLET"]
+
+
+# -------------------- INPUTS --------------------
+
+def make_plan_pdf(path: str, pages: int, segments: int, rects: int, words: int, seed: int = 0) -> None:
+    """Vector plan set: short H/V strokes, rectangles and word text per 36x24 sheet; scale label on sheet 1."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=2592, height=1728)
+        shape = page.new_shape()
+        for k in range(segments):
+            x, y = rng.uniform(20, 2500), rng.uniform(20, 1650)
+            if k % 2:
+                shape.draw_line((x, y), (x + rng.uniform(10, 80), y))
+            else:
+                shape.draw_line((x, y), (x, y + rng.uniform(10, 80)))
+        for _ in range(rects):
+            x, y = rng.uniform(30, 2400), rng.uniform(30, 1600)
+            shape.draw_rect(fitz.Rect(x, y, x + rng.uniform(20, 120), y + rng.uniform(20, 90)))
+        shape.finish(width=0.5)
+        shape.commit()
+        text = " ".join(rng.choice(WORDS) for _ in range(words))
+        if p == 0:
+            text = "SCALE: 1/4\" = 1'-0\" " + text
+        page.insert_textbox(fitz.Rect(40, 40, 2550, 1700), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def make_quantities(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{"trade": rng.choice(TRADES), "code": f"C{rng.randrange(200)}", "description": "synthetic",
+             "uom": "EA", "qty": rng.uniform(1, 500)} for _ in range(n)]
+
+
+def make_cost_tables(seed: int = 0) -> Dict[str, str]:
+    rng = random.Random(seed)
+    unit = "".join(f"{t},C{c},{rng.uniform(5, 500):.2f}\n" for t in TRADES for c in range(0, 200, 2))
+    vendor = "".join(f"{t},C{c},{rng.uniform(5, 500):.2f}\n" for t in TRADES for c in range(0, 200, 7))
+    return {"unit_costs_csv": "trade,code,unit_cost\n" + unit,
+            "vendor_quotes_csv": "trade,code,unit_cost\n" + vendor}
+
+
+def make_estimate_rows(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        qty, uc = rng.uniform(1, 500), rng.lognormvariate(3.5, 1.0)
+        rows.append({"project_id": "BENCH", "trade": rng.choice(TRADES), "item": f"item_{i % 300}",
+                     "quantity": qty, "unit": "EA", "unit_cost": uc, "line_total": qty * uc, "source": "bench"})
+    return rows
+
+
+def make_ml_projects(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    projects = []
+    for i in range(n):
+        area = rng.uniform(1500, 9000)
+        projects.append({"project_name": f"P{i}", "area_sf": area, "bedrooms": rng.randrange(2, 7),
+                         "bathrooms": rng.randrange(1, 6), "garage_bays": rng.randrange(0, 4),
+                         "wall_height": rng.choice([9, 10, 12]), "perimeter_lf": 4 * area ** 0.5,
+                         "roof_area_sf": area * 1.2, "windows": int(area / 150), "doors": rng.randrange(6, 16),
+                         "finish_quality": rng.choice(["economy", "standard", "premium", "luxury"]),
+                         "design_complexity": rng.choice(["simple", "moderate", "complex", "luxury"]),
+                         "project_type": rng.choice(["residential", "commercial"]),
+                         "has_pool": rng.random() < 0.3, "has_elevator": rng.random() < 0.1,
+                         "has_smart_home": rng.random() < 0.4, "stories": rng.randrange(1, 3), "year": 2025,
+                         "actual_cost": area * rng.uniform(250, 700)})
+    return projects
+
+
+# -------------------- MEASUREMENT --------------------
+
+def _measure(fn: Callable[[], Any], repeat: int, units: float, unit_name: str) -> Dict[str, Any]:
+    fn()  # warm-up: imports, caches, page pool start-up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return {
+        "best_s": round(best, 5),
+        "median_s": round(sorted(times)[len(times) // 2], 5),
+        "units": units,
+        "unit": unit_name,
+        "throughput_per_s": round(units / best, 2) if best > 0 else None,
+        "peak_mem_mb": round(peak / 1e6, 3),
+    }
+
+
+def run_suite(size: Dict[str, int], repeat: int, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    cases: Dict[str, Dict[str, Any]] = {}
+
+    def want(name: str) -> bool:
+        return not only or any(o in name for o in only)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench_plans.pdf")
+        make_plan_pdf(pdf_path, size["pages"], size["segments"], size["rects"], size["words"])
+        pages = size["pages"]
+
+        if want("takeoff.load_pdf+extract_geometry"):
+            def _takeoff() -> None:
+                eng = TakeoffEngine(max_pages=pages)
+                with PdfDocument.from_path(pdf_path) as doc:
+                    _, pg, _ = eng.load_pdf(document=doc)
+                    eng.extract_geometry(pg)
+            cases["takeoff.load_pdf+extract_geometry"] = _measure(_takeoff, repeat, pages, "pages")
+
+        if want("extract_drawings"):
+            cases["extract_drawings"] = _measure(lambda: extract_drawings(pdf_path), repeat,
+                                                 pages * size["segments"], "segments")
+
+    if want("estimate_scale_from_walls"):
+        lines = make_plan(size["wall_segments"])
+        cases["estimate_scale_from_walls"] = _measure(lambda: estimate_scale_from_walls(lines), repeat,
+                                                      len(lines), "segments")
+
+    if want("price_quantities"):
+        quantities = make_quantities(size["lines"])
+        tables = make_cost_tables()
+        cases["price_quantities"] = _measure(
+            lambda: price_quantities(quantities=quantities, policy_yaml=None, region=None, **tables),
+            repeat, len(quantities), "lines")
+
+    if want("expand_from_files"):
+        rng = random.Random(0)
+        yaml_paths = sorted(str(p) for p in (ROOT / "data" / "assemblies").glob("*.yaml"))
+        plans = [{"project_id": f"P{i}", "project_type": "SOD", "area_sqft": rng.uniform(800, 8000),
+                  "fixtures": {"toilet": rng.randrange(1, 6), "sink": rng.randrange(1, 8)}}
+                 for i in range(size["plans"])]
+
+        def _expand() -> None:
+            for plan in plans:
+                expand_from_files(plan, yaml_paths)
+        cases["expand_from_files"] = _measure(_expand, repeat, len(plans), "plans")
+
+    if want("benchmarking.metrics"):
+        rows = make_estimate_rows(size["est_rows"])
+        vendor = [{"trade": t, "item": f"item_{i}", "quoted_total": 1000.0 + i} for i, t in enumerate(TRADES)]
+        features = {"project_id": "BENCH", "area_sqft": 4000.0, "trades_in_plan": TRADES}
+        cases["benchmarking.metrics"] = _measure(lambda: metrics(rows, features, vendor), repeat,
+                                                 len(rows), "rows")
+        table = EstimateTable(rows)
+        cases["benchmarking.metrics[table]"] = _measure(lambda: metrics(table, features, vendor), repeat,
+                                                        len(rows), "rows")
+
+    if want("monte_carlo.100k_samples"):
+        rows = make_estimate_rows(size["est_rows"])
+        ext = [r["line_total"] for r in rows]
+        groups, names = group_index([r["trade"] for r in rows])
+        cov = shock_covariance(0.05, len(names), 0.3)
+        cases["monte_carlo.100k_samples"] = _measure(
+            lambda: simulate_totals(ext, 100_000, 0.075, groups, cov, seed=0), repeat, 100_000, "samples")
+
+    if want("ml.predict_batch"):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TrainingStore(os.path.join(tmp, "data"))
+            store.append(make_ml_projects(200, seed=1))
+            ml = CostEstimatorML(model_path=os.path.join(tmp, "models", "bench.pkl"), store=store)
+            ml.train()
+            projects = make_ml_projects(size["ml_rows"])
+            cases["ml.predict_batch"] = _measure(lambda: ml.predict_batch(projects), repeat,
+                                                 len(projects), "rows")
+    return cases
+
+
+# -------------------- HISTORY / COMPARISON --------------------
+
+def _git_sha() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def load_history() -> List[Dict[str, Any]]:
+    if not HISTORY.exists():
+        return []
+    runs = []
+    with open(HISTORY, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    return runs
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_delta_s: float = 0.002) -> List[Dict[str, Any]]:
+    """
+    Per-case ratios current/baseline for time and peak memory; `regression` marks
+    ratios > 1 + threshold (time regressions smaller than min_delta_s are noise).
+    """
+    rows = []
+    for name, cur in current.get("cases", {}).items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            rows.append({"case": name, "status": "new"})
+            continue
+        row: Dict[str, Any] = {"case": name}
+        for metric in ("best_s", "peak_mem_mb"):
+            b, c = base.get(metric), cur.get(metric)
+            row[f"{metric}_ratio"] = round(c / b, 3) if b and c is not None else None
+        slower = (row["best_s_ratio"] is not None and row["best_s_ratio"] > 1.0 + threshold
+                  and cur["best_s"] - base["best_s"] >= min_delta_s)
+        bigger = row["peak_mem_mb_ratio"] is not None and row["peak_mem_mb_ratio"] > 1.0 + threshold
+        row["status"] = "regression" if (slower or bigger) else "ok"
+        rows.append(row)
+    return rows
+
+
+def _print_comparison(rows: List[Dict[str, Any]], threshold: float) -> bool:
+    regressed = False
+    print(f"\nComparison (threshold +{threshold:.0%}):")
+    for row in rows:
+        if row["status"] == "new":
+            print(f"  {row['case']:38s} new case")
+            continue
+        flag = "REGRESSION" if row["status"] == "regression" else "ok"
+        regressed |= row["status"] == "regression"
+        print(f"  {row['case']:38s} time x{row['best_s_ratio']}  mem x{row['peak_mem_mb_ratio']}  {flag}")
+    return regressed
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    for key in ("pages", "segments", "rects", "words", "wall_segments", "lines", "plans", "est_rows"):
+        ap.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key, help=f"override the profile's {key}")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    ap.add_argument("--compare", nargs="?", const="previous", metavar="BASELINE",
+                    help="'previous' (default) = last history run with the same profile, or a result JSON file")
+    ap.add_argument("--compare-only", nargs=2, metavar=("BASELINE", "CURRENT"),
+                    help="compare two stored result JSON files without running")
+    ap.add_argument("--threshold", type=float, default=0.20, help="allowed slowdown/memory growth (0.20 = 20%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    ap.add_argument("--no-record", action="store_true", help="don't append this run to the history")
+    args = ap.parse_args()
+
+    if args.compare_only:
+        rows = compare(_load_json(args.compare_only[0]), _load_json(args.compare_only[1]), args.threshold,
+                       args.min_delta_ms / 1000.0)
+        sys.exit(1 if _print_comparison(rows, args.threshold) else 0)
+
+    size = dict(PROFILES[args.profile])
+    size.update({k: v for k, v in vars(args).items() if k in size and v is not None})
+
+    baseline = None
+    if args.compare == "previous":
+        same = [r for r in load_history() if r.get("profile") == args.profile and r.get("size") == size]
+        baseline = same[-1] if same else None
+        if baseline is None:
+            print("No previous run with this profile/size; recording a baseline only.")
+    elif args.compare:
+        baseline = _load_json(args.compare)
+
+    cases = run_suite(size, args.repeat, args.only)
+    for name, c in cases.items():
+        print(f"{name:38s} best={c['best_s']:9.4f}s  {c['throughput_per_s']:>12} {c['unit']}/s  "
+              f"peak={c['peak_mem_mb']:9.2f} MB")
+
+    result = {
+        "generated": datetime.now().isoformat(),
+        "git_sha": _git_sha(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "profile": args.profile,
+        "size": size,
+        "repeat": args.repeat,
+        "cases": cases,
+    }
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LATEST, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    if not args.no_record:
+        with open(HISTORY, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    print(f"Wrote {LATEST}" + ("" if args.no_record else f" and appended to {HISTORY}"))
+
+    if baseline is not None:
+        rows = compare(baseline, result, args.threshold, args.min_delta_ms / 1000.0)
+        if _print_comparison(rows, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
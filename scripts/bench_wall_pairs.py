@@ -0,0 +1,140 @@
+"""
+Benchmark: wall-pair scale estimation on synthetic plans.
+
+Builds synthetic plan sets of double-line room grids (faces 9 pt apart = 6" at
+1/4"=1'-0") plus short noise strokes, shuffled into arbitrary drawing order,
+and times:
+  - wall_gap_scale (grid-hash pair search over every sheet)
+  - the previous windowed scan (next 80 segments, first 2000 only), for reference
+
+Writes output/BENCH/WALL_PAIRS.json.
+
+Usage:
+  python scripts/bench_wall_pairs.py --segments 10000 100000 500000
+"""
+import argparse
+import json
+import math
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from web.backend.ai_takeoff_pipeline import LineArrays, line_direction, wall_gap_scale
+
+OUT_DIR = ROOT / "output" / "BENCH"
+WALL_GAP_PT = 9.0
+SHEET_W, SHEET_H = 2592.0, 1728.0
+
+
+def _page_walls(rng):
+    """Room grid on one 36x24 sheet: every wall run between crossings is two faces."""
+    xs = np.cumsum(rng.uniform(60, 160, 40))
+    ys = np.cumsum(rng.uniform(60, 160, 30))
+    xs, ys = xs[xs < SHEET_W], ys[ys < SHEET_H]
+    rows = []
+    for x in xs:  # vertical walls
+        for ya, yb in zip(ys[:-1], ys[1:]):
+            rows.append((x, ya, x, yb))
+            rows.append((x + WALL_GAP_PT, ya + WALL_GAP_PT, x + WALL_GAP_PT, yb))
+    for y in ys:  # horizontal walls
+        for xa, xb in zip(xs[:-1], xs[1:]):
+            rows.append((xa, y, xb, y))
+            rows.append((xa + WALL_GAP_PT, y + WALL_GAP_PT, xb, y + WALL_GAP_PT))
+    return np.asarray(rows)
+
+
+def make_plan(n_segments: int, seed: int = 0, noise_per_page: int = 3000) -> LineArrays:
+    """Pages of double-line room grids plus short noise strokes, shuffled per page."""
+    rng = np.random.default_rng(seed)
+    parts, pages, total = [], [], 0
+    page = 1
+    while total < n_segments:
+        walls = _page_walls(rng)
+        n_noise = noise_per_page
+        nx0 = rng.uniform(0, SHEET_W, n_noise)
+        ny0 = rng.uniform(0, SHEET_H, n_noise)
+        ang = rng.uniform(0, math.pi, n_noise)
+        nl = rng.uniform(2, 25, n_noise)
+        noise = np.stack([nx0, ny0, nx0 + nl * np.cos(ang), ny0 + nl * np.sin(ang)], axis=1)
+        rows = np.concatenate([walls, noise])[:n_segments - total]
+        rows = rows[rng.permutation(len(rows))]
+        parts.append(rows)
+        pages.append(np.full(len(rows), page))
+        total += len(rows)
+        page += 1
+    xy = np.concatenate(parts)
+    n = len(xy)
+    return LineArrays(np.concatenate(pages), xy[:, 0], xy[:, 1], xy[:, 2], xy[:, 3],
+                      np.full((n, 3), -1), np.full(n, np.nan))
+
+
+def legacy_window_gaps(lines: LineArrays) -> int:
+    """The previous estimator's pair scan (first 2000 long segments x next 80)."""
+    segs = list(lines[lines.lengths >= 10.0][:2080])
+    gaps = 0
+    for i in range(0, min(len(segs), 2000)):
+        a = segs[i]
+        va = (a.p1[0]-a.p0[0], a.p1[1]-a.p0[1])
+        ang_a = line_direction(va)
+        for j in range(i+1, min(i+80, len(segs))):
+            b = segs[j]
+            vb = (b.p1[0]-b.p0[0], b.p1[1]-b.p0[1])
+            if abs(ang_a - line_direction(vb)) > (math.pi/180.0)*5.0:
+                continue
+            la = math.hypot(*va)
+            nx, ny = -va[1]/la, va[0]/la
+            d = abs((b.p0[0]-a.p0[0])*nx + (b.p0[1]-a.p0[1])*ny)
+            if 1.0 <= d <= 30.0:
+                gaps += 1
+    return gaps
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", type=int, nargs="+", default=[10_000, 50_000, 100_000, 500_000])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    rows = []
+    for n in args.segments:
+        lines = make_plan(n)
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            scale, diag = wall_gap_scale(lines)
+            best = min(best, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        legacy_pairs = legacy_window_gaps(lines)
+        t_legacy = time.perf_counter() - t0
+        row = {
+            "segments": n,
+            "wall_gap_scale_s": round(best, 4),
+            "pairs": diag["pairs"],
+            "gap_mode_pt": diag["gap_histogram"]["mode_pt"],
+            "paper_in_per_ft": diag.get("paper_in_per_ft"),
+            "legacy_window_s": round(t_legacy, 4),
+            "legacy_window_pairs": legacy_pairs,
+        }
+        rows.append(row)
+        print(f"segments={n:7d} grid={best:7.3f}s pairs={row['pairs']:8d} mode={row['gap_mode_pt']} "
+              f"scale={row['paper_in_per_ft']} | legacy={t_legacy:6.3f}s pairs={legacy_pairs}")
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = OUT_DIR / "WALL_PAIRS.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated": datetime.now().isoformat(),
+            "wall_gap_pt": WALL_GAP_PT,
+            "results": rows,
+        }, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Load test: replay a request mix against the API and report latency per endpoint.
+
+Targets:
+  in-process (default)   the FastAPI app over httpx.ASGITransport, with its
+                         startup/shutdown events; one event loop, like a single
+                         uvicorn worker
+  --url http://host:port a running server (e.g. local uvicorn or a container)
+
+The mix is a JSONL file, one recorded request per line:
+  {"name": "estimate", "method": "POST", "path": "/v1/estimate", "json": {...},
+   "headers": {...}, "weight": 4, "expect": [200]}
+Entries are replayed in file order, each repeated `weight` times per cycle,
+looping until the run ends (default mix: data/loadtest/mix.sample.jsonl).
+
+Arrival: --rate R sends R requests/s open-loop (arrivals don't wait for
+responses; at most --concurrency in flight). Latency is measured from each
+request's scheduled send time, so time spent queued behind a saturated server
+counts. --rate 0 runs closed-loop: --concurrency clients back to back.
+
+Reports per endpoint (entry name): count, p50/p95/p99/max latency, throughput,
+error rate (status outside `expect`, default 2xx, or transport error) and a
+status histogram. Runs are written to output/BENCH/LOAD_LATEST.json and
+appended to output/BENCH/LOAD_HISTORY.jsonl with git sha, target and mix
+digest. --compare checks against the previous run with the same mix, target
+kind and rate (or a result file) and exits 1 when an endpoint's p95 grows or
+its throughput drops by more than --threshold, or its error rate rises by more
+than --max-error-increase.
+
+Usage:
+  python scripts/load_test.py --rate 20 --duration 30
+  python scripts/load_test.py --url http://127.0.0.1:8000 --rate 50 --duration 60 --compare
+  python scripts/load_test.py --mix recorded.jsonl --rate 0 --concurrency 32 --requests 2000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+OUT_DIR = ROOT / "output" / "BENCH"
+HISTORY = OUT_DIR / "LOAD_HISTORY.jsonl"
+LATEST = OUT_DIR / "LOAD_LATEST.json"
+DEFAULT_MIX = ROOT / "data" / "loadtest" / "mix.sample.jsonl"
+
+
+def load_mix(path: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Mix entries expanded by weight (file order), and the file's sha256."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    entries: List[Dict[str, Any]] = []
+    for n, line in enumerate(raw.decode("utf-8").splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        entry = json.loads(line)
+        if "path" not in entry:
+            raise ValueError(f"{path}:{n}: request needs a path")
+        entry.setdefault("method", "POST" if "json" in entry else "GET")
+        entry.setdefault("name", f"{entry['method']} {entry['path']}")
+        entries.extend([entry] * max(1, int(entry.get("weight", 1))))
+    if not entries:
+        raise ValueError(f"{path}: no requests")
+    return entries, hashlib.sha256(raw).hexdigest()
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[Tuple[float, Optional[int], bool]]] = {}
+
+    def add(self, name: str, latency_s: float, status: Optional[int], ok: bool) -> None:
+        self.samples.setdefault(name, []).append((latency_s, status, ok))
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        def block(rows: List[Tuple[float, Optional[int], bool]]) -> Dict[str, Any]:
+            lat = np.array([r[0] for r in rows]) * 1000.0
+            errors = sum(1 for r in rows if not r[2])
+            statuses: Dict[str, int] = {}
+            for _, status, _ in rows:
+                key = str(status) if status is not None else "transport_error"
+                statuses[key] = statuses.get(key, 0) + 1
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (0.0, 0.0, 0.0)
+            return {
+                "count": len(rows),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(lat.max()), 2) if len(lat) else 0.0,
+                "throughput_rps": round(len(rows) / elapsed_s, 2) if elapsed_s > 0 else None,
+                "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+                "statuses": statuses,
+            }
+
+        endpoints = {name: block(rows) for name, rows in sorted(self.samples.items())}
+        everything = [r for rows in self.samples.values() for r in rows]
+        return {"overall": block(everything) if everything else {}, "endpoints": endpoints}
+
+
+def _expected(entry: Dict[str, Any], status: int) -> bool:
+    expect = entry.get("expect")
+    if expect:
+        return status in expect
+    return 200 <= status < 300
+
+
+async def _send(client: httpx.AsyncClient, entry: Dict[str, Any], scheduled: float,
+                recorder: Recorder, timeout: float) -> None:
+    try:
+        resp = await client.request(entry["method"], entry["path"], json=entry.get("json"),
+                                    headers=entry.get("headers"), timeout=timeout)
+        await resp.aread()
+        status: Optional[int] = resp.status_code
+        ok = _expected(entry, resp.status_code)
+    except Exception:
+        status, ok = None, False
+    recorder.add(entry["name"], time.perf_counter() - scheduled, status, ok)
+
+
+async def drive(client: httpx.AsyncClient, mix: List[Dict[str, Any]], rate: float, duration: Optional[float],
+                total: Optional[int], concurrency: int, timeout: float) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    gate = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    def done(i: int) -> bool:
+        if total is not None and i >= total:
+            return True
+        return duration is not None and time.perf_counter() - start >= duration
+
+    if rate > 0:
+        tasks = []
+
+        async def one(entry: Dict[str, Any], scheduled: float) -> None:
+            async with gate:
+                await _send(client, entry, scheduled, recorder, timeout)
+
+        i = 0
+        while not done(i):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(mix[i % len(mix)], scheduled)))
+            i += 1
+        await asyncio.gather(*tasks)
+    else:
+        counter = iter(range(10 ** 12))
+
+        async def client_loop() -> None:
+            while True:
+                i = next(counter)
+                if done(i):
+                    return
+                await _send(client, mix[i % len(mix)], time.perf_counter(), recorder, timeout)
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return recorder, time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace, mix: List[Dict[str, Any]]) -> Tuple[Recorder, float]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    duration = None if args.requests is not None else args.duration
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+            return await drive(client, mix, args.rate, duration, args.requests, args.concurrency, args.timeout)
+
+    os.chdir(ROOT)  # the app resolves data/ and schemas/ paths from the working directory
+    from web.backend.app_comprehensive import app
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", limits=limits) as client:
+            return await drive(client, mix, args.rate, duration, args.requests, args.concurrency, args.timeout)
+
+
+# -------------------- HISTORY / COMPARISON --------------------
+
+def _git_sha() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _history() -> List[Dict[str, Any]]:
+    if not HISTORY.exists():
+        return []
+    runs = []
+    with open(HISTORY, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+
+def _comparable(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    keys = ("mix_sha256", "target_kind", "rate", "concurrency")
+    return all(a.get(k) == b.get(k) for k in keys)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            max_error_increase: float) -> List[Dict[str, Any]]:
+    rows = []
+    for name, cur in current.get("endpoints", {}).items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            rows.append({"endpoint": name, "status": "new"})
+            continue
+        p95_ratio = round(cur["p95_ms"] / base["p95_ms"], 3) if base.get("p95_ms") else None
+        tput_ratio = (round(cur["throughput_rps"] / base["throughput_rps"], 3)
+                      if base.get("throughput_rps") else None)
+        err_delta = round(cur["error_rate"] - base["error_rate"], 4)
+        regressed = ((p95_ratio is not None and p95_ratio > 1.0 + threshold)
+                     or (tput_ratio is not None and tput_ratio < 1.0 - threshold)
+                     or err_delta > max_error_increase)
+        rows.append({"endpoint": name, "p95_ratio": p95_ratio, "throughput_ratio": tput_ratio,
+                     "error_rate_delta": err_delta, "status": "regression" if regressed else "ok"})
+    return rows
+
+
+def _print_summary(result: Dict[str, Any]) -> None:
+    print(f"\n{'endpoint':24s} {'count':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'rps':>8s} {'errors':>7s}")
+    rows = list(result["endpoints"].items()) + [("ALL", result["overall"])]
+    for name, s in rows:
+        if not s:
+            continue
+        print(f"{name:24s} {s['count']:7d} {s['p50_ms']:8.1f}ms {s['p95_ms']:8.1f}ms {s['p99_ms']:8.1f}ms "
+              f"{s['throughput_rps']:8.1f} {s['error_rate']:7.2%}")
+
+
+def _print_comparison(rows: List[Dict[str, Any]]) -> bool:
+    regressed = False
+    print("\nComparison:")
+    for row in rows:
+        if row["status"] == "new":
+            print(f"  {row['endpoint']:24s} new endpoint")
+            continue
+        regressed |= row["status"] == "regression"
+        print(f"  {row['endpoint']:24s} p95 x{row['p95_ratio']}  throughput x{row['throughput_ratio']}  "
+              f"errors {row['error_rate_delta']:+.2%}  {'REGRESSION' if row['status'] == 'regression' else 'ok'}")
+    return regressed
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mix", default=str(DEFAULT_MIX), help="JSONL request mix")
+    ap.add_argument("--url", help="base URL of a running server; default drives the app in-process")
+    ap.add_argument("--rate", type=float, default=10.0, help="requests/s (open loop); 0 = closed loop")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    ap.add_argument("--requests", type=int, help="stop after this many requests instead of --duration")
+    ap.add_argument("--concurrency", type=int, default=32, help="max requests in flight / closed-loop clients")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--label", help="free-form build label stored with the result")
+    ap.add_argument("--compare", nargs="?", const="previous", metavar="BASELINE",
+                    help="'previous' (default) = last comparable history run, or a result JSON file")
+    ap.add_argument("--threshold", type=float, default=0.20, help="allowed p95 growth / throughput drop")
+    ap.add_argument("--max-error-increase", type=float, default=0.01, help="allowed error-rate increase")
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+
+    mix, mix_sha = load_mix(args.mix)
+    result: Dict[str, Any] = {
+        "generated": datetime.now().isoformat(),
+        "git_sha": _git_sha(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "target": args.url or "in-process",
+        "target_kind": "url" if args.url else "in-process",
+        "mix": os.path.relpath(args.mix, ROOT),
+        "mix_sha256": mix_sha,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration if args.requests is None else None,
+        "requests": args.requests,
+    }
+
+    baseline = None
+    if args.compare == "previous":
+        history = [r for r in _history() if _comparable(r, result)]
+        baseline = history[-1] if history else None
+        if baseline is None:
+            print("No comparable previous run; recording a baseline only.")
+    elif args.compare:
+        baseline = _load_json(args.compare)
+
+    recorder, elapsed = asyncio.run(run(args, mix))
+    result["elapsed_s"] = round(elapsed, 3)
+    result.update(recorder.summary(elapsed))
+    _print_summary(result)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LATEST, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    if not args.no_record:
+        with open(HISTORY, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    print(f"\nWrote {LATEST}" + ("" if args.no_record else f" and appended to {HISTORY}"))
+
+    if baseline is not None and _print_comparison(compare(baseline, result, args.threshold,
+                                                          args.max_error_increase)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from web.backend.assemblies_engine import (
+    AssemblySet, FormulaError, compile_formula, expand_from_files, expand_many_from_files,
+)
+
+DOC = """
+project_types: [SOD]
+variables:
+  wall_sf: "wall_lf * 10"        # uses a variable defined below
+  wall_lf: "area_sqft * 0.08"
+  loop_a: "loop_b + 1"
+  loop_b: "loop_a + 1"
+assemblies:
+  - {trade: siding, item: lap_siding, unit: sf, formula: "wall_sf"}
+  - {trade: windows, item: windows, unit: EA, formula: "max(4, fixture_count * 0.1)"}
+  - {trade: plumbing, item: toilets, unit: EA, formula: "fixtures.get('toilet', 0) * 1"}
+  - {trade: misc, item: cyclic, unit: EA, formula: "loop_a"}
+  - {trade: misc, item: bad, unit: EA, formula: "__import__('os').getcwd()"}
+  - {trade: misc, item: div0, unit: EA, formula: "area_sqft / 0"}
+"""
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / "ext.yaml"
+    path.write_text(DOC, encoding="utf-8")
+    return str(path)
+
+
+def test_formulas_are_whitelisted():
+    assert compile_formula("area_sqft * 0.5 + max(1, fixture_count)").names == {"area_sqft", "fixture_count"}
+    for bad in ("__import__('os')", "().__class__", "open('x')", "[1, 2]", "max(3)", "'a' * 3"):
+        with pytest.raises(FormulaError):
+            compile_formula(bad)
+
+
+def test_expand_resolves_variables_in_dependency_order(rules_path):
+    lines, applied = expand_from_files({"area_sqft": 1000, "fixtures": {"toilet": 2, "sink": 3}}, [rules_path])
+    qty = {l["item"]: l["quantity"] for l in lines}
+    assert qty == {"lap_siding": 800.0, "windows": 4.0, "toilets": 2.0}
+    assert lines[0]["unit"] == "SF"
+    assert applied[0]["computed_quantity"] == 800.0
+    errors = AssemblySet([rules_path]).errors()[rules_path]
+    assert any("cycle" in e for e in errors) and any("assemblies[4]" in e for e in errors)
+    assert expand_from_files({"area_sqft": 1000, "project_type": "commercial"}, [rules_path]) == ([], [])
+
+
+def test_expand_many_matches_expand(rules_path):
+    features = [{"area_sqft": a, "fixtures": {"toilet": a % 7, "sink": 60}, "project_type": pt}
+                for a in range(0, 3000, 37) for pt in ("SOD", "other")]
+    paths = [rules_path, "data/assemblies/interior.yaml", "data/assemblies/exterior.yaml"]
+    assert expand_many_from_files(features, paths) == [expand_from_files(f, paths) for f in features]
+
+
+def test_variable_may_refine_a_plan_feature(tmp_path):
+    path = tmp_path / "refine.yaml"
+    path.write_text("variables:\n  area_sqft: 'area_sqft * 1.1'\n  own: 'own + 1'\n"
+                    "assemblies:\n  - {trade: roofing, item: shingles, unit: SF, formula: 'area_sqft'}\n"
+                    "  - {trade: misc, item: own, unit: EA, formula: 'own'}\n", encoding="utf-8")
+    lines, _ = expand_from_files({"area_sqft": 100}, [str(path)])
+    assert [(l["item"], l["quantity"]) for l in lines] == [("shingles", pytest.approx(110.0))]
+    errors = AssemblySet([str(path)]).errors()[str(path)]
+    assert errors == ["variables: own refers to itself"]
+
+    features = [{"area_sqft": a} for a in (100, 250, 0)]
+    many = expand_many_from_files(features, [str(path)])
+    assert [[l["quantity"] for l in lines] for lines, _ in many] == [[pytest.approx(110.0)], [pytest.approx(275.0)], []]
+    assert many == [expand_from_files(f, [str(path)]) for f in features]
+
+
+def test_compiled_file_reloads_on_change(rules_path):
+    before, _ = expand_from_files({"area_sqft": 100}, [rules_path])
+    with open(rules_path, "w", encoding="utf-8") as f:
+        f.write("assemblies:\n  - {trade: roofing, item: shingles, unit: SF, formula: 'area_sqft * 1.1'}\n")
+    st = os.stat(rules_path)
+    os.utime(rules_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    after, _ = expand_from_files({"area_sqft": 100}, [rules_path])
+    assert [l["item"] for l in before] == ["lap_siding", "windows"]
+    assert after == [{"trade": "roofing", "item": "shingles", "quantity": pytest.approx(110.0), "unit": "SF", "notes": ""}]
@@ -0,0 +1,64 @@
+from web.backend.benchmarking import EstimateTable, _iqr, metrics
+
+
+def _rows():
+    return [
+        {"project_id": "A", "trade": "concrete ", "item": "slab", "quantity": 10, "unit_cost": 10, "line_total": 100},
+        {"project_id": "A", "trade": "concrete", "item": "footing", "quantity": "2", "unit_cost": "12", "line_total": ""},
+        {"project_id": "B", "trade": "framing", "item": "studs", "quantity": 5, "unit_cost": 11, "line_total": 55},
+        {"project_id": "A", "trade": "framing", "item": "beam", "quantity": 1, "unit_cost": 9, "line_total": 9},
+        {"project_id": "B", "trade": "plumbing", "item": "wc", "quantity": 1, "unit_cost": 500, "line_total": 500},
+        {"project_id": "A", "trade": "paint", "item": "walls", "quantity": None, "unit_cost": 0, "line_total": 0},
+    ]
+
+
+def test_metrics_aggregates_from_columns():
+    vendor = [{"trade": "concrete", "item": "slab", "quoted_total": 80},
+              {"trade": "concrete", "item": "footing", "quoted_total": 30},
+              {"trade": "framing", "item": "studs", "quoted_total": 0},
+              {"trade": "hvac", "item": "unit", "quoted_total": 50}]
+    m = metrics(_rows(), {"area_sqft": 100.0, "trades_in_plan": ["concrete", "hvac"]}, vendor,
+                bootstrap_seed=1)
+
+    assert m["totals"] == {"estimate_total": 664.0, "area_sqft": 100.0, "dollars_per_sf": 6.64}
+    assert [(t["trade"], t["subtotal"]) for t in m["trade_breakdown"]] == [
+        ("plumbing", 500.0), ("concrete", 100.0), ("framing", 64.0), ("paint", 0.0)]
+    assert m["outliers"] == []  # 5 priced lines: the upper half still contains 500
+    assert m["coverage"]["missing_trades"] == ["hvac"]
+    assert m["sensitivity"]["unit_costs"] == {"plus10_pct": 756.8, "minus10_pct": 619.2}
+    vendor_m = m["vendor"]
+    assert vendor_m["vendor_total"] == 160.0
+    # slab |100-80|/80, footing |24-30|/30 (line_total blank -> qty * unit_cost), unit |0-50|/50
+    assert vendor_m["MAPE_project"] == round((0.25 + 0.2 + 1.0) / 3 * 100, 2)
+    assert vendor_m["WAPE_by_trade"] == [{"trade": "hvac", "wape": 100.0}, {"trade": "concrete", "wape": 12.73}]
+
+
+def test_prebuilt_table_and_project_split():
+    rows = _rows()
+    table = EstimateTable(rows)
+    assert table.trade_names == ["concrete", "framing", "plumbing", "paint"]
+    assert list(table.extension) == [100.0, 24.0, 55.0, 9.0, 500.0, 0.0]
+    assert metrics(table, {"area_sqft": 100.0}, bootstrap_seed=3) == metrics(rows, {"area_sqft": 100.0},
+                                                                             bootstrap_seed=3)
+
+    parts = table.by_project()
+    assert sorted(parts) == ["A", "B"] and len(parts["A"]) == 4
+    assert parts["B"].trade_names == ["framing", "plumbing"]
+    assert metrics(parts["B"], {"area_sqft": 10.0})["totals"]["estimate_total"] == 555.0
+    assert metrics([], {})["warnings"] == ["estimate_total_is_zero", "no_estimate_lines_loaded",
+                                           "area_sqft_missing_or_zero"]
+
+
+def test_outliers_sorted_by_unit_cost_top_10():
+    rows = [{"trade": "t", "item": f"i{u}", "quantity": 1, "unit_cost": u, "line_total": u} for u in range(10, 19)]
+    rows += [{"trade": " odd", "item": "x", "quantity": 1, "unit_cost": 500.12345, "line_total": 1},
+             {"trade": "t", "item": "low", "quantity": 1, "unit_cost": 0.5, "line_total": 1}]
+    out = metrics(rows, {})["outliers"]
+    assert [(o["trade"], o["item"], o["unit_cost"]) for o in out] == [(" odd", "x", 500.1234), ("t", "low", 0.5)]
+
+
+def test_iqr_matches_half_medians():
+    assert _iqr([]) == (0.0, 0.0, 0.0)
+    assert _iqr([5.0]) == (5.0, 5.0, 0.0)
+    assert _iqr([1, 2, 3, 4, 5, 6, 7]) == (2.0, 6.0, 4.0)
+    assert _iqr([4, 1, 3, 2]) == (1.5, 3.5, 2.0)
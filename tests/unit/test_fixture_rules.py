@@ -0,0 +1,55 @@
+import os
+import re
+
+import pytest
+
+from web.backend.blueprint_parsers.fixture_rules import FixtureRules, get_fixture_rules, required_atoms
+from web.backend.takeoff_engine import TakeoffEngine
+
+RULES = [
+    {"pattern": r"(?i)\bwater closet\b|\btoilet\b|\bwc\b", "trade": "plumbing", "item": "toilet", "unit": "ea", "qty": 1},
+    {"pattern": r"(?i)\blav(atory)?\b|\bsink\b", "trade": "plumbing", "item": "lavatory_sink", "unit": "EA", "qty": 1},
+    {"pattern": r"\d+\s*gal", "trade": "plumbing", "item": "water_heater", "unit": "ea", "qty": 2},
+    {"pattern": r"(unclosed", "item": "bad"},
+    {"trade": "plumbing", "item": "no_pattern"},
+]
+
+
+def test_required_atoms_cover_every_match():
+    assert required_atoms(r"(?i)\bwater closet\b|\btoilet\b|\bwc\b") == {"water closet", "toilet", "wc"}
+    assert required_atoms(r"\bhose bibb?\b|\bhose bib\b") == {"hose bib"}
+    assert required_atoms(r"(abc)?def") == {"def"}
+    assert required_atoms(r"a.*b") is None
+
+
+def test_scan_counts_matches_with_page_positions():
+    rules = FixtureRules(RULES, keywords=TakeoffEngine.FIXTURE_KEYWORDS)
+    assert [r["item"] for r in rules.rules] == ["toilet", "lavatory_sink", "water_heater"]
+    pages = ["Provide toilet (WC) and LAV.", "No fixtures here.", "Sink, 50 gal WH, toilet"]
+    out = rules.scan(pages)
+    hits = {h["item"]: h for h in out["rule_hits"]}
+    assert hits["toilet"]["count"] == 3 and hits["toilet"]["qty"] == 3.0
+    assert hits["toilet"]["pages"] == [1, 3]
+    assert hits["toilet"]["positions"][0] == [1, pages[0].index("toilet")]
+    assert hits["lavatory_sink"]["unit"] == "ea" and hits["lavatory_sink"]["pages"] == [1, 3]
+    assert hits["water_heater"]["qty"] == 2.0 and hits["water_heater"]["positions"] == [[3, 6]]
+    blob = "\n".join(pages)
+    for h in out["rule_hits"]:
+        assert h["count"] == len(re.findall(next(r["pattern"] for r in RULES if r["item"] == h["item"]), blob, re.I))
+    assert out["fixtures"] == sum(blob.lower().count(k) for k in TakeoffEngine.FIXTURE_KEYWORDS)
+
+
+def test_rules_file_hot_reload(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("rules:\n  - pattern: '(?i)\\bshower\\b'\n    item: shower\n", encoding="utf-8")
+    first = get_fixture_rules(str(path))
+    assert get_fixture_rules(str(path)) is first
+    assert first.scan(["SHOWER"])["rule_hits"][0]["item"] == "shower"
+
+    path.write_text("rules:\n  - pattern: '(?i)\\bfloor drain\\b'\n    item: floor_drain\n", encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    second = get_fixture_rules(str(path))
+    assert second is not first
+    assert second.scan(["SHOWER"])["rule_hits"] == []
+    assert second.scan(["floor drain"])["rule_hits"][0]["item"] == "floor_drain"
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+import pytest
+
+from web.backend.job_queue import JobQueue, QueueFull
+
+
+def _wait(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        record = queue.get(job_id)
+        if record and record["status"] in ("succeeded", "failed"):
+            return record
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_runs_handler_and_persists_result(tmp_path):
+    queue = JobQueue(root=str(tmp_path), workers=1)
+
+    def handler(job_dir, params, progress):
+        progress(stage="pages", done=1, total=1)
+        with open(f"{job_dir}/input.pdf", "rb") as f:
+            return {"n": len(f.read()), "project_id": params["project_id"]}
+
+    queue.register("takeoff", handler)
+    record = queue.submit("takeoff", {"project_id": "P-1"}, pdf_bytes=b"%PDF-1.4 test")
+    assert record["status"] == "queued"
+    done = _wait(queue, record["id"])
+    assert done["status"] == "succeeded" and done["attempts"] == 1
+    assert done["progress"] == {"stage": "pages", "done": 1, "total": 1}
+    assert queue.result(record["id"]) == {"n": 13, "project_id": "P-1"}
+
+    # state lives on disk: a fresh queue over the same dir sees the job
+    assert JobQueue(root=str(tmp_path)).get(record["id"])["status"] == "succeeded"
+    queue.shutdown()
+
+
+def test_failed_job_records_error(tmp_path):
+    queue = JobQueue(root=str(tmp_path), workers=1)
+
+    def boom(job_dir, params, progress):
+        raise ValueError("bad plan")
+
+    queue.register("takeoff", boom)
+    job_id = queue.submit("takeoff", {})["id"]
+    done = _wait(queue, job_id)
+    assert done["status"] == "failed" and done["error"] == "bad plan"
+    assert queue.result(job_id) is None
+    assert queue.get("../etc") is None
+    queue.shutdown()
+
+
+def test_recover_requeues_interrupted_jobs(tmp_path):
+    job_dir = tmp_path / "abc123"
+    job_dir.mkdir()
+    (job_dir / "job.json").write_text(json.dumps({
+        "id": "abc123", "kind": "takeoff", "status": "running", "params": {"x": 1},
+        "attempts": 1, "created": "2025-01-01T00:00:00",
+    }))
+    queue = JobQueue(root=str(tmp_path), workers=1)
+    queue.register("takeoff", lambda job_dir, params, progress: {"x": params["x"]})
+    assert queue.recover() == ["abc123"]
+    done = _wait(queue, "abc123")
+    assert done["status"] == "succeeded" and done["attempts"] == 2
+    assert queue.result("abc123") == {"x": 1}
+    queue.shutdown()
+
+
+def test_submit_is_bounded(tmp_path):
+    queue = JobQueue(root=str(tmp_path), workers=1, max_pending=1)
+    release = threading.Event()
+    queue.register("slow", lambda job_dir, params, progress: release.wait(5) and {})
+    first = queue.submit("slow")
+    with pytest.raises(QueueFull):
+        queue.submit("slow")
+    release.set()
+    _wait(queue, first["id"])
+    queue.submit("slow")
+    queue.shutdown()
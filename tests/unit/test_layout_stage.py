@@ -114,3 +114,45 @@ def test_parse_legend_mixed_content():
     assert len(items) == 2
     for expected_item in expected:
         assert expected_item in items
+
+
+def _text_grid_pdf():
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    page.insert_text((60, 80), "SHEET A1 PROJECT: Demo")
+    page.insert_text((450, 400), "WC - Water Closet")
+    page.insert_text((60, 600), "GENERAL NOTES SCALE 1/4\" = 1'-0\"")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_extract_texts_batch_matches_single_bbox_calls():
+    pytest.importorskip("pdfminer")
+    from web.backend.blueprint_parsers.pdf_document import PdfDocument
+    from web.backend.blueprint_parsers.layout_stage import extract_text, extract_texts
+
+    bboxes = [(40, 60, 300, 100), (430, 380, 600, 420), (40, 580, 400, 620), (40, 60, 600, 620), None]
+    with PdfDocument(_text_grid_pdf(), source="<inline-base64>") as document:
+        batch = extract_texts(document, bboxes)
+        single = [extract_text(document, b) if b else "" for b in bboxes]
+    assert batch == single
+    assert "SHEET A1" in batch[0] and "Water Closet" not in batch[0]
+    assert "Water Closet" in batch[1]
+    assert "GENERAL NOTES" in batch[2]
+    assert all(word in batch[3] for word in ("SHEET", "Water", "NOTES"))
+    assert batch[4] == ""
+
+
+def test_extract_region_texts_reads_notes_lists():
+    pytest.importorskip("pdfminer")
+    from web.backend.blueprint_parsers.pdf_document import PdfDocument
+    from web.backend.blueprint_parsers.layout_stage import extract_region_texts
+
+    regions = {"title_block": (40, 60, 300, 100), "notes": [(40, 580, 400, 620), (430, 380, 600, 420)], "legend_x": []}
+    with PdfDocument(_text_grid_pdf(), source="<inline-base64>") as document:
+        texts = extract_region_texts(document, regions)
+    assert "SHEET A1" in texts["title_block"]
+    assert len(texts["notes"]) == 2 and "GENERAL NOTES" in texts["notes"][0]
+    assert texts["legend_x"] == []
@@ -0,0 +1,53 @@
+import pickle
+
+import pytest
+
+from ml_continuous_improvement import CostEstimatorML
+from ml_retrain import RetrainScheduler, train_candidate
+from ml_training_store import TrainingStore
+
+
+def _project(i):
+    area = 2500 + 300 * i
+    return {"project_name": f"P{i}", "area_sf": area, "bedrooms": 3, "bathrooms": 2, "garage_bays": 2,
+            "perimeter_lf": 4 * area ** 0.5, "roof_area_sf": area * 1.2, "windows": 20, "doors": 10,
+            "finish_quality": "standard", "design_complexity": "moderate", "project_type": "residential",
+            "stories": 1, "year": 2025, "actual_cost": area * (400 + 10 * (i % 3))}
+
+
+def test_submits_are_debounced_into_one_background_retrain(tmp_path):
+    store = TrainingStore(str(tmp_path / "data"))
+    ml = CostEstimatorML(model_path=str(tmp_path / "models" / "m.pkl"), store=store)
+    scheduler = RetrainScheduler(ml, debounce_s=0.2, max_wait_s=5.0, use_process=False)
+    try:
+        for i in range(12):
+            assert scheduler.submit([_project(i)]) == i + 1
+        assert ml.model is None and scheduler.stats()["pending"]
+        assert scheduler.flush(30)
+        stats = scheduler.stats()
+        assert stats["runs"] == 1 and stats["accepted"] == 1
+        assert stats["last"]["rows"] == 12 and stats["last"]["holdout_rows"] == 2
+        assert ml.model is not None and ml.model_version == 1  # hot-swapped from the saved artifact
+        assert ml.training_history[-1]["holdout_mape"] == pytest.approx(stats["last"]["candidate_mape"], abs=1e-3)
+    finally:
+        scheduler.stop()
+
+
+def test_candidate_rejected_when_holdout_mape_regresses(tmp_path):
+    data_dir, model_path = str(tmp_path / "data"), str(tmp_path / "m.pkl")
+    store = TrainingStore(data_dir)
+    store.append([_project(i) for i in range(12)])
+    first = train_candidate(model_path, data_dir, 12)
+    assert first["accepted"] and first["version"] == 1
+
+    # Pretend the served model validated far better than any candidate can
+    with open(model_path, "rb") as f:
+        artifact = pickle.load(f)
+    artifact["history"][-1]["holdout_mape"] = 0.0001
+    with open(model_path, "wb") as f:
+        pickle.dump(artifact, f)
+
+    second = train_candidate(model_path, data_dir, 12, min_delta=0.0)
+    assert second["accepted"] is False and second["reason"] == "holdout MAPE regressed"
+    assert CostEstimatorML(model_path=model_path, store=store).model_version == 1
+    assert train_candidate(model_path, data_dir, 12, min_delta=100.0)["version"] == 2
@@ -0,0 +1,97 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+from ml_continuous_improvement import CostEstimatorML
+from ml_training_store import FEATURE_NAMES, TrainingStore, feature_matrix, project_features
+
+
+def _project(name, area, cost, ptype="residential"):
+    return {"project_name": name, "area_sf": area, "bedrooms": 3, "bathrooms": 2, "garage_bays": 2,
+            "perimeter_lf": 4 * area ** 0.5, "roof_area_sf": area * 1.2, "windows": 20, "doors": 10,
+            "finish_quality": "standard", "design_complexity": "moderate", "project_type": ptype,
+            "stories": 1, "year": 2025, "actual_cost": cost}
+
+
+def test_store_migrates_legacy_json_and_appends(tmp_path):
+    legacy = [_project("A", 3000, 1_500_000), _project("B", 5000, 3_000_000, "commercial")]
+    (tmp_path / "training_projects.json").write_text(json.dumps(legacy))
+
+    store = TrainingStore(str(tmp_path))
+    assert store.count() == 2 and store.loads == 1
+    assert (tmp_path / "training_projects.jsonl").exists()
+    assert store.append([_project("C", 4000, 2_000_000)]) == 3
+    assert store.count() == 3 and store.loads == 1  # own writes don't trigger a re-read
+
+    features = store.features()
+    assert isinstance(features, np.memmap) and features.shape == (3, len(FEATURE_NAMES))
+    assert list(features[2]) == [float(v) for v in project_features(_project("C", 4000, 2_000_000))]
+    summary = store.summary()
+    assert summary["total_value"] == 6_500_000
+    assert summary["project_types"] == {"residential": 2, "commercial": 1}
+
+    # A fresh process reads the JSONL; a torn last line and a stale feature file are tolerated
+    with open(tmp_path / "training_projects.jsonl", "a") as f:
+        f.write('{"project_name": "D", "area')
+    with open(tmp_path / "training_features.f64", "ab") as f:
+        f.write(b"\0" * 8)
+    reopened = TrainingStore(str(tmp_path))
+    assert [p["project_name"] for p in reopened.records()] == ["A", "B", "C"]
+    assert np.array_equal(np.asarray(reopened.features()), np.asarray(features))
+    assert list(reopened.targets()) == [1_500_000, 3_000_000, 2_000_000]
+
+
+def test_model_artifacts_are_versioned_and_checked(tmp_path, monkeypatch):
+    monkeypatch.setenv("ML_MODEL_KEEP", "2")
+    store = TrainingStore(str(tmp_path / "data"))
+    store.append([_project(f"P{i}", 2500 + 500 * i, 1_200_000 + 300_000 * i) for i in range(5)])
+    model_path = str(tmp_path / "models" / "cost_estimator_ml.pkl")
+
+    ml = CostEstimatorML(model_path=model_path, store=store)
+    assert ml.model is None
+    for _ in range(3):
+        ml.train()
+    assert ml.model_version == 3
+    assert sorted(os.listdir(tmp_path / "models")) == [
+        "cost_estimator_ml.pkl", "cost_estimator_ml.v0002.pkl", "cost_estimator_ml.v0003.pkl"]
+
+    served = CostEstimatorML(model_path=model_path, store=store)
+    assert served.model_version == 3
+    prediction, meta = served.predict(_project("Q", 3500, 0))
+    assert prediction > 0 and meta["model_version"] == 3
+    assert served.reload_if_changed() is False
+
+    ml.update_with_actual(_project("P5", 6000, 3_500_000), 3_500_000)
+    assert store.count() == 6
+    assert served.reload_if_changed() is True and served.model_version == 4
+
+    with open(model_path, "rb") as f:
+        artifact = pickle.load(f)
+    artifact["feature_names"] = ["area_sf"]
+    bad_path = str(tmp_path / "bad.pkl")
+    with open(bad_path, "wb") as f:
+        pickle.dump(artifact, f)
+    assert served.load_model(bad_path) is False and served.model_version == 4
+
+
+def test_predict_batch_matches_per_project_predict(tmp_path):
+    store = TrainingStore(str(tmp_path / "data"))
+    store.append([_project(f"P{i}", 2500 + 500 * i, 1_200_000 + 300_000 * i) for i in range(5)])
+    ml = CostEstimatorML(model_path=str(tmp_path / "m.pkl"), store=store)
+    ml.train()
+
+    projects = [_project(f"Q{i}", area, 0) for i, area in enumerate([1500, 2500, 3500, 7500, 9000])]
+    projects[1]["finish_quality"] = "luxury"
+    del projects[2]["year"]
+    assert np.array_equal(feature_matrix(projects), np.array([project_features(p) for p in projects]))
+
+    predictions, confidences = ml.predict_batch(projects)
+    singles = [ml.predict(p) for p in projects]
+    assert np.allclose(predictions, [s[0] for s in singles])
+    assert confidences == [s[1]["confidence"] for s in singles] == ["low", "medium", "high", "medium", "low"]
+
+    chunks = list(ml.iter_predict_batch(projects, chunk_rows=2))
+    assert [offset for offset, _, _ in chunks] == [0, 2, 4]
+    assert np.allclose(np.concatenate([c[1] for c in chunks]), predictions)
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from web.backend.blueprint_parsers.model_registry import ModelRegistry, preload_names
+
+
+def test_get_builds_once_across_threads():
+    builds = []
+
+    def factory():
+        time.sleep(0.05)
+        builds.append(1)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("layout", factory)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(registry.get("layout"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert all(m is seen[0] for m in seen)
+    with registry.use("layout") as model:
+        assert model is seen[0]
+    stats = registry.stats()["models"]["layout"]
+    assert stats["loaded"] and stats["uses"] == 1 and stats["load_s"] >= 0.05
+
+
+def test_warm_up_reports_errors_and_retries():
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("weights missing")
+        return "model"
+
+    registry = ModelRegistry()
+    registry.register("ocr", flaky)
+    assert registry.warm_up() == {"ocr": "weights missing"}
+    assert registry.stats()["models"]["ocr"]["loaded"] is False
+    assert registry.get("ocr") == "model"
+    registry.unload("ocr")
+    assert registry.stats()["models"]["ocr"]["loaded"] is False
+    with pytest.raises(KeyError):
+        registry.get("missing")
+
+
+def test_preload_names_from_env(monkeypatch):
+    registry = ModelRegistry()
+    registry.register("layout", object)
+    registry.register("paddleocr", object)
+    monkeypatch.delenv("TAKEOFF_PRELOAD_MODELS", raising=False)
+    assert preload_names(registry) == []
+    monkeypatch.setenv("TAKEOFF_PRELOAD_MODELS", "true")
+    assert preload_names(registry) == ["layout", "paddleocr"]
+    monkeypatch.setenv("TAKEOFF_PRELOAD_MODELS", "paddleocr, bogus")
+    assert preload_names(registry) == ["paddleocr"]
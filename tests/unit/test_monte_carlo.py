@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from web.backend.benchmarking import metrics
+from web.backend.monte_carlo import group_index, line_sigmas, percentile_map, shock_covariance, simulate_totals
+
+
+def _lines(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(10, 1000, n), [f"t{i % 6}" for i in range(n)]
+
+
+def test_matrix_draws_are_seeded_and_chunk_independent():
+    ext, trades = _lines()
+    groups, names = group_index(trades)
+    assert names == [f"t{i}" for i in range(6)] and groups[7] == 1
+    cov = shock_covariance(0.04, len(names), 0.6)
+    a = simulate_totals(ext, 3000, 0.1, groups, cov, seed=7, method="matrix")
+    b = simulate_totals(ext, 3000, 0.1, groups, cov, seed=7, method="matrix", chunk_cells=len(ext) * 5)
+    assert np.allclose(a, b, rtol=1e-12)
+    assert not np.allclose(a, simulate_totals(ext, 3000, 0.1, groups, cov, seed=8, method="matrix"))
+
+
+def test_collapsed_matches_matrix_distribution():
+    ext, trades = _lines()
+    groups, names = group_index(trades)
+    sigma = line_sigmas(trades, 0.05, {"t0": 0.1})
+    assert sigma[0] == 0.1 and sigma[1] == 0.05
+    cov = shock_covariance([0.02, 0.03, 0.04, 0.02, 0.03, 0.04], len(names), 0.5)
+    matrix = simulate_totals(ext, 20_000, sigma, groups, cov, seed=1, method="matrix")
+    collapsed = simulate_totals(ext, 20_000, sigma, groups, cov, seed=1)  # auto -> collapsed
+    assert collapsed.mean() == pytest.approx(ext.sum(), rel=1e-3)
+    assert collapsed.std() == pytest.approx(matrix.std(), rel=0.05)
+    expected_var = np.sum((ext * sigma) ** 2) + np.bincount(groups, weights=ext) @ cov @ np.bincount(groups, weights=ext)
+    assert collapsed.var() == pytest.approx(expected_var, rel=0.05)
+
+
+def test_large_sigma_clips_factors_at_zero():
+    ext = np.full(50, 100.0)
+    totals = simulate_totals(ext, 2000, 2.0, seed=3)  # auto -> matrix (clipping matters)
+    assert totals.min() >= 0.0
+    assert totals.mean() > ext.sum()  # max(0, N(1, 2)) has mean > 1
+
+
+def test_metrics_bootstrap_is_reproducible_with_percentiles():
+    rows = [{"trade": f"t{i % 3}", "item": f"i{i}", "quantity": 1.0, "unit_cost": 100.0 + i,
+             "line_total": 100.0 + i} for i in range(300)]
+    features = {"area_sqft": 1000.0}
+    m1 = metrics(rows, features, bootstrap_seed=11, bootstrap_samples=2000, percentiles=(10, 95),
+                 trade_sigmas={"t0": 0.2}, trade_shock_sigma=0.05, trade_shock_corr=0.3)
+    m2 = metrics(rows, features, bootstrap_seed=11, bootstrap_samples=2000, percentiles=(10, 95),
+                 trade_sigmas={"t0": 0.2}, trade_shock_sigma=0.05, trade_shock_corr=0.3)
+    boot = m1["bootstrap"]
+    assert boot == m2["bootstrap"]
+    bands = boot["percentiles_dollars_per_sf"]
+    assert list(bands) == ["P10", "P50", "P90", "P95"]
+    assert bands["P10"] < bands["P50"] < bands["P90"] < bands["P95"]
+    assert boot["P50_dollars_per_sf"] == bands["P50"]
+    assert bands["P50"] == pytest.approx(m1["totals"]["dollars_per_sf"], rel=0.01)
+    assert percentile_map(np.arange(11.0), (25,)) == {"P25": 2.5}
@@ -0,0 +1,75 @@
+import pytest
+
+from web.backend.blueprint_parsers import page_pool
+from web.backend.blueprint_parsers.page_pool import shard_pages, resolve_workers, use_pool
+
+fitz = pytest.importorskip("fitz")
+
+
+def _plan_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        for k in range(5 + i):
+            page.draw_line((10, 10 + 7 * k), (110 + 3 * i, 10 + 7 * k))
+        page.draw_rect(fitz.Rect(20, 300, 120 + i, 380))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_shard_pages_covers_every_page_in_order():
+    for n in (1, 7, 10, 151):
+        for w in (1, 2, 3, 8):
+            shards = shard_pages(n, w)
+            flat = [p for a, b in shards for p in range(a, b)]
+            assert flat == list(range(n))
+
+
+def test_resolve_workers_env(monkeypatch):
+    monkeypatch.setenv("TAKEOFF_WORKERS", "3")
+    assert resolve_workers() == 3
+    assert resolve_workers(2) == 2
+    assert resolve_workers(0) >= 1
+    assert not use_pool(100, 1)
+    assert not use_pool(2, 4)
+
+
+def test_engine_parallel_geometry_matches_sequential():
+    from web.backend.blueprint_parsers.pdf_document import PdfDocument
+    from web.backend.takeoff_engine import TakeoffEngine
+
+    data = _plan_pdf(12)
+    results = []
+    for workers in (1, 3):
+        eng = TakeoffEngine(max_pages=12, workers=workers)
+        with PdfDocument(data, source="<inline-base64>") as doc:
+            _, pages, _ = eng.load_pdf(document=doc)
+            results.append(eng.extract_geometry(pages))
+    seq, par = results
+    assert "geometry:parallel" in par["signals"]
+    assert (seq["wall_lf"], seq["slab_sf"]) == (par["wall_lf"], par["slab_sf"])
+    assert seq["wall_lf"] > 0 and seq["slab_sf"] > 0
+
+
+def test_pool_is_spawned_once_and_reused():
+    pool = page_pool._get_pool(2)
+    try:
+        assert page_pool._get_pool(2) is pool
+        assert pool._mp_context.get_start_method() == "spawn"
+    finally:
+        page_pool.shutdown_pool()
+    assert page_pool._POOL is None
+
+
+def test_extract_drawings_parallel_is_deterministic(tmp_path):
+    pytest.importorskip("pandas")
+    from web.backend.ai_takeoff_pipeline import extract_drawings
+
+    path = tmp_path / "plans.pdf"
+    path.write_bytes(_plan_pdf(10))
+    seq_lines, seq_polys = extract_drawings(str(path), workers=1)
+    par_lines, par_polys = extract_drawings(str(path), workers=2)
+    assert seq_lines == par_lines and seq_polys == par_polys
+    assert [ln.page_num for ln in par_lines] == sorted(ln.page_num for ln in par_lines)
+    assert len(seq_polys) == 10
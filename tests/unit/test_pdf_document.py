@@ -0,0 +1,71 @@
+import base64
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from web.backend.blueprint_parsers.pdf_document import PdfDocument, as_document
+from web.backend.blueprint_parsers.layout_stage import extract_text
+from web.backend.takeoff_engine import TakeoffEngine
+
+
+def _make_pdf_bytes(pages: int = 2) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=612, height=792)
+        page.insert_text((72, 72), f"SHEET A{i + 1}\nSCALE 1/8\"=1'-0\"")
+        page.draw_line((100, 200), (400, 200))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_from_base64_decodes_once_and_caches_pages():
+    data = _make_pdf_bytes(2)
+    document = PdfDocument.from_base64(base64.b64encode(data).decode("ascii"))
+    assert document.data == data
+    assert document.page_count == 2
+    assert document.page(0) is document.page(0)
+    assert "SHEET A1" in document.page_text(0)
+    assert document.pixmap(0, 2.0) is document.pixmap(0, 2.0)
+    document.close()
+
+
+def test_as_document_ownership(tmp_path):
+    path = tmp_path / "plan.pdf"
+    path.write_bytes(_make_pdf_bytes(1))
+    shared = PdfDocument.from_path(str(path))
+    same, owned = as_document(shared)
+    assert same is shared and owned is False
+    opened, owned = as_document(str(path))
+    assert owned is True and opened.name == "plan.pdf"
+    opened.close()
+    shared.close()
+
+
+def test_engine_and_layout_stage_share_document():
+    with PdfDocument(_make_pdf_bytes(3), source="<inline-base64>") as document:
+        eng = TakeoffEngine(max_pages=2)
+        meta, pages, pages_text = eng.load_pdf(document=document)
+        assert eng.document is document
+        assert meta.pages_scanned == 2 and len(pages) == 2
+        assert pages[0] is document.page(0)
+        assert pages_text[1] == document.page_text(1)
+        # bbox in fitz (top-left origin) coordinates around the inserted text
+        text = extract_text(document, (60, 50, 300, 110))
+        assert "SHEET A1" in text
+
+
+def test_raster_is_cached_array_over_pixmap_samples():
+    np = pytest.importorskip("numpy")
+    with PdfDocument(_make_pdf_bytes(1), source="<inline-base64>") as document:
+        pix = document.pixmap(0, 2.0)
+        rgb = document.raster(0, 2.0, bgr=False)
+        assert rgb.shape == (pix.height, pix.width, pix.n) and rgb.dtype == np.uint8
+        assert rgb.tobytes() == pix.samples
+        bgr = document.raster(0, 2.0)
+        assert bgr is document.raster(0, 2.0)
+        assert bgr.flags["C_CONTIGUOUS"]
+        assert np.array_equal(bgr[..., ::-1], rgb)
+        # the line drawn at y=200 pt is dark at 2x zoom
+        assert bgr[400, 500].max() < 128 and bgr[10, 10].min() == 255
@@ -30,3 +30,65 @@ resolution_order: [vendor_quotes, unit_costs, policy_defaults]
     # vendor override applied for plumbing/ROUGH
     li = { (x["trade"], x["code"]): x for x in res["line_items"] }
     assert li[("plumbing","ROUGH")]["unit_cost"] == 2300
+
+def test_price_quantities_batch_matches_per_call():
+    from web.backend.pricing_engine import price_quantities_batch
+
+    unit_costs_csv = "trade,code,unit_cost\nconcrete,FOOTING,180\nconcrete,SLAB,8.5\nplumbing,ROUGH,2500\n"
+    vendor_quotes_csv = "trade,code,unit_cost\nplumbing,ROUGH,2300\nelectrical,ROUGH,2100\n"
+    keys = [("concrete", "FOOTING"), ("Concrete", "slab"), ("plumbing", "ROUGH"), ("electrical", "ROUGH"), ("misc", "NONE")]
+    estimates = [
+        [{"trade": t, "code": c, "description": f"{t} {c}", "uom": "EA", "qty": (7 * i + j) % 13 + 0.37 * j}
+         for j, (t, c) in enumerate(keys * (i % 3 + 1))]
+        for i in range(12)
+    ] + [[]]
+    for policy_yaml in (None, "markups: { overhead_pct: 0.1, profit_pct: 0.05 }\nwaste_defaults: { global_pct: 0.03 }\n"
+                              "tax_pct: 0.0625\nescalation_pct: 0.02\nresolution_order: [unit_costs, vendor_quotes]\n"):
+        batch = price_quantities_batch(estimates=estimates, policy_yaml=policy_yaml, region="boston",
+                                       unit_costs_csv=unit_costs_csv, vendor_quotes_csv=vendor_quotes_csv)
+        single = [price_quantities(quantities=q, policy_yaml=policy_yaml, region="boston",
+                                   unit_costs_csv=unit_costs_csv, vendor_quotes_csv=vendor_quotes_csv)
+                  for q in estimates]
+        assert json.dumps(batch) == json.dumps(single)
+
+def test_pricing_context_cached_by_content_and_reloaded_on_change(tmp_path, monkeypatch):
+    import os
+    from web.backend import pricing_engine
+
+    policy_path = tmp_path / "policy.yaml"
+    policy_path.write_text("markups: { overhead_pct: 0.1 }\nwaste_defaults: { global_pct: 0.0 }\n", encoding="utf-8")
+    monkeypatch.setattr(pricing_engine, "DEFAULT_POLICY_PATH", str(policy_path))
+    csv_text = "trade,code,unit_cost\nconcrete,FOOTING,100\n"
+
+    ctx = pricing_engine.get_pricing_context(None, None, csv_text, None)
+    assert pricing_engine.get_pricing_context(None, None, csv_text, None) is ctx
+    assert pricing_engine.get_pricing_context(None, None, csv_text + "concrete,SLAB,9\n", None) is not ctx
+    assert ctx.resolve("Concrete", "footing") == (100.0, "unit_costs")
+    res = price_quantities(quantities=[{"trade": "concrete", "code": "FOOTING", "qty": 2}], policy_yaml=None,
+                           region=None, unit_costs_csv=csv_text, vendor_quotes_csv=None)
+    assert res["grand_total"] == 220.0
+
+    policy_path.write_text("markups: { overhead_pct: 0.5 }\nwaste_defaults: { global_pct: 0.0 }\n", encoding="utf-8")
+    st = os.stat(policy_path)
+    os.utime(policy_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert pricing_engine.get_pricing_context(None, None, csv_text, None) is not ctx
+    res2 = price_quantities(quantities=[{"trade": "concrete", "code": "FOOTING", "qty": 2}], policy_yaml=None,
+                            region=None, unit_costs_csv=csv_text, vendor_quotes_csv=None)
+    assert res2["grand_total"] == 300.0
+    assert res2["digests"]["policy_yaml_sha256"] != res["digests"]["policy_yaml_sha256"]
+
+def test_price_quantities_resolves_through_context_index(monkeypatch):
+    from web.backend import pricing_engine
+
+    unit_costs_csv = "trade,code,unit_cost\nconcrete,FOOTING,180\nplumbing,ROUGH,2500\n"
+    vendor_quotes_csv = "trade,code,unit_cost\nplumbing,ROUGH,2300\n"
+    ctx = pricing_engine.get_pricing_context(None, "boston", unit_costs_csv, vendor_quotes_csv)
+    keys = [("Concrete", "footing"), ("plumbing", "ROUGH"), ("misc", "NONE")]
+    expected = [pricing_engine._resolve_unit_cost(t, c, ctx.policy, ctx.vendor, ctx.unit) for t, c in keys]
+
+    def _scan(*args):
+        raise AssertionError("per-line resolution scan")
+    monkeypatch.setattr(pricing_engine, "_resolve_unit_cost", _scan)
+    res = price_quantities(quantities=[{"trade": t, "code": c, "qty": 1} for t, c in keys], policy_yaml=None,
+                           region="boston", unit_costs_csv=unit_costs_csv, vendor_quotes_csv=vendor_quotes_csv)
+    assert [(li["unit_cost"], li["source"]) for li in res["line_items"]] == expected
@@ -0,0 +1,66 @@
+import yaml
+
+from web.backend.pricing_engine import price_quantities
+from web.backend.pricing_session import PricingSession
+
+
+def _csv(table):
+    return "trade,code,unit_cost\n" + "".join(f"{t},{c},{v}\n" for (t, c), v in table.items())
+
+
+def test_session_deltas_match_full_reprice():
+    keys = [("concrete", "FOOTING"), ("concrete", "SLAB"), ("framing", "STUD_WALL"), ("plumbing", "ROUGH"), ("misc", "X")]
+    quantities = [
+        {"trade": t, "code": c, "description": "d", "uom": "EA", "qty": float(3 * i % 17 + 1)}
+        for i, (t, c) in enumerate(keys * 8)
+    ]
+    unit = {("concrete", "FOOTING"): 180.0, ("concrete", "SLAB"): 8.5, ("framing", "STUD_WALL"): 12.25, ("plumbing", "ROUGH"): 2500.0}
+    vendor = {("plumbing", "ROUGH"): 2300.0}
+    policy = {
+        "markups": {"overhead_pct": 0.1, "profit_pct": 0.05},
+        "waste_defaults": {"global_pct": 0.03, "concrete": 0.05},
+        "tax_pct": 0.0625,
+        "escalation_pct": 0.02,
+        "resolution_order": ["vendor_quotes", "unit_costs", "policy_defaults"],
+    }
+
+    def full():
+        res = price_quantities(quantities=quantities, policy_yaml=yaml.safe_dump(policy), region=None,
+                               unit_costs_csv=_csv(unit), vendor_quotes_csv=_csv(vendor))
+        res.pop("digests")
+        return res
+
+    def session_view():
+        res = session.response()
+        res.pop("digests")
+        return res
+
+    session = PricingSession(quantities, policy_yaml=yaml.safe_dump(policy),
+                             unit_costs_csv=_csv(unit), vendor_quotes_csv=_csv(vendor))
+    assert session_view() == full()
+
+    diff = session.apply(quantities={"2": 40.0})
+    quantities[2]["qty"] = 40.0
+    assert diff["recomputed"] == 1
+    assert [line["index"] for line in diff["lines"]] == [2]
+    assert [t["trade"] for t in diff["trades"]] == ["framing"]
+    assert session_view() == full()
+
+    session.apply(unit_costs={("concrete", "SLAB"): 9.75})
+    unit[("concrete", "SLAB")] = 9.75
+    assert session_view() == full()
+
+    session.apply(vendor_quotes=[{"trade": "plumbing", "code": "ROUGH", "unit_cost": None}])
+    vendor.pop(("plumbing", "ROUGH"))
+    assert session_view() == full()
+
+    session.apply(waste_defaults={"framing": 0.07})
+    policy["waste_defaults"]["framing"] = 0.07
+    assert session_view() == full()
+
+    diff = session.apply(markups={"profit_pct": 0.08}, tax_pct=0.07)
+    policy["markups"]["profit_pct"] = 0.08
+    policy["tax_pct"] = 0.07
+    assert diff["recomputed"] == len(quantities)
+    assert session_view() == full()
+    assert diff["grand_total"] == full()["grand_total"]
@@ -0,0 +1,39 @@
+import json
+
+from web.backend.run_log import RunLog, bind_request_id
+
+
+def test_run_log_batches_records_with_request_id(tmp_path):
+    path = str(tmp_path / "sub" / "RUN.log")
+    log = RunLog(flush_s=0.05)
+    with bind_request_id("req-1"):
+        for i in range(100):
+            log.log(path, f"step {i}", stage="s")
+    log.log(path, "outside")
+    assert log.flush(timeout=5.0)
+
+    records = [json.loads(line) for line in open(path, encoding="utf-8")]
+    assert [r["msg"] for r in records] == [f"step {i}" for i in range(100)] + ["outside"]
+    assert all(r["request_id"] == "req-1" for r in records[:100])
+    assert records[-1]["request_id"] is None
+    stats = log.stats()
+    assert stats["written"] == 101 and stats["batches"] < 101 and stats["dropped"] == 0
+
+
+def test_run_log_rotates_and_drops_when_full(tmp_path):
+    path = str(tmp_path / "RUN.log")
+    log = RunLog(max_bytes=2000, backups=2, flush_s=0.0)
+    for i in range(80):
+        log.log(path, "x" * 40, i=i)
+        log.flush(timeout=5.0)
+    assert (tmp_path / "RUN.log.1").exists() and (tmp_path / "RUN.log.2").exists()
+    assert not (tmp_path / "RUN.log.3").exists()
+    assert (tmp_path / "RUN.log").stat().st_size <= 2000
+    last = json.loads(open(path, encoding="utf-8").read().splitlines()[-1])
+    assert last["i"] == 79
+
+    tiny = RunLog(max_pending=1, flush_s=10.0)
+    tiny._ensure_writer = lambda: None  # no writer: the queue stays full
+    tiny.log(path, "a")
+    tiny.log(path, "b")
+    assert tiny.stats()["dropped"] == 1
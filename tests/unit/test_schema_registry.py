@@ -0,0 +1,52 @@
+import json
+import os
+
+import jsonschema
+import pytest
+
+from web.backend.schema_registry import SchemaRegistry
+
+
+def test_registry_compiles_repo_schemas_once():
+    registry = SchemaRegistry("schemas")
+    names = registry.load_all()
+    assert {"trade_quantities", "plan_features", "assess_response"} <= set(names)
+    assert all(s["loaded"] for s in registry.stats()["schemas"].values())
+    assert registry.validator("trade_quantities") is registry.validator("trade_quantities")
+
+    good = {"version": "v0", "meta": {"project_id": "p"},
+            "trades": {"concrete": {"items": [{"code": "SLAB", "description": "Slab", "unit": "sf", "quantity": 100}]}}}
+    registry.validate("trade_quantities", good)
+    with pytest.raises(jsonschema.ValidationError):
+        registry.validate("trade_quantities", {"trades": {}})
+    stats = registry.stats()["schemas"]["trade_quantities"]
+    assert stats["validations"] == 2 and stats["failures"] == 1
+
+
+def test_registry_hot_reload(tmp_path):
+    path = tmp_path / "thing.schema.json"
+    path.write_text(json.dumps({"type": "object", "required": ["a"]}))
+    registry = SchemaRegistry(str(tmp_path), hot_reload=True)
+    registry.load_all()
+    assert not registry.is_valid("thing", {})
+
+    path.write_text(json.dumps({"type": "object"}))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert registry.is_valid("thing", {})
+
+    (tmp_path / "later.schema.json").write_text(json.dumps({"type": "string"}))
+    assert registry.is_valid("later", "x")
+
+
+def test_fast_path_does_not_fill_defaults(tmp_path):
+    pytest.importorskip("fastjsonschema")
+    schema = {"$schema": "http://json-schema.org/draft-07/schema#", "type": "object",
+              "properties": {"unit": {"type": "string", "default": "ea"}}}
+    (tmp_path / "item.schema.json").write_text(json.dumps(schema))
+    registry = SchemaRegistry(str(tmp_path))
+    registry.load_all()
+    instance = {}
+    registry.validate("item", instance)
+    assert instance == {}
+    assert registry.stats()["schemas"]["item"]["fast_path_hits"] == 1
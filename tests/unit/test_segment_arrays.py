@@ -0,0 +1,78 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("fitz")
+
+from web.backend.ai_takeoff_pipeline import (
+    LineArrays, LineSeg, PolyArrays, PolyPath, Scale,
+    polygon_area, summarize_lines, summarize_polygons,
+)
+
+
+def _random_lines(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    strokes = [None, (0, 0, 0), (255, 0, 0), (12, 34, 56)]
+    widths = [0.5, 1.0, 2.25]
+    out = []
+    for _ in range(n):
+        x0, y0 = rnd.uniform(0, 2000), rnd.uniform(0, 1500)
+        x1, y1 = x0 + rnd.uniform(-300, 300), y0 + rnd.uniform(-300, 300)
+        out.append(LineSeg(rnd.randint(1, 3), (x0, y0), (x1, y1), math.hypot(x1 - x0, y1 - y0),
+                           rnd.choice(strokes), rnd.choice(widths)))
+    return out
+
+
+def _reference_summarize_lines(lines, scale):
+    """Per-record implementation the vectorized summary replaces."""
+    col = f"length_{scale.real_units_name}"
+    df = pd.DataFrame([{
+        "page": ln.page_num,
+        "stroke_rgb": str(ln.stroke if ln.stroke else (0, 0, 0)),
+        "stroke_width_pdf": ln.width,
+        col: ln.length_pdf_units * scale.real_per_pdf,
+    } for ln in lines])
+    grp = df.groupby(["page", "stroke_rgb", "stroke_width_pdf"], as_index=False)[col].sum()
+    return grp.sort_values(["page", col], ascending=[True, False])
+
+
+def test_line_arrays_round_trip_views():
+    segs = _random_lines(50)
+    arr = LineArrays.from_segments(segs)
+    assert len(arr) == 50
+    assert arr == segs
+    assert arr[3] == segs[3]
+    np.testing.assert_allclose(arr.lengths, [s.length_pdf_units for s in segs])
+    tail = arr[arr.page == 2]
+    assert [s.page_num for s in tail] == [2] * len(tail)
+    assert LineArrays.concat([arr[:10], arr[10:]]) == arr
+
+
+def test_summarize_lines_matches_per_record_reference():
+    segs = _random_lines(2000)
+    scale = Scale(real_per_pdf=1 / 6.0, real_units_name="ft")
+    got = summarize_lines(LineArrays.from_segments(segs), scale)
+    expected = _reference_summarize_lines(segs, scale)
+    pd.testing.assert_frame_equal(got, expected)
+    # list input still accepted
+    pd.testing.assert_frame_equal(summarize_lines(segs, scale), expected)
+
+
+def test_polygon_areas_and_summary():
+    polys = [
+        PolyPath(1, [(0, 0), (10, 0), (10, 5), (0, 5)], True, None, 1.0),
+        PolyPath(1, [(0, 0), (4, 0), (0, 3)], True, (255, 0, 0), None),
+        PolyPath(2, [(0, 0), (1, 1)], True, None, 1.0),
+        PolyPath(2, [(0, 0), (8, 0), (8, 8), (0, 8)], False, None, 1.0),
+    ]
+    arr = PolyArrays.from_paths(polys)
+    np.testing.assert_allclose(arr.areas, [polygon_area(p.points) for p in polys])
+    assert arr.to_paths() == polys
+
+    df = summarize_polygons(arr, Scale(real_per_pdf=2.0, real_units_name="ft"))
+    assert list(df.columns) == ["page", "stroke_rgb", "area_ft^2"]
+    assert df["area_ft^2"].tolist() == [200.0, 24.0, 0.0]
+    assert df["stroke_rgb"].tolist() == ["(0, 0, 0)", "(255, 0, 0)", "(0, 0, 0)"]
@@ -0,0 +1,60 @@
+import os
+import time
+
+from web.backend.stage_timing import Histogram, SamplingProfiler, attach_timings, request_timings, stage, timed
+
+
+def test_request_timings_and_histogram():
+    @timed("test.work")
+    def work():
+        time.sleep(0.002)
+        return 7
+
+    with request_timings("rid", expose=True) as timings:
+        assert work() == 7
+        with stage("test.other"):
+            pass
+        assert work() == 7
+        body = attach_timings({"ok": True})
+    assert set(body["timings_ms"]) == {"test.work", "test.other"}
+    assert body["timings_ms"]["test.work"] >= 4.0
+    assert "test.work;dur=" in timings.server_timing()
+
+    with request_timings("rid", expose=False):
+        assert "timings_ms" not in attach_timings({})
+
+    hist = Histogram("x_seconds", "help", "stage", buckets=(0.01, 0.1))
+    hist.observe("a", 0.05)
+    hist.observe("a", 5.0)
+    text = "\n".join(hist.render())
+    assert 'x_seconds_bucket{stage="a",le="0.01"} 0' in text
+    assert 'x_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'x_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'x_seconds_count{stage="a"} 2' in text
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    def busy_loop_for_profile():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    with request_timings("prof-1") as timings:
+        profiler = SamplingProfiler(timings, interval_s=0.002).start()
+        busy_loop_for_profile()
+        path = profiler.stop(out_dir=str(tmp_path))
+    assert path.endswith("prof-1.folded")
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert any("busy_loop_for_profile" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profile_path_stays_in_out_dir(tmp_path):
+    out_dir = tmp_path / "profiles"
+    with request_timings("../../escape") as timings:
+        profiler = SamplingProfiler(timings, interval_s=0.002).start()
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+        path = profiler.stop(out_dir=str(out_dir))
+    assert os.path.dirname(path) == str(out_dir) and path.endswith("escape.folded")
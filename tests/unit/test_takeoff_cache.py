@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from web.backend import takeoff_cache
+from web.backend.takeoff_cache import TakeoffCache
+
+
+def test_key_depends_on_digest_namespace_and_settings():
+    k = TakeoffCache.key("abc", "takeoff", {"max_pages": 3, "layout": False})
+    assert k == TakeoffCache.key("abc", "takeoff", {"layout": False, "max_pages": 3})
+    assert k != TakeoffCache.key("abd", "takeoff", {"max_pages": 3, "layout": False})
+    assert k != TakeoffCache.key("abc", "plan_features", {"max_pages": 3, "layout": False})
+    assert k != TakeoffCache.key("abc", "takeoff", {"max_pages": 5, "layout": False})
+
+
+def test_format_bump_invalidates_entries(tmp_path, monkeypatch):
+    cache = TakeoffCache(root=str(tmp_path))
+    key = cache.key("abc", "takeoff")
+    cache.put(key, {"rule_hits": []})
+    assert cache.get(key) == {"rule_hits": []}
+
+    monkeypatch.setattr(takeoff_cache, "CACHE_FORMAT", "takeoff-cache.test")
+    assert cache.key("abc", "takeoff") != key
+    assert cache.get(key) is None  # same file, older format
+
+
+def test_get_or_compute_hits_on_repeat(tmp_path):
+    cache = TakeoffCache(root=str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"geom": {"wall_lf": 12.5}}
+
+    v1, hit1 = cache.get_or_compute("k1", compute)
+    v2, hit2 = cache.get_or_compute("k1", compute)
+    assert (hit1, hit2) == (False, True)
+    assert v1 == v2 == {"geom": {"wall_lf": 12.5}}
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_by_entry_count(tmp_path):
+    cache = TakeoffCache(root=str(tmp_path), max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    # make "a" recently used, then push a third entry -> "b" is evicted
+    past = time.time() - 60
+    os.utime(os.path.join(str(tmp_path), "b.json"), (past, past))
+    os.utime(os.path.join(str(tmp_path), "a.json"), (past - 60, past - 60))
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+
+
+def test_size_cap_and_disabled(tmp_path):
+    cache = TakeoffCache(root=str(tmp_path), max_bytes=10)
+    cache.put("big", {"blob": "x" * 100})
+    assert cache.stats()["entries"] == 0
+    off = TakeoffCache(root=str(tmp_path), enabled=False)
+    off.put("k", {"v": 1})
+    assert off.get("k") is None
+
+
+def test_engine_run_stages_uses_cache(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    from web.backend.blueprint_parsers.pdf_document import PdfDocument
+    from web.backend.takeoff_engine import TakeoffEngine
+
+    src = fitz.open()
+    page = src.new_page()
+    page.insert_text((72, 72), "toilet and sink; SCALE 1/4\"=1'-0\"")
+    data = src.tobytes()
+    src.close()
+
+    cache = TakeoffCache(root=str(tmp_path))
+    eng = TakeoffEngine(max_pages=2)
+    with PdfDocument(data, source="a.pdf") as doc:
+        meta1, stages1 = eng.run_stages(doc, cache=cache)
+    with PdfDocument(data, source="b.pdf") as doc:
+        meta2, stages2 = eng.run_stages(doc, cache=cache)
+    assert cache.stats()["hits"] == 1
+    assert meta2.source_pdf == "b.pdf" and meta2.pages_scanned == meta1.pages_scanned == 1
+    assert stages2["fixtures"]["fixtures"] == stages1["fixtures"]["fixtures"] > 0
+    assert stages2["scale"] == stages1["scale"]
@@ -55,3 +55,32 @@ def test_to_quantities_structure():
     assert concrete_items[0]["quantity"] >= 0
     assert framing_items[0]["quantity"] >= 0
     assert plumbing_items[0]["quantity"] >= 0
+
+def test_room_labels_count_whole_line_labels_once_per_sheet():
+    from web.backend.blueprint_parsers.room_labels import find_rooms, parse_room_labels
+
+    text = 'KITCHEN\nBedroom 2\nMASTER  BATH 12\'-0" x 8\'-6"\nPROVIDE EXHAUST FAN IN ALL BATHROOMS\nBATH\nBATH'
+    assert [r["label"] for r in parse_room_labels(text)] == ["KITCHEN", "BEDROOM 2", "MASTER BATH", "BATH", "BATH"]
+    found = find_rooms([text, "ELECTRICAL PLAN\nKITCHEN\nBATH\nGARAGE"])
+    assert found["room_count"] == 6
+    assert found["by_type"] == {"kitchen": 1, "bedroom": 1, "bathroom": 3, "garage": 1}
+    assert [r["page"] for r in found["rooms"] if r["type"] == "garage"] == [2]
+
+def test_detect_rooms_stage():
+    import pytest
+    fitz = pytest.importorskip("fitz")
+    from web.backend.blueprint_parsers.pdf_document import PdfDocument
+
+    doc = fitz.open()
+    for text in ("FLOOR PLAN\nKITCHEN\nBEDROOM 1\nBEDROOM 2", "SITE PLAN", "BATH"):
+        doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    with PdfDocument(data, source="<inline-base64>") as document:
+        eng = TakeoffEngine(max_pages=2)
+        rooms = eng.detect_rooms(document)
+        _, stages = eng.run_stages(document, enable_rooms=True)
+    assert rooms["by_type"] == {"kitchen": 1, "bedroom": 2}  # page 3 is beyond max_pages
+    assert rooms["signals"] == ["rooms:labels:found"]
+    assert stages["rooms"] == rooms
+    assert TakeoffEngine().detect_rooms()["signals"] == ["rooms:exception"]
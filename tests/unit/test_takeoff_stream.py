@@ -0,0 +1,53 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from web.backend.blueprint_parsers.pdf_document import PdfDocument
+from web.backend.takeoff_engine import TakeoffEngine
+
+
+def _plan_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"SHEET A{i + 1}\nPLUMBING: toilet, sink")
+        page.draw_line((100, 200), (400 + 10 * i, 200))
+        page.draw_rect(fitz.Rect(10, 300, 200, 400 + i))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_iter_stages_yields_pages_then_run_stages_aggregate():
+    data = _plan_pdf(5)
+    with PdfDocument(data, source="<inline-base64>") as document:
+        events = list(TakeoffEngine(max_pages=4).iter_stages(document))
+    with PdfDocument(data, source="<inline-base64>") as document:
+        _, expected = TakeoffEngine(max_pages=4).run_stages(document)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["start", "page", "page", "page", "page", "stages"]
+    start = events[0][1]
+    assert start["pages_total"] == 5 and start["pages_scanned"] == 4
+    pages = [payload for kind, payload in events if kind == "page"]
+    assert [p["page"] for p in pages] == [1, 2, 3, 4]
+    assert all(p["fixtures"]["fixtures"] > 0 for p in pages)
+    assert sum(p["geometry"]["wall_lf"] for p in pages) == pytest.approx(expected["geom"]["wall_lf"])
+    assert events[-1][1] == expected
+
+
+def test_streamed_rule_hits_keep_document_page_numbers():
+    doc = fitz.open()
+    for i in range(4):
+        doc.new_page().insert_text((72, 72), "PLUMBING: toilet" if i == 2 else f"SHEET A{i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    with PdfDocument(data, source="<inline-base64>") as document:
+        events = list(TakeoffEngine(max_pages=4).iter_stages(document))
+
+    streamed = [(payload["page"], hit) for kind, payload in events if kind == "page"
+                for hit in payload["fixtures"]["rule_hits"]]
+    assert streamed and all(page == 3 for page, _ in streamed)
+    assert all(hit["pages"] == [3] and all(p == 3 for p, _ in hit["positions"]) for _, hit in streamed)
+    final = {(h["trade"], h["item"]): h["pages"] for h in events[-1][1]["fixtures"]["rule_hits"]}
+    assert all(final[(h["trade"], h["item"])] == [3] for _, h in streamed)
@@ -0,0 +1,79 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.backend.blueprint_parsers.wall_pairs import find_wall_pairs, gap_histogram
+
+
+def _brute_force_pairs(x0, y0, x1, y1, min_gap=1.0, max_gap=30.0, tol_deg=5.0):
+    out = set()
+    tol = np.deg2rad(tol_deg)
+    n = len(x0)
+    for a in range(n):
+        dx, dy = x1[a] - x0[a], y1[a] - y0[a]
+        la = np.hypot(dx, dy)
+        ux, uy = dx / la, dy / la
+        ang_a = np.mod(np.arctan2(dy, dx), np.pi)
+        for b in range(a + 1, n):
+            ang_b = np.mod(np.arctan2(y1[b] - y0[b], x1[b] - x0[b]), np.pi)
+            d = abs(ang_a - ang_b)
+            if min(d, np.pi - d) > tol:
+                continue
+            mx, my = (x0[b] + x1[b]) / 2, (y0[b] + y1[b]) / 2
+            gap = abs((mx - x0[a]) * -uy + (my - y0[a]) * ux)
+            t0 = (x0[b] - x0[a]) * ux + (y0[b] - y0[a]) * uy
+            t1 = (x1[b] - x0[a]) * ux + (y1[b] - y0[a]) * uy
+            if min_gap <= gap <= max_gap and max(t0, t1) > 0 and min(t0, t1) < la:
+                out.add((a, b))
+    return out
+
+
+def test_matches_brute_force_on_random_segments():
+    rng = np.random.default_rng(3)
+    n = 400
+    x0, y0 = rng.uniform(0, 600, n), rng.uniform(0, 600, n)
+    ang = rng.choice([0.0, np.pi / 2, np.pi / 4, np.deg2rad(178.0)], n) + rng.normal(0, 0.02, n)
+    length = rng.uniform(10, 250, n)
+    x1, y1 = x0 + length * np.cos(ang), y0 + length * np.sin(ang)
+    a, b, gap = find_wall_pairs(x0, y0, x1, y1)
+    assert set(zip(a.tolist(), b.tolist())) == _brute_force_pairs(x0, y0, x1, y1)
+    assert np.all((gap >= 1.0) & (gap <= 30.0))
+
+
+def test_pairs_far_apart_in_drawing_order_are_found():
+    # two faces of a horizontal wall, 9 pt apart, separated by 500 unrelated verticals
+    xs = [0.0] + [1000.0 + 3 * k for k in range(500)] + [40.0]
+    ys = [100.0] + [0.0] * 500 + [109.0]
+    x1 = [300.0] + [1000.0 + 3 * k for k in range(500)] + [260.0]
+    y1 = [100.0] + [50.0] * 500 + [109.0]
+    a, b, gap = find_wall_pairs(np.array(xs), np.array(ys), np.array(x1), np.array(y1))
+    pairs = dict(zip(zip(a.tolist(), b.tolist()), gap.tolist()))
+    assert pairs[(0, 501)] == pytest.approx(9.0)
+
+    hist = gap_histogram(gap)
+    assert hist["mode_pt"] is not None and len(hist["counts"]) == len(hist["edges_pt"]) - 1
+
+
+def test_wall_gap_scale_reports_histogram():
+    pytest.importorskip("pandas")
+    pytest.importorskip("fitz")
+    from web.backend.ai_takeoff_pipeline import LineArrays, wall_gap_scale
+
+    # 1/4" = 1'-0": a 6" wall is 9 pt on paper
+    rng = np.random.default_rng(0)
+    n = 300
+    x0 = rng.uniform(0, 2000, n)
+    y0 = rng.uniform(0, 1500, n)
+    length = rng.uniform(40, 200, n)
+    xs0 = np.concatenate([x0, x0 + 5])
+    ys0 = np.concatenate([y0, y0 + 9])
+    xs1 = np.concatenate([x0 + length, x0 + length - 5])
+    ys1 = np.concatenate([y0, y0 + 9])
+    m = len(xs0)
+    lines = LineArrays(np.ones(m), xs0, ys0, xs1, ys1, np.full((m, 3), -1), np.full(m, np.nan))
+    scale, diag = wall_gap_scale(lines)
+    assert diag["paper_in_per_ft"] == 0.25
+    assert scale.real_units_name == "ft"
+    assert scale.real_per_pdf == pytest.approx((12.0 / 0.25) / 72.0 / 12.0)
+    assert diag["pairs"] >= n
+    assert 8.5 <= diag["gap_histogram"]["mode_pt"] <= 9.5
@@ -15,6 +15,7 @@ What this adds (vs the base version):
 
 Notes:
 - PDF units are points (1 pt = 1/72 inch).
+- Set TAKEOFF_WORKERS (or pass workers=) to shard page extraction across processes.
 - Imperial scales convert inches-on-paper to feet-in-reality.
 - Ratio scales (metric) convert millimeters-on-paper to millimeters-in-reality,
   but since PDF units are points, we use: 1 pt = 25.4/72 mm.
@@ -32,10 +33,23 @@ import numpy as np
 import pandas as pd
 import logging
 from dataclasses import dataclass
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Union, Iterable, Iterator, Sequence
+
+try:
+    from blueprint_parsers.page_pool import resolve_workers, use_pool, map_page_ranges
+    from blueprint_parsers.wall_pairs import find_wall_pairs, gap_histogram
+    from stage_timing import timed
+except ImportError:
+    from .blueprint_parsers.page_pool import resolve_workers, use_pool, map_page_ranges
+    from .blueprint_parsers.wall_pairs import find_wall_pairs, gap_histogram
+    from .stage_timing import timed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Part of cached-takeoff keys (app_comprehensive): bump whenever extraction,
+# scale detection or the summaries change what a plan set produces.
+PIPELINE_VERSION = "ai-takeoff.v2"  # v2: columnar segments, wall-pair gap scale
+
 # -------------------------------
 # Data models
 # -------------------------------
@@ -57,6 +71,231 @@ class PolyPath:
     stroke: Optional[Tuple[int, int, int]]
     width: Optional[float]
 
+# -------------------------------
+# Columnar segment storage
+# -------------------------------
+# Dense plan sets carry hundreds of thousands of segments; one dataclass per
+# segment costs far more than the geometry itself. The extractors therefore
+# return column arrays, and LineSeg / PolyPath are built on demand as views.
+# Conventions: stroke is an (N, 3) int array with -1 for "no stroke", width is
+# float with NaN for "unset".
+
+_NO_STROKE = (-1, -1, -1)
+
+def _stroke_row(stroke_rgb) -> Tuple[int, int, int]:
+    if not stroke_rgb:
+        return _NO_STROKE
+    rgb = tuple(int(c) for c in stroke_rgb)
+    if len(rgb) == 1:  # gray
+        rgb = rgb * 3
+    return (rgb + (0, 0, 0))[:3]
+
+def _stroke_view(row) -> Optional[Tuple[int, int, int]]:
+    return None if row[0] < 0 else (int(row[0]), int(row[1]), int(row[2]))
+
+def _width_view(w) -> Optional[float]:
+    return None if np.isnan(w) else float(w)
+
+def _stroke_array(strokes) -> np.ndarray:
+    return np.asarray(strokes, dtype=np.int32).reshape(-1, 3)
+
+class LineArrays:
+    """
+    Line segments as parallel NumPy columns (page, x0, y0, x1, y1, stroke, width).
+    Integer indexing and iteration yield LineSeg views; slices and boolean masks
+    return LineArrays.
+    """
+
+    _FIELDS = ("page", "x0", "y0", "x1", "y1", "stroke", "width")
+
+    def __init__(self, page, x0, y0, x1, y1, stroke, width):
+        self.page = np.asarray(page, dtype=np.int32)
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.y1 = np.asarray(y1, dtype=np.float64)
+        self.stroke = _stroke_array(stroke)
+        self.width = np.asarray(width, dtype=np.float64)
+
+    @classmethod
+    def empty(cls) -> "LineArrays":
+        return cls([], [], [], [], [], [], [])
+
+    @classmethod
+    def from_segments(cls, segs: Iterable[LineSeg]) -> "LineArrays":
+        segs = list(segs)
+        return cls(
+            [s.page_num for s in segs],
+            [s.p0[0] for s in segs], [s.p0[1] for s in segs],
+            [s.p1[0] for s in segs], [s.p1[1] for s in segs],
+            [_stroke_row(s.stroke) for s in segs],
+            [np.nan if s.width is None else s.width for s in segs],
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["LineArrays"]) -> "LineArrays":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(p, f) for p in parts]) for f in cls._FIELDS))
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Segment lengths in PDF units."""
+        return np.hypot(self.x1 - self.x0, self.y1 - self.y0)
+
+    def __len__(self) -> int:
+        return len(self.page)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            x0, y0, x1, y1 = float(self.x0[idx]), float(self.y0[idx]), float(self.x1[idx]), float(self.y1[idx])
+            return LineSeg(
+                page_num=int(self.page[idx]),
+                p0=(x0, y0),
+                p1=(x1, y1),
+                length_pdf_units=math.hypot(x1 - x0, y1 - y0),
+                stroke=_stroke_view(self.stroke[idx]),
+                width=_width_view(self.width[idx]),
+            )
+        return LineArrays(*(getattr(self, f)[idx] for f in self._FIELDS))
+
+    def __iter__(self) -> Iterator[LineSeg]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, list):
+            other = LineArrays.from_segments(other)
+        if not isinstance(other, LineArrays):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            np.array_equal(getattr(self, f), getattr(other, f), equal_nan=(f == "width"))
+            for f in self._FIELDS
+        )
+
+    def to_segments(self) -> List[LineSeg]:
+        return list(self)
+
+class PolyArrays:
+    """
+    Polygons as NumPy columns: per-polygon page / closed / stroke / width plus
+    flat vertex arrays xs, ys delimited by offsets (polygon k owns
+    xs[offsets[k]:offsets[k+1]]). Items are PolyPath views.
+    """
+
+    _FIELDS = ("page", "closed", "stroke", "width")
+
+    def __init__(self, page, closed, stroke, width, offsets, xs, ys):
+        self.page = np.asarray(page, dtype=np.int32)
+        self.closed = np.asarray(closed, dtype=bool)
+        self.stroke = _stroke_array(stroke)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+
+    @classmethod
+    def empty(cls) -> "PolyArrays":
+        return cls([], [], [], [], [0], [], [])
+
+    @classmethod
+    def from_rects(cls, page_num: int, rects, stroke, width) -> "PolyArrays":
+        """Closed 4-vertex polygons from (x, y, w, h) rows."""
+        r = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        x, y, w, h = r[:, 0], r[:, 1], r[:, 2], r[:, 3]
+        xs = np.stack([x, x + w, x + w, x], axis=1).ravel()
+        ys = np.stack([y, y, y + h, y + h], axis=1).ravel()
+        n = len(r)
+        return cls(np.full(n, page_num), np.ones(n, dtype=bool), stroke, width,
+                   np.arange(n + 1) * 4, xs, ys)
+
+    @classmethod
+    def from_paths(cls, polys: Iterable[PolyPath]) -> "PolyArrays":
+        polys = list(polys)
+        counts = [len(p.points) for p in polys]
+        return cls(
+            [p.page_num for p in polys],
+            [p.closed for p in polys],
+            [_stroke_row(p.stroke) for p in polys],
+            [np.nan if p.width is None else p.width for p in polys],
+            np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+            [pt[0] for p in polys for pt in p.points],
+            [pt[1] for p in polys for pt in p.points],
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["PolyArrays"]) -> "PolyArrays":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        counts = np.concatenate([np.diff(p.offsets) for p in parts])
+        return cls(
+            *(np.concatenate([getattr(p, f) for p in parts]) for f in cls._FIELDS),
+            np.concatenate([[0], np.cumsum(counts)]),
+            np.concatenate([p.xs for p in parts]),
+            np.concatenate([p.ys for p in parts]),
+        )
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def areas(self) -> np.ndarray:
+        """Shoelace area per polygon (PDF units^2); 0 for fewer than 3 vertices."""
+        n = len(self)
+        counts = self.counts
+        if not len(self.xs):
+            return np.zeros(n)
+        owner = np.repeat(np.arange(n), counts)
+        nxt = np.arange(len(self.xs)) + 1
+        nonempty = counts > 0
+        nxt[self.offsets[1:][nonempty] - 1] = self.offsets[:-1][nonempty]  # wrap each ring
+        cross = self.xs * self.ys[nxt] - self.ys * self.xs[nxt]
+        area = np.abs(np.bincount(owner, weights=cross, minlength=n)) / 2.0
+        area[counts < 3] = 0.0
+        return area
+
+    def __len__(self) -> int:
+        return len(self.page)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            idx = range(len(self))[idx]
+            a, b = self.offsets[idx], self.offsets[idx + 1]
+            return PolyPath(
+                page_num=int(self.page[idx]),
+                points=list(zip(self.xs[a:b].tolist(), self.ys[a:b].tolist())),
+                closed=bool(self.closed[idx]),
+                stroke=_stroke_view(self.stroke[idx]),
+                width=_width_view(self.width[idx]),
+            )
+        return PolyArrays.from_paths(self[i] for i in np.arange(len(self))[idx])
+
+    def __iter__(self) -> Iterator[PolyPath]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, list):
+            other = PolyArrays.from_paths(other)
+        if not isinstance(other, PolyArrays):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            np.array_equal(getattr(self, f), getattr(other, f), equal_nan=(f == "width"))
+            for f in self._FIELDS + ("offsets", "xs", "ys")
+        )
+
+    def to_paths(self) -> List[PolyPath]:
+        return list(self)
+
+def _as_line_arrays(lines: Union[LineArrays, Iterable[LineSeg]]) -> LineArrays:
+    return lines if isinstance(lines, LineArrays) else LineArrays.from_segments(lines)
+
+def _as_poly_arrays(polys: Union[PolyArrays, Iterable[PolyPath]]) -> PolyArrays:
+    return polys if isinstance(polys, PolyArrays) else PolyArrays.from_paths(polys)
+
 # -------------------------------
 # Geometry helpers
 # -------------------------------
@@ -78,56 +317,85 @@ def polygon_area(points: List[Tuple[float, float]]) -> float:
 # PDF extraction
 # -------------------------------
 
-def extract_drawings(pdf_path: str) -> Tuple[List[LineSeg], List[PolyPath]]:
+@timed("pdf.open")
+def _open_pdf(source: Union[str, bytes]):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+def _page_drawings(page, page_num: int) -> Tuple[LineArrays, PolyArrays]:
+    """Line segments and rectangles of one page, as columns."""
+    line_xy: List[Tuple[float, float, float, float]] = []
+    line_stroke: List[Tuple[int, int, int]] = []
+    line_width: List[float] = []
+    rects: List[Tuple[float, float, float, float]] = []
+    rect_stroke: List[Tuple[int, int, int]] = []
+    rect_width: List[float] = []
+    for d in page.get_drawings():
+        stroke_rgb = None
+        stroke = d.get('stroke', d.get('color'))
+        if stroke:
+            # PyMuPDF draws colors as floats 0..1
+            try:
+                stroke_rgb = tuple(int(255*c) for c in stroke)
+            except Exception:
+                stroke_rgb = tuple(stroke) if isinstance(stroke, (list, tuple)) else None
+        rgb = _stroke_row(stroke_rgb)
+
+        width = d.get('width')
+        width = np.nan if width is None else width
+
+        for p in d['items']:
+            if p[0] == 'l':  # line: ('l', Point, Point)
+                line_xy.append((p[1].x, p[1].y, p[2].x, p[2].y))
+                line_stroke.append(rgb)
+                line_width.append(width)
+            elif p[0] == 're':  # rectangle: ('re', Rect, orientation)
+                r = p[1]
+                rects.append((r.x0, r.y0, r.width, r.height))
+                rect_stroke.append(rgb)
+                rect_width.append(width)
+            # Other path commands omitted in this starter.
+
+    xy = np.asarray(line_xy, dtype=np.float64).reshape(-1, 4)
+    lines = LineArrays(np.full(len(xy), page_num), xy[:, 0], xy[:, 1], xy[:, 2], xy[:, 3],
+                       line_stroke, line_width)
+    polys = PolyArrays.from_rects(page_num, rects, rect_stroke, rect_width)
+    return lines, polys
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[Tuple[LineArrays, PolyArrays]]:
+    """Worker: open the document independently and extract pages [start, stop)."""
+    doc = _open_pdf(source)
+    try:
+        return [_page_drawings(doc[i], i + 1) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+@timed("takeoff.extract_drawings")
+def extract_drawings(pdf_path: Union[str, bytes], workers: Optional[int] = None) -> Tuple[LineArrays, PolyArrays]:
     """
     Uses PyMuPDF page.get_drawings() to retrieve vector graphics.
-    Returns line segments and poly paths with styling.
+    Returns line segments and poly paths with styling, as columnar LineArrays /
+    PolyArrays (iterate or index them for LineSeg / PolyPath views).
+    With workers > 1 (or TAKEOFF_WORKERS) and enough pages, pages are sharded across a
+    ProcessPoolExecutor; each worker opens the document itself and results merge in page order.
     """
-    doc = fitz.open(pdf_path)
-    all_lines: List[LineSeg] = []
-    all_polys: List[PolyPath] = []
+    workers = resolve_workers(workers)
+    doc = _open_pdf(pdf_path)
+    page_count = len(doc)
 
-    for page_index in range(len(doc)):
-        page = doc[page_index]
-        drawings = page.get_drawings()
-        for d in drawings:
-            stroke_rgb = None
-            if d.get('stroke'):
-                # PyMuPDF draws colors as floats 0..1
-                try:
-                    stroke_rgb = tuple(int(255*c) for c in d['stroke'])
-                except Exception:
-                    stroke_rgb = tuple(d['stroke']) if isinstance(d['stroke'], (list, tuple)) else None
-
-            width = d.get('width')
-
-            for p in d['items']:
-                if p[0] == 'l':  # line
-                    _, x1, y1, x2, y2 = p
-                    length = dist((x1, y1), (x2, y2))
-                    all_lines.append(LineSeg(
-                        page_num=page_index+1,
-                        p0=(x1, y1),
-                        p1=(x2, y2),
-                        length_pdf_units=length,
-                        stroke=stroke_rgb,
-                        width=width
-                    ))
-                elif p[0] == 're':  # rectangle
-                    _, x, y, w, h = p
-                    pts = [(x, y), (x+w, y), (x+w, y+h), (x, y+h)]
-                    all_polys.append(PolyPath(
-                        page_num=page_index+1,
-                        points=pts,
-                        closed=True,
-                        stroke=stroke_rgb,
-                        width=width
-                    ))
-                # Other path commands omitted in this starter.
+    if use_pool(page_count, workers):
+        doc.close()
+        per_page = map_page_ranges(_extract_page_range, pdf_path, page_count, workers)
+    else:
+        per_page = [_page_drawings(doc[i], i + 1) for i in range(page_count)]
+        doc.close()
 
-    doc.close()
+    all_lines = LineArrays.concat([lines for lines, _ in per_page])
+    all_polys = PolyArrays.concat([polys for _, polys in per_page])
     return all_lines, all_polys
 
+@timed("takeoff.extract_page_text")
 def extract_page_text(pdf_path: str) -> str:
     """Concatenate text from all pages (blocks) for scale parsing."""
     doc = fitz.open(pdf_path)
@@ -159,6 +427,7 @@ def parse_fraction(s: str) -> float:
         return float(a) / float(b)
     return float(s)
 
+@timed("takeoff.scale_from_text")
 def try_parse_scale_from_text(text: str) -> Optional[Scale]:
     """
     Look for common scale strings inside the PDF text.
@@ -205,121 +474,127 @@ def line_direction(v: Tuple[float,float]) -> float:
         ang += math.pi
     return ang
 
-def estimate_scale_from_walls(lines: List[LineSeg]) -> Optional[Scale]:
+@timed("takeoff.wall_gap_scale")
+def wall_gap_scale(lines: Union[LineArrays, List[LineSeg]]) -> Tuple[Optional[Scale], Dict]:
     """
-    Try to guess the scale by finding pairs of parallel line segments that are close together
-    (possible wall faces), collect gap distances, and see which common scale makes those gaps
-    cluster around typical wall thickness (4-8 inches).
+    Guess the scale from wall thickness: find every pair of parallel, overlapping
+    segments 1-30 pt apart on the same sheet (angle-bucketed grid hash, see
+    blueprint_parsers/wall_pairs.py), then pick the common scale that makes those
+    gaps cluster around typical wall thickness (4-8 inches).
+    Returns (scale or None, diagnostics) where diagnostics carries the pair count,
+    the gap histogram and the per-scale scores.
     """
-    if len(lines) < 100:
-        return None  # not enough signal
+    arr = _as_line_arrays(lines)
+    diagnostics: Dict = {"segments": len(arr), "pairs": 0}
+    if len(arr) < 100:
+        diagnostics["reason"] = "too_few_segments"
+        return None, diagnostics  # not enough signal
 
     # Preselect reasonably long segments to avoid noise
     min_len = 10.0  # pts
-    segs = [ln for ln in lines if ln.length_pdf_units >= min_len]
-
-    # Compute parallel pairs and perpendicular distances
-    gaps = []
-    for i in range(0, min(len(segs), 2000)):  # cap for speed
-        a = segs[i]
-        va = (a.p1[0]-a.p0[0], a.p1[1]-a.p0[1])
-        ang_a = line_direction(va)
-
-        # Find neighbors in a small window to reduce O(N^2)
-        for j in range(i+1, min(i+80, len(segs))):
-            b = segs[j]
-            vb = (b.p1[0]-b.p0[0], b.p1[1]-b.p0[1])
-            ang_b = line_direction(vb)
-
-            # Parallel if angle difference small
-            if abs(ang_a - ang_b) > (math.pi/180.0)*5.0:  # >5 degrees -> not parallel
-                continue
-
-            # Distance between lines: project vector from a.p0 to b.p0 onto normal of a
-            ax, ay = va
-            la = math.hypot(ax, ay)
-            if la == 0:
-                continue
-            nx, ny = -ay/la, ax/la  # unit normal
-            d = abs((b.p0[0]-a.p0[0])*nx + (b.p0[1]-a.p0[1])*ny)
-            if 1.0 <= d <= 30.0:  # plausible wall face gap in points
-                gaps.append(d)
-
-    if not gaps:
-        return None
+    segs = arr[arr.lengths >= min_len]
+    diagnostics["segments_considered"] = len(segs)
+
+    _, _, gaps = find_wall_pairs(segs.x0, segs.y0, segs.x1, segs.y1, page=segs.page,
+                              min_gap=1.0, max_gap=30.0)
+    diagnostics["pairs"] = int(len(gaps))
+    diagnostics["gap_histogram"] = gap_histogram(gaps)
+    if not len(gaps):
+        diagnostics["reason"] = "no_wall_pairs"
+        return None, diagnostics
 
     # For each candidate scale x_in (inches on paper = 1 ft real), compute how the point gap
     # converts to real inches: real_in_per_pt = (12/x_in)/72 = (1/6)/x_in inches per pt
     # We expect typical wall thickness 4-8 inches -> look for a mode near that.
     target_in = 6.0  # aim around 6" as a robust default
+    median_pt = float(np.median(gaps))
+    mad_pt = float(np.median(np.abs(gaps - median_pt)))
     best = None
+    candidates = []
     for x_in in COMMON_IMPERIAL_SCALES_IN:
         real_in_per_pt = (1.0/6.0) / x_in
-        converted = [g * real_in_per_pt for g in gaps if g <= 30.0]
-        if not converted:
-            continue
-        median_gap = float(np.median(converted))
+        median_gap = median_pt * real_in_per_pt
         # score: closeness to 6", and ensure spread isn't insane
-        mad = float(np.median([abs(v - median_gap) for v in converted]))
+        mad = mad_pt * real_in_per_pt
         score = abs(median_gap - target_in) + 0.25*mad
+        candidates.append({"paper_in_per_ft": x_in, "median_wall_in": round(median_gap, 3),
+                           "mad_in": round(mad, 3), "score": round(score, 4)})
         if (best is None) or (score < best[0]):
             best = (score, x_in, median_gap, mad)
-
-    if best is None:
-        return None
+    diagnostics["candidates"] = candidates
 
     _, x_in, median_gap, mad = best
+    diagnostics.update({"paper_in_per_ft": x_in, "median_gap_pt": median_pt,
+                        "median_wall_in": median_gap, "mad_in": mad})
     # Build scale in ft/pt
     real_inches_per_paper_in = 12.0 / x_in
     real_inches_per_pt = real_inches_per_paper_in / 72.0
     real_feet_per_pt = real_inches_per_pt / 12.0
-    return Scale(real_per_pdf=real_feet_per_pt, real_units_name='ft')
+    return Scale(real_per_pdf=real_feet_per_pt, real_units_name='ft'), diagnostics
+
+def estimate_scale_from_walls(lines: Union[LineArrays, List[LineSeg]]) -> Optional[Scale]:
+    """Scale from the wall-thickness heuristic (see wall_gap_scale for diagnostics)."""
+    scale, _ = wall_gap_scale(lines)
+    return scale
 
 # -------------------------------
 # Summaries
 # -------------------------------
 
-def summarize_lines(lines: List[LineSeg], scale: Scale) -> pd.DataFrame:
+def _rgb_labels(rgb: np.ndarray) -> List[str]:
+    """str((r, g, b)) per group row, matching the per-record labels."""
+    return [str(tuple(row)) for row in rgb.tolist()]
+
+def _sort_summary(grp: pd.DataFrame, keys: List[str], value_col: str) -> pd.DataFrame:
+    # Same row order and index as grouping on the string keys directly
+    grp = grp.sort_values(keys).reset_index(drop=True)
+    return grp.sort_values(["page", value_col], ascending=[True, False])
+
+@timed("takeoff.summarize_lines")
+def summarize_lines(lines: Union[LineArrays, List[LineSeg]], scale: Scale) -> pd.DataFrame:
     """
     Summarize total lengths by page, stroke color, and width.
+    Lengths and the group-by run on the column arrays; the stroke label is only
+    formatted once per group.
     """
-    records = []
-    for ln in lines:
-        real_len = ln.length_pdf_units * scale.real_per_pdf
-        color = ln.stroke if ln.stroke else (0,0,0)
-        records.append({
-            "page": ln.page_num,
-            "stroke_rgb": str(color),
-            "stroke_width_pdf": ln.width,
-            f"length_{scale.real_units_name}": real_len
-        })
-    df = pd.DataFrame(records)
-    if df.empty:
-        return df
-    grp = df.groupby(["page", "stroke_rgb", "stroke_width_pdf"], as_index=False)[f"length_{scale.real_units_name}"].sum()
-    return grp.sort_values(["page", f"length_{scale.real_units_name}"], ascending=[True, False])
-
-def summarize_polygons(polys: List[PolyPath], scale: Scale) -> pd.DataFrame:
+    arr = _as_line_arrays(lines)
+    if not len(arr):
+        return pd.DataFrame()
+    col = f"length_{scale.real_units_name}"
+    df = pd.DataFrame({
+        "page": arr.page.astype(np.int64),
+        "r": arr.stroke[:, 0], "g": arr.stroke[:, 1], "b": arr.stroke[:, 2],
+        "stroke_width_pdf": arr.width,
+        col: arr.lengths * scale.real_per_pdf,
+    })
+    df[["r", "g", "b"]] = df[["r", "g", "b"]].clip(lower=0)  # no stroke reports as black
+    grp = df.groupby(["page", "r", "g", "b", "stroke_width_pdf"], as_index=False, sort=False)[col].sum()
+    grp.insert(1, "stroke_rgb", _rgb_labels(grp[["r", "g", "b"]].to_numpy()))
+    grp = grp.drop(columns=["r", "g", "b"])
+    return _sort_summary(grp, ["page", "stroke_rgb", "stroke_width_pdf"], col)
+
+@timed("takeoff.summarize_polygons")
+def summarize_polygons(polys: Union[PolyArrays, List[PolyPath]], scale: Scale) -> pd.DataFrame:
     """
     Best-effort area estimation for rectangles (and simple closed paths, if added).
+    Areas come from a vectorized shoelace over all polygons at once.
     """
-    records = []
-    for poly in polys:
-        if not poly.closed:
-            continue
-        area_pdf = polygon_area(poly.points)
-        area_real = area_pdf * (scale.real_per_pdf ** 2)
-        color = poly.stroke if poly.stroke else (0,0,0)
-        records.append({
-            "page": poly.page_num,
-            "stroke_rgb": str(color),
-            f"area_{scale.real_units_name}^2": area_real
-        })
-    df = pd.DataFrame(records)
-    if df.empty:
-        return df
-    grp = df.groupby(["page", "stroke_rgb"], as_index=False)[f"area_{scale.real_units_name}^2"].sum()
-    return grp.sort_values(["page", f"area_{scale.real_units_name}^2"], ascending=[True, False])
+    arr = _as_poly_arrays(polys)
+    col = f"area_{scale.real_units_name}^2"
+    closed = arr.closed
+    if not closed.any():
+        return pd.DataFrame()
+    stroke = arr.stroke[closed]
+    df = pd.DataFrame({
+        "page": arr.page[closed].astype(np.int64),
+        "r": stroke[:, 0], "g": stroke[:, 1], "b": stroke[:, 2],
+        col: arr.areas[closed] * (scale.real_per_pdf ** 2),
+    })
+    df[["r", "g", "b"]] = df[["r", "g", "b"]].clip(lower=0)  # no stroke reports as black
+    grp = df.groupby(["page", "r", "g", "b"], as_index=False, sort=False)[col].sum()
+    grp.insert(1, "stroke_rgb", _rgb_labels(grp[["r", "g", "b"]].to_numpy()))
+    grp = grp.drop(columns=["r", "g", "b"])
+    return _sort_summary(grp, ["page", "stroke_rgb"], col)
 
 # -------------------------------
 # Optional: render preview images (PNG) per page for manual QA
@@ -347,9 +622,11 @@ def render_pages(pdf_path: str, dpi: int = 200, max_pages: Optional[int] = None)
 # Main
 # -------------------------------
 
-def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None):
+@timed("takeoff.run_pipeline")
+def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None, workers: Optional[int] = None):
     """
     Main pipeline function to be called by the web backend.
+    workers: parallel page extraction (see extract_drawings); defaults to TAKEOFF_WORKERS.
     Returns a tuple: (df_lines, df_polys, scale_info, logs, error_message)
     """
     logs = []
@@ -358,7 +635,7 @@ def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None):
         logs.append(f"[*] Starting AI takeoff for: {pdf_path}")
 
         logging.info("[*] Extracting vector linework...")
-        lines, polys = extract_drawings(pdf_path)
+        lines, polys = extract_drawings(pdf_path, workers=workers)
         logging.info(f"    Found {len(lines)} line segments and {len(polys)} polygonal paths.")
         logs.append(f"    Found {len(lines)} line segments and {len(polys)} polygonal paths.")
 
@@ -367,6 +644,7 @@ def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None):
         scale = try_parse_scale_from_text(text)
 
         scale_info = {}
+        wall_gaps = None
 
         if scale:
             logging.info(f"    Parsed scale from text: units={scale.real_units_name}, real_per_pt={scale.real_per_pdf:.6f} {scale.real_units_name}/pt")
@@ -374,7 +652,10 @@ def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None):
         else:
             logging.info("    No explicit scale string found. Estimating from wall thickness...")
             logs.append("    No explicit scale string found. Estimating from wall thickness...")
-            scale = estimate_scale_from_walls(lines)
+            scale, wall_gaps = wall_gap_scale(lines)
+            msg = f"    Wall-pair scan: {wall_gaps['pairs']} parallel pairs, gap mode={(wall_gaps.get('gap_histogram') or {}).get('mode_pt')} pt"
+            logging.info(msg)
+            logs.append(msg)
             if scale:
                 logging.info(f"    Estimated imperial scale by wall-gap heuristic: real_per_pt={scale.real_per_pdf:.6f} {scale.real_units_name}/pt")
                 logs.append(f"    Estimated imperial scale by wall-gap heuristic: real_per_pt={scale.real_per_pdf:.6f} {scale.real_units_name}/pt")
@@ -395,6 +676,8 @@ def run_pipeline(pdf_path: str, preferred_units: Optional[str] = None):
             'units': scale.real_units_name,
             'real_per_pdf_point': scale.real_per_pdf
         }
+        if wall_gaps is not None:
+            scale_info['wall_gaps'] = wall_gaps
         logging.info(f"[*] Using scale: 1 PDF pt = {scale.real_per_pdf:.6f} {scale.real_units_name}")
         logs.append(f"[*] Using scale: 1 PDF pt = {scale.real_per_pdf:.6f} {scale.real_units_name}")
 
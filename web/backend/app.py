@@ -6,8 +6,10 @@ RESTful API for construction cost estimation with ML
 
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+import json
 import sys
 import os
 
@@ -16,6 +18,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from specification_aware_model import estimate_with_specifications
 from ml_continuous_improvement import CostEstimatorML
+from ml_retrain import scheduler_from_env
 
 app = FastAPI(
     title="JCW Cost Estimator API",
@@ -32,8 +35,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ML model
+# Initialize ML model (training data is held in memory by ml_model.store)
 ml_model = CostEstimatorML()
+# /train appends and returns; retraining happens in the background (see ml_retrain)
+retrainer = scheduler_from_env(ml_model)
+
+# /estimate/batch streams NDJSON above this many rows (or when asked to)
+BATCH_STREAM_ROWS = int(os.environ.get("ML_BATCH_STREAM_ROWS", "5000"))
 
 # Request/Response Models
 class EstimateRequest(BaseModel):
@@ -69,12 +77,45 @@ class TrainingProject(BaseModel):
     year: int = 2025
     actual_cost: float
 
+class BatchEstimateRequest(BaseModel):
+    projects: List[EstimateRequest]
+    stream: Optional[bool] = None  # default: stream when len(projects) > BATCH_STREAM_ROWS
+
 class EstimateResponse(BaseModel):
     rule_based_estimate: Dict
     ml_estimate: Optional[Dict]
     ensemble_estimate: Dict
     confidence: str
 
+def _ml_project_data(request: EstimateRequest) -> Dict:
+    """ML feature dict for an estimate request (unknown details approximated from area)"""
+    features = str(request.special_features).lower()
+    return {
+        'area_sf': request.area_sf,
+        'bedrooms': request.bedrooms or 3,
+        'bathrooms': request.bathrooms or 2,
+        'garage_bays': request.garage_bays or 2,
+        'wall_height': 10,
+        'perimeter_lf': (request.area_sf ** 0.5) * 4,  # Approximate
+        'roof_area_sf': request.area_sf * 1.2,  # Approximate
+        'windows': request.windows or int(request.area_sf / 150),
+        'doors': request.doors or 10,
+        'finish_quality': request.finish_quality,
+        'design_complexity': request.design_complexity,
+        'project_type': request.project_type,
+        'has_pool': 'pool' in features,
+        'has_elevator': 'elevator' in features,
+        'has_smart_home': 'smart' in features,
+        'stories': 1,
+        'year': 2025
+    }
+
+def _batch_rows(projects: List[Dict], predictions, confidences) -> List[Dict]:
+    return [
+        {"total_cost": cost, "cost_per_sf": cost / p['area_sf'] if p['area_sf'] else None, "confidence": conf}
+        for p, cost, conf in zip(projects, predictions.tolist(), confidences)
+    ]
+
 # Endpoints
 @app.get("/")
 async def root():
@@ -86,11 +127,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    training_data = ml_model.load_training_data()
     return {
         "status": "healthy",
         "ml_model_loaded": ml_model.model is not None,
-        "training_projects": len(training_data)
+        "ml_model_version": ml_model.model_version,
+        "training_projects": ml_model.store.count()
     }
 
 @app.post("/estimate", response_model=EstimateResponse)
@@ -110,33 +151,13 @@ async def get_estimate(request: EstimateRequest):
         # ML estimate (if model trained)
         ml_prediction = None
         ml_metadata = None
+        training_count = ml_model.store.count()
         
-        if ml_model.model is not None and len(ml_model.load_training_data()) >= 3:
-            project_data = {
-                'area_sf': request.area_sf,
-                'bedrooms': request.bedrooms or 3,
-                'bathrooms': request.bathrooms or 2,
-                'garage_bays': request.garage_bays or 2,
-                'wall_height': 10,
-                'perimeter_lf': (request.area_sf ** 0.5) * 4,  # Approximate
-                'roof_area_sf': request.area_sf * 1.2,  # Approximate
-                'windows': request.windows or int(request.area_sf / 150),
-                'doors': request.doors or 10,
-                'finish_quality': request.finish_quality,
-                'design_complexity': request.design_complexity,
-                'project_type': request.project_type,
-                'has_pool': 'pool' in str(request.special_features).lower(),
-                'has_elevator': 'elevator' in str(request.special_features).lower(),
-                'has_smart_home': 'smart' in str(request.special_features).lower(),
-                'stories': 1,
-                'year': 2025
-            }
-            
+        if ml_model.model is not None and training_count >= 3:
+            project_data = _ml_project_data(request)
             ml_prediction, ml_metadata = ml_model.predict(project_data)
         
         # Ensemble estimate (weighted average)
-        training_count = len(ml_model.load_training_data())
-        
         if ml_prediction and training_count >= 10:
             # 70% ML, 30% rule-based when well-trained
             ensemble_cost = ml_prediction * 0.7 + rule_estimate['total_cost'] * 0.3
@@ -174,25 +195,78 @@ async def get_estimate(request: EstimateRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/estimate/batch")
+def get_batch_estimate(request: BatchEstimateRequest):
+    """ML cost estimates for many projects (portfolio what-if runs) in one call.
+    
+    Scores the whole batch with one vectorized model pass per chunk. Large
+    batches stream as NDJSON: a "start" line, one "rows" line per chunk
+    (offset + results) and a "done" line.
+    """
+    if ml_model.model is None:
+        raise HTTPException(status_code=404, detail="Model not trained yet")
+    
+    projects = [_ml_project_data(p) for p in request.projects]
+    stream = request.stream if request.stream is not None else len(projects) > BATCH_STREAM_ROWS
+    
+    if not stream:
+        try:
+            predictions, confidences = ml_model.predict_batch(projects)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return {
+            "rows": len(projects),
+            "model_version": ml_model.model_version,
+            "results": _batch_rows(projects, predictions, confidences)
+        }
+    
+    def _line(event: str, payload: Dict) -> bytes:
+        return (json.dumps({"event": event, **payload}) + "\n").encode("utf-8")
+    
+    def _events():
+        yield _line("start", {"rows": len(projects), "model_version": ml_model.model_version})
+        try:
+            for offset, predictions, confidences in ml_model.iter_predict_batch(projects):
+                chunk = projects[offset:offset + len(confidences)]
+                yield _line("rows", {"offset": offset, "results": _batch_rows(chunk, predictions, confidences)})
+            yield _line("done", {"rows": len(projects)})
+        except Exception as e:
+            yield _line("error", {"detail": str(e)})
+    
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
 @app.post("/train")
 async def add_training_project(project: TrainingProject):
-    """Add a completed project to training data"""
+    """Add a completed project to training data (the model retrains in the background)"""
     
     try:
-        project_dict = project.dict()
-        ml_model.update_with_actual(project_dict, project.actual_cost)
-        
-        training_count = len(ml_model.load_training_data())
+        training_count = retrainer.submit([project.dict()])
         
         return {
             "success": True,
-            "message": f"Project '{project.project_name}' added to training data",
-            "total_training_projects": training_count
+            "message": f"Project '{project.project_name}' added to training data; retraining scheduled",
+            "total_training_projects": training_count,
+            "model_version": ml_model.model_version
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/train/status")
+async def get_train_status():
+    """Background retraining state: pending/running, counts and the last result"""
+    return retrainer.stats()
+
+@app.post("/train/run")
+async def run_training_now():
+    """Retrain now instead of waiting for the debounce"""
+    retrainer.run_now()
+    return retrainer.stats()
+
+@app.on_event("shutdown")
+def _stop_retrainer():
+    retrainer.stop()
+
 @app.get("/training-data")
 async def get_training_data():
     """Get all training projects"""
@@ -231,25 +305,22 @@ async def get_feature_importance():
 async def get_stats():
     """Get system statistics"""
     
-    training_data = ml_model.load_training_data()
+    summary = ml_model.store.summary()
     
-    if not training_data:
+    if not summary["total_projects"]:
         return {
             "total_projects": 0,
             "avg_cost_per_sf": None,
             "total_value": None
         }
     
-    total_value = sum(p['actual_cost'] for p in training_data)
-    avg_cost_per_sf = sum(p['actual_cost'] / p['area_sf'] for p in training_data) / len(training_data)
-    
     return {
-        "total_projects": len(training_data),
-        "avg_cost_per_sf": avg_cost_per_sf,
-        "total_value": total_value,
+        "total_projects": summary["total_projects"],
+        "avg_cost_per_sf": summary["sum_cost_per_sf"] / summary["total_projects"],
+        "total_value": summary["total_value"],
         "project_types": {
-            "residential": sum(1 for p in training_data if p['project_type'] == 'residential'),
-            "commercial": sum(1 for p in training_data if p['project_type'] == 'commercial')
+            "residential": summary["project_types"].get("residential", 0),
+            "commercial": summary["project_types"].get("commercial", 0)
         }
     }
 
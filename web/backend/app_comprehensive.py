@@ -6,8 +6,9 @@ Full-featured API with PDF takeoff, ML estimation, and Excel reports
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from .schemas import EstimateResponse
@@ -19,19 +20,30 @@ import json
 import hashlib
 import base64
 from datetime import datetime
-from .pricing_engine import price_quantities
-from .takeoff_engine import TakeoffEngine
+from .pricing_engine import price_quantities, read_text_cached
+from .pricing_session import PricingSession, get_session_store
+from .takeoff_engine import TakeoffEngine, PdfMeta
+from .blueprint_parsers.pdf_document import PdfDocument, PdfSource, as_document
+from .takeoff_cache import get_default_cache, sha256_bytes
+from .job_queue import JobQueue, QueueFull, get_job_queue
+from .schema_registry import get_schema_registry
+from .stage_timing import (HTTP_SECONDS, attach_timings, render_prometheus, request_timings, stage,
+                           start_profiler, timed)
+from .run_log import INTERACTIVE_LOG, TAKEOFF_LOG, bind_request_id, current_request_id, get_run_log, log_event
+from .blueprint_parsers.model_registry import get_model_registry, preload_names
+from .blueprint_parsers.layout_stage import LAYOUT_MODEL
 from .plan_reader import extract_plan_features
 from .trade_inference import infer_trades
 from .clarifier import make_questions
 from .interactive_engine import InteractiveEngine
 from .schemas import InteractiveAssessRequest, InteractiveQnaRequest
-import jsonschema
 import yaml
 import traceback
 import pathlib
+import re
 import uuid
 import time
+import threading
 
 REPO_ROOT = pathlib.Path(__file__).resolve().parents[3] if (pathlib.Path(__file__).resolve().parts[-3:] and True) else pathlib.Path(__file__).resolve().parents[2]
 
@@ -42,15 +54,86 @@ def _repo_path(p: str | None) -> str | None:
     return str(pp)
 
 def _write_interactive_log(payload: dict | str):
+    fields = payload if isinstance(payload, dict) else {"msg": str(payload)}
+    log_event(str(REPO_ROOT / 'output' / 'INTERACTIVE' / 'route_errors.log'), **fields)
+
+# --- takeoff helpers ---
+def _cached_plan_features(pdf: PdfSource) -> dict:
+    """extract_plan_features, cached by PDF digest; doc.file_name always follows the caller's file."""
+    document, owned = as_document(pdf)
+    try:
+        cache = get_default_cache()
+        key = cache.key(document.sha256, "plan_features")
+        data, _ = cache.get_or_compute(key, lambda: extract_plan_features(document))
+        if isinstance(data.get("doc"), dict):
+            data["doc"]["file_name"] = document.name
+        return data
+    finally:
+        if owned:
+            document.close()
+
+def _takeoff_response(eng: TakeoffEngine, project_id: str, meta: Any, stages: Dict[str, Any]) -> dict:
+    """
+    Stage outputs -> validated v0 trade quantities (object form checked against
+    schemas/trade_quantities.schema.json), trades normalized to array shape, with
+    project_id/metadata aliases for clients.
+    """
+    meta.project_id = project_id
+    scale, geom, fixtures = stages["scale"], stages["geom"], stages["fixtures"]
+    layout, rooms = stages.get("layout"), stages.get("rooms")
+    quantities_v0 = eng.to_quantities(project_id, meta, geom, fixtures, scale, layout, rooms)
+
+    # Runtime validation against authoritative v0 schema (object form),
+    # then normalize trades to array shape for clients/UAT.
+    obj_form = _coerce_trades_object(quantities_v0)
+    # Ensure mandatory v0 envelope fields before schema validation
+    if not isinstance(obj_form, dict):
+        obj_form = {}
+    if "version" not in obj_form:
+        obj_form["version"] = "v0"
+    meta = obj_form.get("meta") or {}
+    if "project_id" not in meta:
+        meta["project_id"] = project_id
+    obj_form["meta"] = meta
+
+    # Validate object form; on failure, build a minimal valid fallback
+    try:
+        get_schema_registry().validate("trade_quantities", obj_form)
+    except Exception:
+        obj_form = {
+            "version": "v0",
+            "meta": {"project_id": project_id},
+            "trades": {
+                "general": {
+                    "items": [
+                        {
+                            "code": "placeholder",
+                            "description": "normalized fallback",
+                            "unit": "ea",
+                            "quantity": 0
+                        }
+                    ]
+                }
+            }
+        }
+
+    resp_dict = _normalize_trades_shape(obj_form)
+    # Provide compatibility aliases for clients/tests
     try:
-        outdir = REPO_ROOT / 'output' / 'INTERACTIVE'
-        outdir.mkdir(parents=True, exist_ok=True)
-        with open(outdir / 'route_errors.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(payload, ensure_ascii=False) + '\n')
+        meta_alias = obj_form.get("meta") or {}
+        if isinstance(meta_alias, dict):
+            if "project_id" not in meta_alias:
+                meta_alias["project_id"] = project_id
+            resp_dict["metadata"] = dict(meta_alias)
+        else:
+            resp_dict["metadata"] = {"project_id": project_id}
+        resp_dict["project_id"] = project_id
     except Exception:
-        pass
+        resp_dict["project_id"] = project_id
+        resp_dict["metadata"] = {"project_id": project_id}
+
+    return resp_dict
 
-# --- takeoff helpers ---
 def _normalize_trades_shape(q: dict) -> dict:
     """
     Ensure q['trades'] is always a list of {trade: str, items: [...] }.
@@ -111,12 +194,13 @@ try:
     from ai_takeoff_pipeline import (
         extract_drawings, extract_page_text, 
         try_parse_scale_from_text, estimate_scale_from_walls,
-        summarize_lines, summarize_polygons
+        summarize_lines, summarize_polygons, PIPELINE_VERSION as TAKEOFF_PIPELINE_VERSION
     )
     TAKEOFF_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Takeoff not available: {e}")
     TAKEOFF_AVAILABLE = False
+    TAKEOFF_PIPELINE_VERSION = None
 
 try:
     from specification_aware_model import (
@@ -155,6 +239,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _truthy(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes")
+
+# Client ids end up in log records and profile file names: no separators, bounded length
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+def _request_id(value: Optional[str]) -> str:
+    """The client's X-Request-ID when it is a safe token, else a fresh id."""
+    value = (value or "").strip()
+    if _REQUEST_ID_RE.fullmatch(value) and value.strip(".") != "":
+        return value
+    return uuid.uuid4().hex
+
+@app.middleware("http")
+async def _request_context(request: Request, call_next):
+    # Correlates run-log records with the request: X-Request-ID in, same id echoed back.
+    # Stage timings are always collected (they feed /metrics); X-Timings: 1 or ?timings=true
+    # also returns them (Server-Timing header, `timings_ms` in JSON bodies).
+    request_id = _request_id(request.headers.get("x-request-id"))
+    expose = _truthy(request.headers.get("x-timings")) or _truthy(request.query_params.get("timings"))
+    t0 = time.perf_counter()
+    profile_path = None
+    with bind_request_id(request_id), request_timings(request_id, expose) as timings:
+        profiler = start_profiler(timings, _truthy(request.headers.get("x-profile")))
+        try:
+            response = await call_next(request)
+        finally:
+            if profiler is not None:
+                profile_path = profiler.stop()
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(f"{request.method} {getattr(route, 'path', 'unmatched')}", time.perf_counter() - t0)
+    response.headers["X-Request-ID"] = request_id
+    if expose and timings.records:
+        response.headers["Server-Timing"] = timings.server_timing()
+    if profile_path:
+        response.headers["X-Profile-Path"] = profile_path
+    return response
+
 # Serve frontend
 frontend_path = os.path.join(os.path.dirname(__file__), "../frontend")
 if os.path.exists(frontend_path):
@@ -181,6 +303,7 @@ class EstimateFeedback(BaseModel):
 # EXCEL REPORT GENERATION
 # ============================================================================
 
+@timed("excel.generate")
 def generate_comprehensive_excel(
     project_data: Dict,
     takeoff_data: Dict,
@@ -471,6 +594,38 @@ def generate_comprehensive_excel(
     wb.save(output_path)
 
 
+def _read_if_path(value: Any) -> Any:
+    """Inline text passes through; an existing file path is replaced by its (cached) contents."""
+    if isinstance(value, str) and os.path.exists(value):
+        try:
+            return read_text_cached(value)
+        except Exception:
+            pass
+    return value
+
+
+def _flatten_v0_quantities(raw_quantities: Any) -> Any:
+    """M01 v0 object {"version":"v0","trades":{...}} -> pricing line list; other shapes pass through."""
+    if not (isinstance(raw_quantities, dict) and raw_quantities.get("version") == "v0" and "trades" in raw_quantities):
+        return raw_quantities
+    flat_items = []
+    try:
+        for trade, tdata in (raw_quantities.get("trades") or {}).items():
+            items = tdata if isinstance(tdata, list) else (tdata.get("items") or [])
+            for it in items:
+                flat_items.append({
+                    "trade": trade,
+                    "code": it.get("code", ""),
+                    "description": it.get("description", ""),
+                    "uom": (it.get("unit") or "EA").upper(),
+                    "qty": float(it.get("quantity", 0) or 0),
+                    "notes": it.get("notes"),
+                })
+    except Exception as _:
+        return []
+    return flat_items
+
+
 @app.post("/v1/estimate")
 async def estimate_v1(req: Request):
     body = await req.json()
@@ -485,9 +640,7 @@ async def estimate_v1(req: Request):
         # Strict M01 v0 validation when a dict-shaped quantities object is provided
         if isinstance(raw_quantities, dict):
             try:
-                with open("schemas/trade_quantities.schema.json", "r", encoding="utf-8") as _f:
-                    _schema = json.load(_f)
-                jsonschema.Draft202012Validator(_schema).validate(raw_quantities)
+                get_schema_registry().validate("trade_quantities", raw_quantities)
             except Exception as e:
                 return JSONResponse(
                     status_code=422,
@@ -495,45 +648,12 @@ async def estimate_v1(req: Request):
                 )
 
         # Support M01 v0 schema object: {"version":"v0","trades":{...}}
-        quantities = raw_quantities
-        if isinstance(raw_quantities, dict) and raw_quantities.get("version") == "v0" and "trades" in raw_quantities:
-            flat_items = []
-            try:
-                for trade, tdata in (raw_quantities.get("trades") or {}).items():
-                    for it in (tdata.get("items") or []):
-                        flat_items.append({
-                            "trade": trade,
-                            "code": it.get("code", ""),
-                            "description": it.get("description", ""),
-                            "uom": (it.get("unit") or "EA").upper(),
-                            "qty": float(it.get("quantity", 0) or 0),
-                            "notes": it.get("notes"),
-                        })
-                quantities = flat_items
-            except Exception as _:
-                quantities = []
-
-        # If CSV or policy provided as file paths, load file contents
-        if isinstance(unit_costs_csv, str) and os.path.exists(unit_costs_csv):
-            try:
-                with open(unit_costs_csv, "r", encoding="utf-8") as f:
-                    unit_costs_csv = f.read()
-            except Exception:
-                pass
+        quantities = _flatten_v0_quantities(raw_quantities)
 
-        if isinstance(vendor_quotes_csv, str) and os.path.exists(vendor_quotes_csv):
-            try:
-                with open(vendor_quotes_csv, "r", encoding="utf-8") as f:
-                    vendor_quotes_csv = f.read()
-            except Exception:
-                pass
-
-        if isinstance(policy_yaml, str) and os.path.exists(policy_yaml):
-            try:
-                with open(policy_yaml, "r", encoding="utf-8") as f:
-                    policy_yaml = f.read()
-            except Exception:
-                pass
+        # If CSV or policy provided as file paths, load file contents (cached by mtime)
+        unit_costs_csv = _read_if_path(unit_costs_csv)
+        vendor_quotes_csv = _read_if_path(vendor_quotes_csv)
+        policy_yaml = _read_if_path(policy_yaml)
 
         result = price_quantities(
             quantities=quantities,
@@ -543,7 +663,7 @@ async def estimate_v1(req: Request):
             vendor_quotes_csv=vendor_quotes_csv,
         )
         result.setdefault("warnings", []).append("using_m01_request_shape")
-        return result
+        return attach_timings(result)
 
     # Interactive mode
     if body.get("mode") == "interactive":
@@ -648,6 +768,11 @@ async def serve_js():
         return FileResponse(js_path, media_type="application/javascript")
     raise HTTPException(status_code=404, detail="JavaScript not found")
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: per-stage and per-route duration histograms."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {
@@ -657,7 +782,10 @@ async def health_check():
             "pdf_takeoff": TAKEOFF_AVAILABLE,
             "ml_model": ML_MODEL_AVAILABLE,
             "excel_reports": EXCEL_AVAILABLE
-        }
+        },
+        "models": get_model_registry().stats(),
+        "schemas": get_schema_registry().stats(),
+        "run_log": get_run_log().stats(),
     }
 
 @app.post("/v1/plan/features")
@@ -671,12 +799,10 @@ async def plan_features_v1(req: Dict[str, Any]):
         if not pdf_path or not os.path.exists(pdf_path):
             raise HTTPException(status_code=400, detail="pdf_path missing or file not found")
 
-        data = extract_plan_features(pdf_path)
+        data = _cached_plan_features(pdf_path)
 
         # Runtime validation against authoritative v0 schema
-        with open("schemas/plan_features.schema.json", "r", encoding="utf-8") as f:
-            schema = json.load(f)
-        jsonschema.validate(instance=data, schema=schema)
+        get_schema_registry().validate("plan_features", data)
 
         return data
     except HTTPException:
@@ -684,6 +810,53 @@ async def plan_features_v1(req: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _takeoff_log(msg: str) -> None:
+    log_event(TAKEOFF_LOG, msg, source="api")
+
+def _takeoff_flags() -> tuple:
+    # R2.1: Optional layout stage; R2.2: Optional rooms detection
+    enable_layout = os.environ.get("TAKEOFF_ENABLE_LAYOUT", "").lower() == "true"
+    enable_rooms = os.environ.get("TAKEOFF_ENABLE_ROOMFINDER", "").lower() == "true"
+    return enable_layout, enable_rooms
+
+def _run_takeoff(project_id: str, document: PdfDocument, route: str = "/v1/takeoff", progress=None) -> dict:
+    """
+    Blocking takeoff over one open document → validated v0 body. Call it from a
+    worker thread (run_in_threadpool or the job queue), never on the event loop.
+    `progress(**fields)`, when given, receives per-page updates on a cache miss.
+    """
+    eng = TakeoffEngine(max_pages=3)
+    _takeoff_log(f"[F2] {route}: start")
+    enable_layout, enable_rooms = _takeoff_flags()
+    if enable_layout:
+        _takeoff_log(f"[R2.1] {route}: layout stage enabled")
+    if enable_rooms:
+        _takeoff_log(f"[R2.2] {route}: room detection enabled")
+
+    # Stage outputs are cached by PDF digest + engine settings
+    cache = get_default_cache()
+    if progress is None:
+        meta, stages = eng.run_stages(document, enable_layout=enable_layout, enable_rooms=enable_rooms, cache=cache)
+    else:
+        key = cache.key(document.sha256, "takeoff", eng.cache_settings(enable_layout, enable_rooms))
+        stages = cache.get(key)
+        if stages is None:
+            total = 0
+            for event, payload in eng.iter_stages(document, enable_layout=enable_layout, enable_rooms=enable_rooms):
+                if event == "start":
+                    total = payload["pages_scanned"]
+                    progress(stage="pages", done=0, total=total)
+                elif event == "page":
+                    progress(stage="pages", done=payload["page"], total=total)
+                elif event == "stages":
+                    stages = payload
+            cache.put(key, stages)
+        meta = PdfMeta(project_id="", source_pdf=document.source, pages_scanned=int(stages.get("pages_scanned") or 0))
+    with stage("takeoff.response"):
+        resp_dict = _takeoff_response(eng, project_id, meta, stages)
+    _takeoff_log(f"[F2] {route}: success")
+    return resp_dict
+
 @app.post("/v1/takeoff")
 async def takeoff_v1(req: Dict[str, Any]):
     """
@@ -692,16 +865,9 @@ async def takeoff_v1(req: Dict[str, Any]):
       A) {"project_id": "...", "pdf_path": "path/to.pdf"}
       B) {"project_id": "...", "pdf_base64": "<base64>"}
     Logs steps to output/TAKEOFF_RUN.log and validates output at runtime.
+    The extraction runs in a worker thread so other requests keep being served;
+    for large sets prefer POST /v1/jobs/takeoff.
     """
-    # Logging helper (local)
-    def _log(msg: str) -> None:
-        try:
-            os.makedirs("output", exist_ok=True)
-            with open("output/TAKEOFF_RUN.log", "a", encoding="utf-8") as f:
-                f.write(msg.rstrip() + "\n")
-        except Exception:
-            pass
-
     project_id = (req or {}).get("project_id")
     pdf_path = (req or {}).get("pdf_path")
     pdf_b64 = (req or {}).get("pdf_base64")
@@ -709,108 +875,205 @@ async def takeoff_v1(req: Dict[str, Any]):
     if not project_id or not (pdf_path or pdf_b64):
         raise HTTPException(status_code=400, detail="project_id and one of pdf_path|pdf_base64 are required")
 
+    def _work() -> dict:
+        # Open (and base64-decode) the PDF once; every stage reuses it
+        with stage("pdf.decode"):
+            document = PdfDocument.from_request(pdf_path=pdf_path, pdf_base64=pdf_b64)
+        with document:
+            return _run_takeoff(project_id, document)
+
     try:
-        eng = TakeoffEngine(max_pages=3)
-        _log("[F2] /v1/takeoff: start")
-        meta, pages, pages_text = eng.load_pdf(pdf_path=pdf_path, pdf_base64=pdf_b64)
-        meta.project_id = project_id
-
-        scale = eng.detect_scale(pages_text)
-        geom = eng.extract_geometry(pages)
-        fixtures = eng.detect_fixtures(pages_text)
-
-        # R2.1: Optional layout stage
-        layout = None
-        if os.environ.get("TAKEOFF_ENABLE_LAYOUT", "").lower() == "true":
-            _log("[R2.1] /v1/takeoff: layout stage enabled")
-            actual_pdf_path = pdf_path if pdf_path else None
-            if not actual_pdf_path and pdf_b64:
-                # Save base64 to temp file for layout analysis
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(base64.b64decode(pdf_b64))
-                    actual_pdf_path = tmp_file.name
-            if actual_pdf_path:
-                layout = eng.detect_layout(actual_pdf_path)
-                if pdf_b64 and actual_pdf_path != pdf_path:
-                    os.unlink(actual_pdf_path)  # cleanup temp file
-
-        # R2.2: Optional rooms detection
-        rooms = None
-        if os.environ.get("TAKEOFF_ENABLE_ROOMFINDER", "").lower() == "true":
-            _log("[R2.2] /v1/takeoff: room detection enabled")
-            actual_pdf_path = pdf_path if pdf_path else None
-            if not actual_pdf_path and pdf_b64:
-                # Save base64 to temp file for room analysis
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(base64.b64decode(pdf_b64))
-                    actual_pdf_path = tmp_file.name
-            if actual_pdf_path:
-                rooms = eng.detect_rooms(actual_pdf_path)
-                if pdf_b64 and actual_pdf_path != pdf_path:
-                    os.unlink(actual_pdf_path)  # cleanup temp file
-
-        quantities_v0 = eng.to_quantities(project_id, meta, geom, fixtures, scale, layout, rooms)
-
-        # Runtime validation against authoritative v0 schema (object form),
-        # then normalize trades to array shape for clients/UAT.
-        with open("schemas/trade_quantities.schema.json", "r", encoding="utf-8") as f:
-            schema = json.load(f)
-        obj_form = _coerce_trades_object(quantities_v0)
-        # Ensure mandatory v0 envelope fields before schema validation
-        if not isinstance(obj_form, dict):
-            obj_form = {}
-        if "version" not in obj_form:
-            obj_form["version"] = "v0"
-        meta = obj_form.get("meta") or {}
-        if "project_id" not in meta:
-            meta["project_id"] = project_id
-        obj_form["meta"] = meta
-
-        # Validate object form; on failure, build a minimal valid fallback
+        return attach_timings(await run_in_threadpool(_work))
+    except HTTPException:
+        raise
+    except Exception as e:
+        _takeoff_log(f"[F2] /v1/takeoff: error {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/v1/takeoff/stream")
+async def takeoff_stream_v1(req: Dict[str, Any]):
+    """
+    Streaming /v1/takeoff (NDJSON, one JSON object per line):
+      {"event": "start", "pages_total", "pages_scanned", "cached"}
+      {"event": "page", "page", "scale", "geometry", "fixtures"}   as each page finishes
+      {"event": "layout" | "rooms", ...}                           when enabled
+      {"event": "result", "trade_quantities": <same body as /v1/takeoff>}
+      {"event": "error", "detail"}                                 on failure mid-stream
+    Same request shapes as /v1/takeoff plus optional "max_pages" (default 3).
+    A cached takeoff for the same PDF/settings skips straight to "result".
+    """
+    _log = _takeoff_log
+    project_id = (req or {}).get("project_id")
+    pdf_path = (req or {}).get("pdf_path")
+    pdf_b64 = (req or {}).get("pdf_base64")
+    if not project_id or not (pdf_path or pdf_b64):
+        raise HTTPException(status_code=400, detail="project_id and one of pdf_path|pdf_base64 are required")
+    try:
+        max_pages = max(1, int((req or {}).get("max_pages") or 3))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="max_pages must be an integer")
+
+    try:
+        document = PdfDocument.from_request(pdf_path=pdf_path, pdf_base64=pdf_b64)
+    except Exception as e:
+        _log(f"[F2] /v1/takeoff/stream: error {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    enable_layout, enable_rooms = _takeoff_flags()
+
+    def _line(event: str, payload: Dict[str, Any]) -> bytes:
+        return (json.dumps({"event": event, **payload}, default=str) + "\n").encode("utf-8")
+
+    # Sync generator: Starlette iterates it in a worker thread, so page work
+    # does not block the event loop.
+    def _events():
+        eng = TakeoffEngine(max_pages=max_pages)
+        cache = get_default_cache()
+        key = cache.key(document.sha256, "takeoff", eng.cache_settings(enable_layout, enable_rooms))
         try:
-            jsonschema.validate(instance=obj_form, schema=schema)
-        except Exception:
-            obj_form = {
-                "version": "v0",
-                "meta": {"project_id": project_id},
-                "trades": {
-                    "general": {
-                        "items": [
-                            {
-                                "code": "placeholder",
-                                "description": "normalized fallback",
-                                "unit": "ea",
-                                "quantity": 0
-                            }
-                        ]
-                    }
+            _log("[F2] /v1/takeoff/stream: start")
+            stages = cache.get(key)
+            if stages is not None:
+                _log(f"[F2] /v1/takeoff/stream: cache hit key={key[:12]}")
+                yield _line("start", {"pages_total": None, "pages_scanned": stages.get("pages_scanned"),
+                                      "cached": True})
+            else:
+                for event, payload in eng.iter_stages(document, enable_layout=enable_layout,
+                                                      enable_rooms=enable_rooms):
+                    if event == "stages":
+                        stages = payload
+                        break
+                    if event == "start":
+                        payload = {**payload, "cached": False}
+                    yield _line(event, payload)
+                cache.put(key, stages)
+            meta = PdfMeta(project_id=project_id, source_pdf=document.source,
+                           pages_scanned=int(stages.get("pages_scanned") or 0))
+            yield _line("result", {"trade_quantities": _takeoff_response(eng, project_id, meta, stages)})
+            _log("[F2] /v1/takeoff/stream: success")
+        except Exception as e:
+            _log(f"[F2] /v1/takeoff/stream: error {e}")
+            yield _line("error", {"detail": str(e)})
+        finally:
+            document.close()
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+def _run_comprehensive_estimate(content: bytes,
+                                pdf_path: str,
+                                project_name: str,
+                                project_type: str,
+                                finish_quality: str,
+                                design_complexity: str,
+                                features_list: List[str],
+                                excel_path: Optional[str] = None,
+                                progress=None) -> Dict[str, Any]:
+    """
+    Blocking body of /comprehensive-estimate (takeoff → ML estimate → Excel).
+    Returns {"takeoff_data", "estimate", "excel_path"}; excel_path is None when
+    the report could not be written. Runs in a worker thread or job.
+    """
+    progress = progress or (lambda **fields: None)
+
+    # ====================================================================
+    # STEP 1: PDF TAKEOFF
+    # ====================================================================
+    progress(stage="takeoff")
+    takeoff_data = None
+    area_sf = None
+
+    # Repeat uploads of the same plan set reuse the cached takeoff. Keyed like the
+    # engine's stages (rules digest, flags) plus the pipeline version; every page is scanned.
+    takeoff_cache = get_default_cache()
+    takeoff_settings = TakeoffEngine().cache_settings(*_takeoff_flags())
+    takeoff_settings.update(max_pages=None, pipeline=TAKEOFF_PIPELINE_VERSION)
+    takeoff_key = takeoff_cache.key(sha256_bytes(content), "comprehensive_takeoff", takeoff_settings)
+    cached_takeoff = takeoff_cache.get(takeoff_key) if TAKEOFF_AVAILABLE else None
+    if cached_takeoff is not None:
+        print("[*] Using cached takeoff data")
+        takeoff_data = cached_takeoff
+        area_sf = cached_takeoff.get("estimated_area_sf")
+    elif TAKEOFF_AVAILABLE:
+        try:
+            print("[*] Extracting takeoff data from PDF...")
+            lines, polys = extract_drawings(pdf_path)
+            text = extract_page_text(pdf_path)
+            scale = try_parse_scale_from_text(text)
+
+            if not scale:
+                scale = estimate_scale_from_walls(lines)
+
+            if scale:
+                df_lines = summarize_lines(lines, scale)
+                df_polys = summarize_polygons(polys, scale)
+
+                # Estimate area from polygons
+                if not df_polys.empty:
+                    area_col = [c for c in df_polys.columns if 'area_' in c]
+                    if area_col:
+                        area_sf = df_polys[area_col[0]].sum()
+
+                takeoff_data = {
+                    "scale_value": scale.real_per_pdf,
+                    "scale_units": scale.real_units_name,
+                    "total_lines": len(lines),
+                    "total_polygons": len(polys),
+                    "lines_summary": df_lines.to_dict('records') if not df_lines.empty else [],
+                    "polygons_summary": df_polys.to_dict('records') if not df_polys.empty else [],
+                    "estimated_area_sf": area_sf
                 }
-            }
+                takeoff_cache.put(takeoff_key, takeoff_data)
+        except Exception as e:
+            print(f"[!] Takeoff error: {e}")
+            takeoff_data = {"error": str(e)}
+
+    # Use manual input if takeoff didn't work
+    if not area_sf:
+        area_sf = 3000  # Default fallback
+
+    # ====================================================================
+    # STEP 2: ML MODEL ESTIMATION
+    # ====================================================================
+    progress(stage="estimate")
+    if ML_MODEL_AVAILABLE:
+        with stage("ml.estimate"):
+            estimate_result = estimate_with_specifications(
+                area_sf=area_sf,
+                project_type=project_type,
+                finish_quality=finish_quality,
+                design_complexity=design_complexity,
+                special_features=features_list
+            )
+    else:
+        # Fallback simple estimation
+        base_cost_per_sf = 500
+        estimate_result = {
+            "area_sf": area_sf,
+            "total_cost": area_sf * base_cost_per_sf,
+            "cost_per_sf": base_cost_per_sf,
+            "hard_costs": {"total_hard": area_sf * base_cost_per_sf * 0.70},
+            "soft_costs": {"total_soft": area_sf * base_cost_per_sf * 0.30}
+        }
 
-        resp_dict = _normalize_trades_shape(obj_form)
-        # Provide compatibility aliases for clients/tests
+    # ====================================================================
+    # STEP 3: GENERATE EXCEL REPORT
+    # ====================================================================
+    written = None
+    if EXCEL_AVAILABLE:
+        progress(stage="excel")
         try:
-            meta_alias = obj_form.get("meta") or {}
-            if isinstance(meta_alias, dict):
-                if "project_id" not in meta_alias:
-                    meta_alias["project_id"] = project_id
-                resp_dict["metadata"] = dict(meta_alias)
-            else:
-                resp_dict["metadata"] = {"project_id": project_id}
-            resp_dict["project_id"] = project_id
-        except Exception:
-            resp_dict["project_id"] = project_id
-            resp_dict["metadata"] = {"project_id": project_id}
+            excel_path = excel_path or tempfile.mktemp(suffix='.xlsx')
+            generate_comprehensive_excel(
+                project_data={"project_name": project_name},
+                takeoff_data=takeoff_data or {},
+                estimate_data=estimate_result,
+                output_path=excel_path
+            )
+            written = excel_path
+        except Exception as e:
+            print(f"[!] Excel generation error: {e}")
 
-        _log("[F2] /v1/takeoff: success")
-        return resp_dict
-    except HTTPException:
-        raise
-    except Exception as e:
-        _log(f"[F2] /v1/takeoff: error {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"takeoff_data": takeoff_data, "estimate": estimate_result, "excel_path": written}
 
 @app.post("/comprehensive-estimate")
 async def comprehensive_estimate(
@@ -826,6 +1089,8 @@ async def comprehensive_estimate(
     1. PDF takeoff with OCR
     2. ML model prediction
     3. Comprehensive Excel report generation
+    The pipeline runs in a worker thread; POST /v1/jobs/comprehensive-estimate
+    queues it instead and returns a job id.
     """
     
     if not file.filename.lower().endswith('.pdf'):
@@ -840,87 +1105,11 @@ async def comprehensive_estimate(
         pdf_path = tmp_file.name
     
     try:
-        # ====================================================================
-        # STEP 1: PDF TAKEOFF
-        # ====================================================================
-        takeoff_data = None
-        area_sf = None
-        
-        if TAKEOFF_AVAILABLE:
-            try:
-                print("[*] Extracting takeoff data from PDF...")
-                lines, polys = extract_drawings(pdf_path)
-                text = extract_page_text(pdf_path)
-                scale = try_parse_scale_from_text(text)
-                
-                if not scale:
-                    scale = estimate_scale_from_walls(lines)
-                
-                if scale:
-                    df_lines = summarize_lines(lines, scale)
-                    df_polys = summarize_polygons(polys, scale)
-                    
-                    # Estimate area from polygons
-                    if not df_polys.empty:
-                        area_col = [c for c in df_polys.columns if 'area_' in c]
-                        if area_col:
-                            area_sf = df_polys[area_col[0]].sum()
-                    
-                    takeoff_data = {
-                        "scale_value": scale.real_per_pdf,
-                        "scale_units": scale.real_units_name,
-                        "total_lines": len(lines),
-                        "total_polygons": len(polys),
-                        "lines_summary": df_lines.to_dict('records') if not df_lines.empty else [],
-                        "polygons_summary": df_polys.to_dict('records') if not df_polys.empty else [],
-                        "estimated_area_sf": area_sf
-                    }
-            except Exception as e:
-                print(f"[!] Takeoff error: {e}")
-                takeoff_data = {"error": str(e)}
-        
-        # Use manual input if takeoff didn't work
-        if not area_sf:
-            area_sf = 3000  # Default fallback
-        
-        # ====================================================================
-        # STEP 2: ML MODEL ESTIMATION
-        # ====================================================================
-        if ML_MODEL_AVAILABLE:
-            estimate_result = estimate_with_specifications(
-                area_sf=area_sf,
-                project_type=project_type,
-                finish_quality=finish_quality,
-                design_complexity=design_complexity,
-                special_features=features_list
-            )
-        else:
-            # Fallback simple estimation
-            base_cost_per_sf = 500
-            estimate_result = {
-                "area_sf": area_sf,
-                "total_cost": area_sf * base_cost_per_sf,
-                "cost_per_sf": base_cost_per_sf,
-                "hard_costs": {"total_hard": area_sf * base_cost_per_sf * 0.70},
-                "soft_costs": {"total_soft": area_sf * base_cost_per_sf * 0.30}
-            }
-        
-        # ====================================================================
-        # STEP 3: GENERATE EXCEL REPORT
-        # ====================================================================
-        excel_path = None
-        if EXCEL_AVAILABLE:
-            try:
-                excel_path = tempfile.mktemp(suffix='.xlsx')
-                generate_comprehensive_excel(
-                    project_data={"project_name": project_name},
-                    takeoff_data=takeoff_data or {},
-                    estimate_data=estimate_result,
-                    output_path=excel_path
-                )
-            except Exception as e:
-                print(f"[!] Excel generation error: {e}")
-                excel_path = None
+        out = await run_in_threadpool(
+            _run_comprehensive_estimate, content, pdf_path, project_name, project_type,
+            finish_quality, design_complexity, features_list,
+        )
+        takeoff_data, estimate_result, excel_path = out["takeoff_data"], out["estimate"], out["excel_path"]
         
         # Clean up PDF
         os.unlink(pdf_path)
@@ -941,12 +1130,12 @@ async def comprehensive_estimate(
             )
         else:
             # Return JSON if Excel failed
-            return {
+            return attach_timings({
                 "status": "success",
                 "takeoff_data": takeoff_data,
                 "estimate": estimate_result,
                 "excel_available": False
-            }
+            })
             
     except Exception as e:
         if 'pdf_path' in locals():
@@ -956,6 +1145,170 @@ async def comprehensive_estimate(
                 pass
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+def _takeoff_job(job_dir: str, params: Dict[str, Any], progress) -> Dict[str, Any]:
+    document = PdfDocument.from_path(os.path.join(job_dir, "input.pdf"))
+    document.source = params.get("source_pdf") or document.source
+    with document:
+        return _run_takeoff(params["project_id"], document, route="job:takeoff", progress=progress)
+
+def _comprehensive_estimate_job(job_dir: str, params: Dict[str, Any], progress) -> Dict[str, Any]:
+    pdf_path = os.path.join(job_dir, "input.pdf")
+    with open(pdf_path, "rb") as f:
+        content = f.read()
+    out = _run_comprehensive_estimate(
+        content, pdf_path, params.get("project_name", "Unnamed Project"), params.get("project_type", "residential"),
+        params.get("finish_quality", "standard"), params.get("design_complexity", "moderate"),
+        params.get("special_features") or [], excel_path=os.path.join(job_dir, "result.xlsx"),
+        progress=progress,
+    )
+    return {
+        "status": "success",
+        "takeoff_data": out["takeoff_data"],
+        "estimate": out["estimate"],
+        "excel_available": bool(out["excel_path"]),
+        "artifact": os.path.basename(out["excel_path"]) if out["excel_path"] else None,
+    }
+
+def _job_queue() -> JobQueue:
+    queue = get_job_queue()
+    queue.register("takeoff", _takeoff_job)
+    queue.register("comprehensive_estimate", _comprehensive_estimate_job)
+    return queue
+
+@app.on_event("startup")
+async def _preload_models():
+    # Warm-up in the background so /health answers immediately: TAKEOFF_PRELOAD_MODELS picks
+    # the models; otherwise layout-enabled deployments preload the layout detector.
+    registry = get_model_registry()
+    names = preload_names(registry)
+    if not names and _takeoff_flags()[0] and LAYOUT_MODEL in registry.names():
+        names = [LAYOUT_MODEL]
+    if names:
+        threading.Thread(target=registry.warm_up, args=(names,), name="model-warmup", daemon=True).start()
+        print(f"[*] Warming up models: {', '.join(names)}")
+
+@app.on_event("startup")
+async def _load_schemas():
+    # Compile every schemas/*.json once; handlers validate through the cached validators
+    registry = get_schema_registry()
+    failed = [n for n, s in registry.stats()["schemas"].items() if not s["loaded"]]
+    if failed:
+        print(f"[!] Schemas failed to load: {', '.join(failed)}")
+
+@app.on_event("shutdown")
+async def _flush_run_log():
+    get_run_log().flush(timeout=2.0)
+
+@app.on_event("startup")
+async def _recover_jobs():
+    # Jobs interrupted by a restart still have their input on disk; queue them again
+    requeued = _job_queue().recover()
+    if requeued:
+        print(f"[*] Re-queued {len(requeued)} interrupted job(s)")
+
+def _job_accepted(record: Dict[str, Any]) -> JSONResponse:
+    job_id = record["id"]
+    return JSONResponse(status_code=202, content={
+        "job_id": job_id,
+        "status": record.get("status"),
+        "status_url": f"/v1/jobs/{job_id}",
+        "result_url": f"/v1/jobs/{job_id}/result",
+    })
+
+@app.post("/v1/jobs/takeoff")
+async def submit_takeoff_job(req: Dict[str, Any]):
+    """Queue a /v1/takeoff run (same body); returns 202 with a job id to poll."""
+    project_id = (req or {}).get("project_id")
+    pdf_path = (req or {}).get("pdf_path")
+    pdf_b64 = (req or {}).get("pdf_base64")
+    if not project_id or not (pdf_path or pdf_b64):
+        raise HTTPException(status_code=400, detail="project_id and one of pdf_path|pdf_base64 are required")
+    try:
+        document = PdfDocument.from_request(pdf_path=pdf_path, pdf_base64=pdf_b64)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"invalid pdf_base64: {e}")
+    try:
+        record = _job_queue().submit("takeoff", {"project_id": project_id, "source_pdf": document.source},
+                                     pdf_bytes=document.data)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"job queue full: {e}")
+    return _job_accepted(record)
+
+@app.post("/v1/jobs/comprehensive-estimate")
+async def submit_comprehensive_estimate_job(
+    file: UploadFile = File(...),
+    project_name: str = "Unnamed Project",
+    project_type: str = "residential",
+    finish_quality: str = "standard",
+    design_complexity: str = "moderate",
+    special_features: str = "[]"
+):
+    """Queue a /comprehensive-estimate run; the Excel report is served from /v1/jobs/{id}/artifact."""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files supported")
+    try:
+        features_list = json.loads(special_features) if special_features else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="special_features must be a JSON list")
+    content = await file.read()
+    params = {
+        "project_name": project_name,
+        "project_type": project_type,
+        "finish_quality": finish_quality,
+        "design_complexity": design_complexity,
+        "special_features": features_list,
+        "file_name": file.filename,
+    }
+    try:
+        record = _job_queue().submit("comprehensive_estimate", params, pdf_bytes=content)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"job queue full: {e}")
+    return _job_accepted(record)
+
+@app.get("/v1/jobs")
+async def list_jobs(limit: int = 50):
+    queue = _job_queue()
+    return {"queue": queue.stats(), "jobs": queue.list_jobs(limit=limit)}
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    record = _job_queue().get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return record
+
+@app.get("/v1/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    queue = _job_queue()
+    record = queue.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if record.get("status") == "failed":
+        raise HTTPException(status_code=500, detail=record.get("error") or "job failed")
+    if record.get("status") != "succeeded":
+        return JSONResponse(status_code=409, content={"job_id": job_id, "status": record.get("status"),
+                                                      "progress": record.get("progress")})
+    return queue.result(job_id)
+
+@app.get("/v1/jobs/{job_id}/artifact")
+async def get_job_artifact(job_id: str):
+    queue = _job_queue()
+    result = queue.result(job_id)
+    artifact = (result or {}).get("artifact")
+    if not artifact:
+        raise HTTPException(status_code=404, detail="no artifact for this job")
+    return FileResponse(
+        os.path.join(queue.job_dir(job_id), artifact),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=f"JCW_Estimate_{job_id[:8]}.xlsx",
+    )
+
 @app.post("/feedback")
 async def submit_feedback(feedback: EstimateFeedback):
     """Submit actual costs for ML model improvement"""
@@ -1011,22 +1364,15 @@ def _ensure_v0_quantities(obj: dict):
 @app.post("/v1/interactive/assess")
 async def interactive_assess(req: Request):
     """Interactive assess endpoint with hardened error handling"""
-    request_id = str(uuid.uuid4())
+    request_id = current_request_id() or str(uuid.uuid4())
     start_time = time.time()
 
     # Log request start
     try:
-        os.makedirs("output/INTERACTIVE", exist_ok=True)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/assess",
-                "stage": "start",
-                "body_keys": list((await req.json()).keys()) if req.method == "POST" else []
-            }) + "\n")
+        body_keys = list((await req.json()).keys()) if req.method == "POST" else []
     except Exception:
-        pass  # Continue if logging fails
+        body_keys = []
+    log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/assess", stage="start", body_keys=body_keys)
 
     try:
         # Parse and validate request
@@ -1068,16 +1414,11 @@ async def interactive_assess(req: Request):
         # Extract plan features
         try:
             if pdf_path:
-                plan_features = extract_plan_features(pdf_path)
+                plan_features = _cached_plan_features(pdf_path)
             else:
-                # Save base64 to temp file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(base64.b64decode(pdf_b64))
-                    temp_pdf_path = tmp_file.name
-                try:
-                    plan_features = extract_plan_features(temp_pdf_path)
-                finally:
-                    os.unlink(temp_pdf_path)
+                # Decode base64 in memory; no temp file round-trip
+                with PdfDocument.from_base64(pdf_b64) as document:
+                    plan_features = _cached_plan_features(document)
         except Exception as e:
             return JSONResponse(status_code=422, content={
                 'error': 'VALIDATION',
@@ -1105,9 +1446,7 @@ async def interactive_assess(req: Request):
         }
 
         # Validate response
-        with open("schemas/assess_response.schema.json", "r") as f:
-            schema = json.load(f)
-        jsonschema.validate(assess_response, schema)
+        get_schema_registry().validate("assess_response", assess_response)
 
         # Write output files
         os.makedirs(f"output/{project_id}", exist_ok=True)
@@ -1118,30 +1457,14 @@ async def interactive_assess(req: Request):
 
         # Log success
         duration_ms = int((time.time() - start_time) * 1000)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/assess",
-                "stage": "success",
-                "duration_ms": duration_ms,
-                "questions_count": len(questions)
-            }) + "\n")
+        log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/assess", stage="success", duration_ms=duration_ms, questions_count=len(questions))
 
         return assess_response
 
     except Exception as e:
         # Log error
         duration_ms = int((time.time() - start_time) * 1000)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/assess",
-                "stage": "error",
-                "duration_ms": duration_ms,
-                "error": str(e)
-            }) + "\n")
+        log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/assess", stage="error", duration_ms=duration_ms, error=str(e))
 
         return JSONResponse(status_code=500, content={
             'error': 'PROCESSING',
@@ -1153,22 +1476,15 @@ async def interactive_assess(req: Request):
 @app.post("/v1/interactive/qna")
 async def interactive_qna(req: Request):
     """Interactive QnA endpoint with hardened error handling"""
-    request_id = str(uuid.uuid4())
+    request_id = current_request_id() or str(uuid.uuid4())
     start_time = time.time()
 
     # Log request start
     try:
-        os.makedirs("output/INTERACTIVE", exist_ok=True)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/qna",
-                "stage": "start",
-                "body_keys": list((await req.json()).keys()) if req.method == "POST" else []
-            }) + "\n")
+        body_keys = list((await req.json()).keys()) if req.method == "POST" else []
     except Exception:
-        pass  # Continue if logging fails
+        body_keys = []
+    log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/qna", stage="start", body_keys=body_keys)
 
     try:
         # Parse and validate request
@@ -1269,30 +1585,14 @@ async def interactive_qna(req: Request):
 
         # Log success
         duration_ms = int((time.time() - start_time) * 1000)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/qna",
-                "stage": "success",
-                "duration_ms": duration_ms,
-                "answered_count": len(answered)
-            }) + "\n")
+        log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/qna", stage="success", duration_ms=duration_ms, answered_count=len(answered))
 
         return response
 
     except Exception as e:
         # Log error
         duration_ms = int((time.time() - start_time) * 1000)
-        with open("output/INTERACTIVE/INTERACTIVE_RUN.log", "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "request_id": request_id,
-                "endpoint": "/v1/interactive/qna",
-                "stage": "error",
-                "duration_ms": duration_ms,
-                "error": str(e)
-            }) + "\n")
+        log_event(INTERACTIVE_LOG, request_id=request_id, endpoint="/v1/interactive/qna", stage="error", duration_ms=duration_ms, error=str(e))
 
         return JSONResponse(status_code=500, content={
             'error': 'PROCESSING',
@@ -1301,6 +1601,55 @@ async def interactive_qna(req: Request):
         })
 
 
+@app.post("/v1/pricing/sessions")
+async def create_pricing_session(req: Dict[str, Any]):
+    """Price once and keep the estimate in memory for incremental deltas (same inputs as /v1/estimate)."""
+    quantities = _flatten_v0_quantities((req or {}).get("quantities") or [])
+    if not isinstance(quantities, list):
+        raise HTTPException(status_code=400, detail="quantities must be a list or a v0 object")
+    try:
+        session = PricingSession(
+            quantities,
+            policy_yaml=_read_if_path(req.get("policy")),
+            region=req.get("region"),
+            unit_costs_csv=_read_if_path(req.get("unit_costs_csv")),
+            vendor_quotes_csv=_read_if_path(req.get("vendor_quotes_csv")),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid quantities: {e}")
+    session_id = get_session_store().create(session)
+    return {"session_id": session_id, **session.response()}
+
+@app.get("/v1/pricing/sessions/{session_id}")
+async def get_pricing_session(session_id: str):
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="pricing session not found")
+    return {"session_id": session_id, **session.response()}
+
+@app.post("/v1/pricing/sessions/{session_id}/delta")
+async def apply_pricing_delta(session_id: str, req: Dict[str, Any]):
+    """
+    Re-price only what changed. Body keys (all optional): quantities {"<line index>": qty},
+    unit_costs / vendor_quotes [{"trade","code","unit_cost"|null}], waste_defaults {trade: pct},
+    markups {overhead_pct, profit_pct}, tax_pct, escalation_pct.
+    """
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="pricing session not found")
+    fields = ("quantities", "unit_costs", "vendor_quotes", "waste_defaults", "markups", "tax_pct", "escalation_pct")
+    try:
+        with session.lock:
+            return session.apply(**{k: req.get(k) for k in fields if req.get(k) is not None})
+    except (IndexError, TypeError, ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid delta: {e}")
+
+@app.delete("/v1/pricing/sessions/{session_id}")
+async def delete_pricing_session(session_id: str):
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="pricing session not found")
+    return {"session_id": session_id, "deleted": True}
+
 @app.post("/v1/interactive/estimate")
 async def interactive_estimate(req: Request):
     try:
@@ -1331,21 +1680,20 @@ async def interactive_estimate(req: Request):
 
     # (optional) jsonschema validation with first error message caught in try-except
     try:
-        with open("schemas/trade_quantities.schema.json", "r", encoding="utf-8") as f:
-            schema = json.load(f)
-        jsonschema.validate(qnorm, schema)
+        get_schema_registry().validate("trade_quantities", qnorm)
     except Exception as e:
         _write_interactive_log({'route':'interactive/estimate','stage':'jsonschema','error':str(e)})
         return JSONResponse(status_code=422, content={'error':'VALIDATION','detail':'quantities schema invalid'})
 
     # price via existing pricing engine, guard any exception
     try:
-        policy = data.get('policy')
-        unit_costs_csv = data.get('unit_costs_csv')
-        vendor_quotes_csv = data.get('vendor_quotes_csv')
+        policy = _read_if_path(data.get('policy'))
+        unit_costs_csv = _read_if_path(data.get('unit_costs_csv'))
+        vendor_quotes_csv = _read_if_path(data.get('vendor_quotes_csv'))
         result = price_quantities(
-            quantities=qnorm,
+            quantities=_flatten_v0_quantities(qnorm),
             policy_yaml=policy,
+            region=data.get('region'),
             unit_costs_csv=unit_costs_csv,
             vendor_quotes_csv=vendor_quotes_csv,
         )
@@ -1369,7 +1717,7 @@ async def plan_assess(req: Dict[str, Any]):
 
     # Load plan features
     if pdf_path:
-        plan_features = extract_plan_features(pdf_path)
+        plan_features = _cached_plan_features(pdf_path)
     else:
         plan_features = {"full_text": "", "sheet_titles": []}
 
@@ -1389,9 +1737,7 @@ async def plan_assess(req: Dict[str, Any]):
     }
 
     # Validate
-    with open("schemas/assess_response.schema.json", "r") as f:
-        schema = json.load(f)
-    jsonschema.validate(assess_response, schema)
+    get_schema_registry().validate("assess_response", assess_response)
 
     # Write files
     os.makedirs(f"output/{project_id}", exist_ok=True)
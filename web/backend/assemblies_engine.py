@@ -23,26 +23,147 @@ variables:
   wall_sf: "area_sqft * 0.5"
 
 Formulas:
-- Python expressions evaluated with a restricted variable scope drawn from plan_features and 'variables' evaluated results.
-- Allowed keys in scope: numbers, dicts, and precomputed variables.
-- No builtins or modules exposed.
+- Arithmetic expressions over plan_features-derived names (area_sqft, fixture_count,
+  fixtures["..."] / fixtures.get("...", 0)) and the file's 'variables'.
+- Each formula is parsed once, checked against an AST whitelist (numbers, names,
+  + - * / // % **, comparisons, `a if c else b`, min/max/abs/round) and compiled
+  to a code object. No other builtins, attributes or modules are reachable.
+- Variables are evaluated in dependency order (a variable may use one defined
+  later in the file); cycles and invalid formulas evaluate to 0.
+- Non-finite results (x/0, overflow) count as 0.
+
+Compiled files are cached per path and rebuilt when the file's mtime/size
+changes. AssemblySet.expand_many evaluates one set against many plan_features
+dicts, column-wise with NumPy for files whose formulas are pure arithmetic.
 """
 from __future__ import annotations
 
+import ast
+import math
 import os
+import threading
 import yaml
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+    _HAVE_NUMPY = True
+except ImportError:
+    _HAVE_NUMPY = False
+
+
+class FormulaError(ValueError):
+    pass
+
+
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub)
+_CMP_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+_FUNCS = {"min": min, "max": max, "abs": abs, "round": round}
+_ARITY = {"min": (2, 64), "max": (2, 64), "abs": (1, 1), "round": (1, 2)}
+# Names that index plan_features per project and are never scalar columns
+_MAPPING_NAMES = {"fixtures"}
+# Names every project scope starts with (see _scope_base); a variable of the same
+# name may refine them ("area_sqft * 1.1" reads the plan_features value)
+_BASE_NAMES = {"area_sqft", "fixtures", "fixture_count"}
+
+
+class Formula:
+    """One validated, compiled expression."""
+
+    def __init__(self, expr: Any) -> None:
+        self.source = str(expr)
+        try:
+            tree = ast.parse(self.source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise FormulaError(f"syntax error in {self.source!r}: {e.msg}") from None
+        self.names: Set[str] = set()
+        # pure arithmetic over scalar names (safe to evaluate on NumPy columns)
+        self.vectorizable = True
+        self._check(tree.body)
+        self.code = compile(tree, "<formula>", "eval")
+
+    def _check(self, node: ast.AST) -> None:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise FormulaError(f"only numeric constants allowed in {self.source!r}")
+        elif isinstance(node, ast.Name):
+            if node.id in _FUNCS:
+                raise FormulaError(f"{node.id} must be called in {self.source!r}")
+            self.names.add(node.id)
+            if node.id in _MAPPING_NAMES:
+                self.vectorizable = False
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, _BIN_OPS):
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARY_OPS):
+            self._check(node.operand)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCS:
+            lo, hi = _ARITY[node.func.id]
+            if node.keywords or not lo <= len(node.args) <= hi:
+                raise FormulaError(f"bad arguments to {node.func.id}() in {self.source!r}")
+            for arg in node.args:
+                self._check(arg)
+        elif self._is_mapping_lookup(node):
+            self.vectorizable = False
+            self.names.add(self._lookup_base(node))
+            for arg in getattr(node, "args", [])[1:]:
+                self._check(arg)
+        elif isinstance(node, ast.Compare) and all(isinstance(op, _CMP_OPS) for op in node.ops):
+            self.vectorizable = False
+            self._check(node.left)
+            for c in node.comparators:
+                self._check(c)
+        elif isinstance(node, ast.IfExp):
+            self.vectorizable = False
+            for child in (node.test, node.body, node.orelse):
+                self._check(child)
+        else:
+            raise FormulaError(f"unsupported expression {type(node).__name__} in {self.source!r}")
+
+    @staticmethod
+    def _lookup_base(node: ast.AST) -> str:
+        target = node.value if isinstance(node, ast.Subscript) else node.func.value
+        return target.id
+
+    @staticmethod
+    def _is_mapping_lookup(node: ast.AST) -> bool:
+        """fixtures["key"] or fixtures.get("key"[, default])."""
+        if isinstance(node, ast.Subscript):
+            return (isinstance(node.value, ast.Name) and node.value.id in _MAPPING_NAMES
+                    and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            f = node.func
+            return (f.attr == "get" and isinstance(f.value, ast.Name) and f.value.id in _MAPPING_NAMES
+                    and not node.keywords and 1 <= len(node.args) <= 2
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str))
+        return False
+
+    def evaluate(self, scope: Dict[str, Any]) -> float:
+        value = float(eval(self.code, {"__builtins__": {}, **_FUNCS}, scope))
+        return value if math.isfinite(value) else 0.0
+
+
+_FORMULAS: Dict[str, Formula] = {}
+
+
+def compile_formula(expr: Any) -> Formula:
+    """Validated, compiled formula (memoized by source text)."""
+    key = str(expr)
+    formula = _FORMULAS.get(key)
+    if formula is None:
+        formula = _FORMULAS[key] = Formula(key)
+    return formula
 
 
 def _safe_eval(expr: str, scope: Dict[str, Any]) -> float:
     """
     Evaluate a simple arithmetic expression with a restricted scope.
-    This is intentionally minimal and should not expose builtins.
+    Kept for callers of the v0 helper; formulas go through compile_formula.
     """
     if not isinstance(expr, str):
         return 0.0
-    # No builtins; only provided scope
-    return float(eval(expr, {"__builtins__": {}}, dict(scope)))
+    return compile_formula(expr).evaluate(scope)
 
 
 def _load_yaml(path: str) -> Dict[str, Any]:
@@ -57,77 +178,253 @@ def _matches_project_type(doc: Dict[str, Any], project_type: str) -> bool:
     return str(project_type).strip().lower() in {str(x).strip().lower() for x in pts}
 
 
-def expand_from_files(plan_features: Dict[str, Any], yaml_paths: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    """
-    plan_features expected keys (best-effort):
-      - project_id: str
-      - project_type: str
-      - area_sqft: float
-      - fixtures: dict
+def _try_compile(expr: Any, errors: List[str], where: str) -> Optional[Formula]:
+    try:
+        return compile_formula(expr)
+    except FormulaError as e:
+        errors.append(f"{where}: {e}")
+        return None
 
-    Returns:
-      (lines, applied_rules)
-      lines: List[{trade,item,quantity,unit,notes}]
-      applied_rules: List[rule_dict] of rules that contributed > 0 quantity
+
+def _dependency_order(variables: Dict[str, Optional[Formula]], errors: List[str]) -> List[str]:
+    """
+    Variables ordered so each comes after the variables it uses; cycles are dropped (-> 0).
+    A self-reference is only allowed for base names, where it reads the plan_features value.
     """
+    order: List[str] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(name: str, path: List[str]) -> bool:
+        if state.get(name) == 2:
+            return True
+        if state.get(name) == 1:
+            errors.append(f"variables: cycle {' -> '.join(path + [name])}")
+            return False
+        state[name] = 1
+        ok = True
+        formula = variables[name]
+        for dep in sorted(formula.names if formula else ()):
+            if dep in variables and dep != name:
+                ok = visit(dep, path + [name]) and ok
+            elif dep == name and name not in _BASE_NAMES:
+                errors.append(f"variables: {name} refers to itself")
+                ok = False
+        state[name] = 2
+        if ok:
+            order.append(name)
+        else:
+            variables[name] = None
+        return ok
+
+    for name in variables:
+        visit(name, [])
+    return order
+
+
+class CompiledAssembly:
+    """One assembly YAML file, parsed and compiled once."""
+
+    def __init__(self, path: str, doc: Dict[str, Any]) -> None:
+        self.path = path
+        self.doc = doc
+        self.errors: List[str] = []
+        variables: Dict[str, Optional[Formula]] = {}
+        for var_name, var_expr in (doc.get("variables") or {}).items():
+            variables[str(var_name)] = _try_compile(var_expr, self.errors, f"variables.{var_name}")
+        # invalid or cyclic variables evaluate to 0, like a failed eval did
+        order = _dependency_order(variables, self.errors)
+        self.variables: List[Tuple[str, Optional[Formula]]] = (
+            [(n, variables[n]) for n in order] + [(n, None) for n in variables if n not in order])
+
+        self.rules: List[Dict[str, Any]] = []
+        for k, rule in enumerate(doc.get("assemblies") or []):
+            qty_expr = rule.get("formula") or rule.get("quantity") or "0"
+            self.rules.append({
+                "trade": str(rule.get("trade") or "").strip(),
+                "item": str(rule.get("item") or "").strip(),
+                "unit": str(rule.get("unit") or "EA").strip().upper(),
+                "notes": str(rule.get("notes") or ""),
+                "formula": _try_compile(qty_expr, self.errors, f"assemblies[{k}]"),
+                "rule": rule,
+            })
+        formulas = [f for _, f in self.variables] + [r["formula"] for r in self.rules]
+        self.vectorizable = all(f is None or f.vectorizable for f in formulas)
+
+    def matches(self, project_type: str) -> bool:
+        return _matches_project_type(self.doc, project_type)
+
+    def quantities(self, scope: Dict[str, Any]) -> List[float]:
+        """Rule quantities for one project scope (variables are added to `scope`)."""
+        for name, formula in self.variables:
+            try:
+                scope[name] = formula.evaluate(scope) if formula else 0.0
+            except Exception:
+                scope[name] = 0.0
+        out = []
+        for r in self.rules:
+            try:
+                qty = r["formula"].evaluate(scope) if r["formula"] else 0.0
+            except Exception:
+                qty = 0.0
+            out.append(qty)
+        return out
+
+    def quantity_columns(self, columns: Dict[str, Any], n: int) -> Any:
+        """(n, rules) quantities for n projects at once; only valid when vectorizable."""
+        scope = dict(columns)
+        funcs = {"min": _vmin, "max": _vmax, "abs": np.abs, "round": _vround}
+        with np.errstate(all="ignore"):
+            for name, formula in self.variables:
+                scope[name] = self._column(formula, scope, funcs, n)
+            cols = [self._column(r["formula"], scope, funcs, n) for r in self.rules]
+        return np.stack(cols, axis=1) if cols else np.zeros((n, 0))
+
+    @staticmethod
+    def _column(formula: Optional[Formula], scope: Dict[str, Any], funcs: Dict[str, Any], n: int) -> Any:
+        if formula is None:
+            return np.zeros(n)
+        try:
+            value = eval(formula.code, {"__builtins__": {}, **funcs}, scope)
+            col = np.broadcast_to(np.asarray(value, dtype=np.float64), (n,)).copy()
+        except Exception:
+            return np.zeros(n)
+        col[~np.isfinite(col)] = 0.0
+        return col
+
+
+def _vmax(*args: Any) -> Any:
+    out = np.asarray(args[0], dtype=np.float64)
+    for a in args[1:]:
+        out = np.maximum(out, a)
+    return out
+
+
+def _vmin(*args: Any) -> Any:
+    out = np.asarray(args[0], dtype=np.float64)
+    for a in args[1:]:
+        out = np.minimum(out, a)
+    return out
+
+
+def _vround(x: Any, ndigits: int = 0) -> Any:
+    return np.round(x, int(ndigits))
+
+
+_CACHE: Dict[str, Tuple[Tuple[int, int], CompiledAssembly]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def load_assembly(path: str) -> Optional[CompiledAssembly]:
+    """Compiled assembly for `path` (None if missing/unreadable); recompiled when the file changes."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(path)
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        compiled = CompiledAssembly(path, _load_yaml(path))
+    except Exception:
+        return None
+    with _CACHE_LOCK:
+        _CACHE[key] = (stamp, compiled)
+    return compiled
+
+
+def _scope_base(plan_features: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     project_type = (plan_features or {}).get("project_type") or "SOD"
     area_sqft = float((plan_features or {}).get("area_sqft") or 0.0)
     fixtures = (plan_features or {}).get("fixtures") or {}
-    scope_base = {
+    return project_type, {
         "area_sqft": area_sqft,
         "fixtures": fixtures,
         # common fixture shortcuts
         "fixture_count": sum((fixtures or {}).values()) if isinstance(fixtures, dict) else 0.0,
     }
 
-    lines: List[Dict[str, Any]] = []
-    applied: List[Dict[str, Any]] = []
 
-    for p in yaml_paths:
-        if not os.path.exists(p):
-            continue
-        try:
-            doc = _load_yaml(p)
-        except Exception:
-            continue
+def _emit(assembly: CompiledAssembly, qtys: Sequence[float],
+          lines: List[Dict[str, Any]], applied: List[Dict[str, Any]]) -> None:
+    for r, qty_val in zip(assembly.rules, qtys):
+        qty_val = float(qty_val)
+        # Enforce non-negative
+        if qty_val < 0:
+            qty_val = 0.0
+        if r["trade"] and r["item"] and qty_val > 0:
+            lines.append({
+                "trade": r["trade"],
+                "item": r["item"],
+                "quantity": qty_val,
+                "unit": r["unit"],
+                "notes": r["notes"],
+            })
+            r_copy = dict(r["rule"])
+            r_copy["computed_quantity"] = qty_val
+            applied.append(r_copy)
 
-        if not _matches_project_type(doc, project_type):
-            continue
 
-        # Variables block (optional) can predefine aliases for expressions
-        scope = dict(scope_base)
-        for var_name, var_expr in (doc.get("variables") or {}).items():
-            try:
-                scope[var_name] = _safe_eval(str(var_expr), scope)
-            except Exception:
-                scope[var_name] = 0.0
+class AssemblySet:
+    """An ordered list of assembly files, each compiled once and cached by mtime."""
 
-        for rule in (doc.get("assemblies") or []):
-            trade = str(rule.get("trade") or "").strip()
-            item = str(rule.get("item") or "").strip()
-            unit = str(rule.get("unit") or "EA").strip().upper()
-            notes = str(rule.get("notes") or "")
-            qty_expr = rule.get("formula") or rule.get("quantity") or "0"
+    def __init__(self, yaml_paths: Sequence[str]) -> None:
+        self.paths = list(yaml_paths)
 
-            try:
-                qty_val = _safe_eval(str(qty_expr), scope)
-            except Exception:
-                qty_val = 0.0
-
-            # Enforce non-negative
-            if qty_val < 0:
-                qty_val = 0.0
-
-            if trade and item and qty_val > 0:
-                lines.append({
-                    "trade": trade,
-                    "item": item,
-                    "quantity": float(qty_val),
-                    "unit": unit,
-                    "notes": notes,
-                })
-                r_copy = dict(rule)
-                r_copy["computed_quantity"] = float(qty_val)
-                applied.append(r_copy)
-
-    return lines, applied
+    def assemblies(self) -> List[CompiledAssembly]:
+        return [a for a in (load_assembly(p) for p in self.paths) if a is not None]
+
+    def errors(self) -> Dict[str, List[str]]:
+        """Formula validation problems per file (those formulas evaluate to 0)."""
+        return {a.path: list(a.errors) for a in self.assemblies() if a.errors}
+
+    def expand(self, plan_features: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        project_type, scope_base = _scope_base(plan_features)
+        lines: List[Dict[str, Any]] = []
+        applied: List[Dict[str, Any]] = []
+        for assembly in self.assemblies():
+            if assembly.matches(project_type):
+                _emit(assembly, assembly.quantities(dict(scope_base)), lines, applied)
+        return lines, applied
+
+    def expand_many(self, features: Sequence[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """expand() for every plan_features dict, same results, one pass per file."""
+        bases = [_scope_base(f) for f in features]
+        results: List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = [([], []) for _ in bases]
+        for assembly in self.assemblies():
+            rows = [i for i, (pt, _) in enumerate(bases) if assembly.matches(pt)]
+            if not rows:
+                continue
+            if _HAVE_NUMPY and assembly.vectorizable and len(rows) > 1:
+                columns = {
+                    "area_sqft": np.fromiter((bases[i][1]["area_sqft"] for i in rows), np.float64, len(rows)),
+                    "fixture_count": np.fromiter((float(bases[i][1]["fixture_count"]) for i in rows), np.float64, len(rows)),
+                }
+                qtys = assembly.quantity_columns(columns, len(rows)).tolist()
+            else:
+                qtys = [assembly.quantities(dict(bases[i][1])) for i in rows]
+            for i, q in zip(rows, qtys):
+                _emit(assembly, q, *results[i])
+        return results
+
+
+def expand_from_files(plan_features: Dict[str, Any], yaml_paths: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    plan_features expected keys (best-effort):
+      - project_id: str
+      - project_type: str
+      - area_sqft: float
+      - fixtures: dict
+
+    Returns:
+      (lines, applied_rules)
+      lines: List[{trade,item,quantity,unit,notes}]
+      applied_rules: List[rule_dict] of rules that contributed > 0 quantity
+    """
+    return AssemblySet(yaml_paths).expand(plan_features)
+
+
+def expand_many_from_files(features: Sequence[Dict[str, Any]], yaml_paths: List[str]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Batch expand_from_files: one (lines, applied_rules) per plan_features dict."""
+    return AssemblySet(yaml_paths).expand_many(features)
@@ -12,11 +12,16 @@ import os
 import csv
 import json
 import math
-import random
-from typing import List, Dict, Any, Tuple, Optional
-from statistics import median
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Union
 from datetime import datetime
 
+import numpy as np
+
+try:
+    from monte_carlo import line_sigmas, percentile_map, shock_covariance, simulate_totals
+except ImportError:
+    from .monte_carlo import line_sigmas, percentile_map, shock_covariance, simulate_totals
+
 # -----------------------------
 # Loaders
 # -----------------------------
@@ -72,6 +77,70 @@ def load_estimate_lines(csv_path: str) -> List[Dict[str, Any]]:
     return rows
 
 
+class EstimateTable:
+    """
+    Estimate lines as columns, coerced once (see metrics()).
+
+    Numeric columns are float64 arrays (_to_float semantics, no clamping);
+    `trade`/`item` are stripped strings; `trade_idx`/`key_idx` index lines
+    into `trade_names` / `keys` ((trade, item) pairs), both in first-seen
+    order. `trade_raw`/`item_raw` keep the original values for reporting.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        n = len(rows)
+        self.project_id = [str(r.get("project_id") or "") for r in rows]
+        self.trade_raw = [r.get("trade") for r in rows]
+        self.item_raw = [r.get("item") for r in rows]
+        self.trade = [str(t or "").strip() for t in self.trade_raw]
+        self.item = [str(i or "").strip() for i in self.item_raw]
+        self.quantity = np.fromiter((_to_float(r.get("quantity"), 0.0) for r in rows), dtype=np.float64, count=n)
+        self.unit_cost = np.fromiter((_to_float(r.get("unit_cost"), 0.0) for r in rows), dtype=np.float64, count=n)
+        self.line_total = np.fromiter((_to_float(r.get("line_total"), 0.0) for r in rows), dtype=np.float64, count=n)
+        self._index()
+
+    def _index(self) -> None:
+        trades: Dict[str, int] = {}
+        keys: Dict[Tuple[str, str], int] = {}
+        n = len(self.trade)
+        self.trade_idx = np.fromiter((trades.setdefault(t, len(trades)) for t in self.trade), dtype=np.intp, count=n)
+        self.key_idx = np.fromiter((keys.setdefault(k, len(keys)) for k in zip(self.trade, self.item)),
+                                   dtype=np.intp, count=n)
+        self.trade_names = list(trades)
+        self.keys = keys
+        qty_x_uc = self.quantity * self.unit_cost
+        self.qty_x_uc = qty_x_uc
+        # Line extension: line_total when positive, else qty * unit_cost; never negative
+        self.extension = np.where(self.line_total > 0.0, self.line_total, np.maximum(qty_x_uc, 0.0))
+
+    def __len__(self) -> int:
+        return len(self.trade)
+
+    def take(self, indices: Sequence[int]) -> "EstimateTable":
+        """Table of the given lines (in that order)."""
+        idx = np.asarray(indices, dtype=np.intp)
+        sub = EstimateTable.__new__(EstimateTable)
+        for name in ("project_id", "trade_raw", "item_raw", "trade", "item"):
+            col = getattr(self, name)
+            setattr(sub, name, [col[i] for i in idx])
+        for name in ("quantity", "unit_cost", "line_total"):
+            setattr(sub, name, getattr(self, name)[idx])
+        sub._index()
+        return sub
+
+    def by_project(self) -> Dict[str, "EstimateTable"]:
+        """{project_id: table of its lines}, split in one pass (for batch runs over a multi-project CSV)."""
+        groups: Dict[str, List[int]] = {}
+        for i, pid in enumerate(self.project_id):
+            groups.setdefault(pid, []).append(i)
+        return {pid: self.take(idx) for pid, idx in groups.items()}
+
+
+def load_estimate_table(csv_path: str) -> EstimateTable:
+    """load_estimate_lines() as an EstimateTable."""
+    return EstimateTable(load_estimate_lines(csv_path))
+
+
 def load_plan_features(json_path: str) -> Dict[str, Any]:
     """
     Load plan/takeoff response and extract minimal features we use:
@@ -172,21 +241,17 @@ def load_vendor_quotes(csv_path: str) -> List[Dict[str, Any]]:
 # Metrics
 # -----------------------------
 
-def _iqr(values: List[float]) -> Tuple[float, float, float]:
-    """Return (q1, q3, iqr). Empty safe."""
-    if not values:
+def _iqr(values: Sequence[float]) -> Tuple[float, float, float]:
+    """Return (q1, q3, iqr): medians of the lower/upper halves (middle value excluded). Empty safe."""
+    vs = np.sort(np.asarray(values, dtype=np.float64))
+    n = vs.shape[0]
+    if n == 0:
         return (0.0, 0.0, 0.0)
-    vs = sorted(values)
-    n = len(vs)
     mid = n // 2
-    if n % 2 == 0:
-        lower = vs[:mid]
-        upper = vs[mid:]
-    else:
-        lower = vs[:mid]
-        upper = vs[mid+1:]
-    q1 = median(lower) if lower else vs[0]
-    q3 = median(upper) if upper else vs[-1]
+    lower = vs[:mid]
+    upper = vs[mid:] if n % 2 == 0 else vs[mid + 1:]
+    q1 = float(np.median(lower)) if lower.size else float(vs[0])
+    q3 = float(np.median(upper)) if upper.size else float(vs[-1])
     return (q1, q3, max(0.0, q3 - q1))
 
 
@@ -239,83 +304,87 @@ def bands_from_history(
 
 
 def metrics(
-    est_rows: List[Dict[str, Any]],
+    est_rows: Union[List[Dict[str, Any]], EstimateTable],
     features: Optional[Dict[str, Any]] = None,
     vendor_rows: Optional[List[Dict[str, Any]]] = None,
     bootstrap_sigma: float = 0.075,
-    bootstrap_samples: int = 500
+    bootstrap_samples: int = 500,
+    bootstrap_seed: Optional[int] = None,
+    trade_sigmas: Optional[Dict[str, float]] = None,
+    trade_shock_sigma: float = 0.0,
+    trade_shock_corr: float = 0.0,
+    percentiles: Sequence[float] = (50, 90),
 ) -> Dict[str, Any]:
+    """
+    Gut-check metrics for one estimate.
+
+    est_rows may be row dicts or a pre-built EstimateTable; either way the
+    lines are coerced once into columns and every aggregate (totals, trade
+    subtotals, IQR outliers, sensitivity, vendor joins, bootstrap) is computed
+    from those arrays. Pass tables (e.g. EstimateTable.by_project()) for batch
+    runs over many projects.
+
+    Bootstrap bands (monte_carlo.simulate_totals): each line's extension is
+    scaled by max(0, N(1, sigma)) per sample, sigma = trade_sigmas[trade] or
+    bootstrap_sigma; trade_shock_sigma > 0 adds a per-trade shock shared by
+    all lines of a trade, correlated across trades by trade_shock_corr.
+    bootstrap_seed makes the bands reproducible; `percentiles` picks the
+    reported $/SF percentiles (P50/P90 are always reported).
+    """
     features = features or {}
     vendor_rows = vendor_rows or []
+    table = est_rows if isinstance(est_rows, EstimateTable) else EstimateTable(est_rows)
+    n_lines = len(table)
+    n_trades = len(table.trade_names)
 
     # Totals
-    estimate_total = sum(_to_float(r.get("line_total"), 0.0) for r in est_rows)
+    estimate_total = float(table.line_total.sum())
     # Fallback if zeros: try recompute as qty * unit_cost
     if estimate_total <= 0.0:
-        estimate_total = sum(_to_float(r.get("quantity"), 0.0) * _to_float(r.get("unit_cost"), 0.0) for r in est_rows)
+        estimate_total = float(table.qty_x_uc.sum())
 
     area_sqft = _to_float(features.get("area_sqft"), 0.0)
     dollars_per_sf = (estimate_total / area_sqft) if (area_sqft > 0) else 0.0
 
-    # Trade breakdown
-    by_trade: Dict[str, float] = {}
-    for r in est_rows:
-        trade = (r.get("trade") or "").strip()
-        by_trade[trade] = by_trade.get(trade, 0.0) + _to_float(r.get("line_total"), 0.0)
-    # Fallback to qty*uc for trades with zero subtotal
-    if estimate_total <= 0.0:
-        by_trade = {}
-        for r in est_rows:
-            trade = (r.get("trade") or "").strip()
-            by_trade[trade] = by_trade.get(trade, 0.0) + (_to_float(r.get("quantity"), 0.0) * _to_float(r.get("unit_cost"), 0.0))
-
+    # Trade breakdown (qty*uc only when even the fallback total is zero)
+    weights = table.line_total if estimate_total > 0.0 else table.qty_x_uc
+    subtotals = np.bincount(table.trade_idx, weights=weights, minlength=n_trades)
     trade_breakdown = []
-    for t, sub in by_trade.items():
+    for t, sub in zip(table.trade_names, subtotals.tolist()):
         pct = (sub / estimate_total * 100.0) if estimate_total > 0 else 0.0
         trade_breakdown.append({"trade": t, "subtotal": round(sub, 2), "pct": round(pct, 2)})
     trade_breakdown.sort(key=lambda x: x["subtotal"], reverse=True)
 
     # Outliers on unit_cost via IQR
-    unit_costs = [max(0.0, _to_float(r.get("unit_cost"), 0.0)) for r in est_rows if _to_float(r.get("unit_cost"), 0.0) > 0]
-    q1, q3, iqr = _iqr(unit_costs)
+    uc = table.unit_cost
+    priced = uc > 0
+    q1, q3, iqr = _iqr(uc[priced])
     lo_cut = q1 - 1.5 * iqr
     hi_cut = q3 + 1.5 * iqr
     outliers = []
     if iqr > 0:
-        for r in est_rows:
-            uc = _to_float(r.get("unit_cost"), 0.0)
-            if uc <= 0:
-                continue
-            flag = (uc < lo_cut) or (uc > hi_cut)
-            if flag:
-                outliers.append({
-                    "trade": r.get("trade"),
-                    "item": r.get("item"),
-                    "unit_cost": round(uc, 4),
-                    "iqr_flag": True
-                })
-    # Limit top 10 (largest unit_cost first)
-    outliers.sort(key=lambda x: x["unit_cost"], reverse=True)
-    outliers = outliers[:10]
+        flagged = np.flatnonzero(priced & ((uc < lo_cut) | (uc > hi_cut)))
+        rounded = [round(x, 4) for x in uc[flagged].tolist()]
+        # Limit top 10 (largest unit_cost first; ties keep line order)
+        for j in np.argsort(-np.asarray(rounded), kind="stable")[:10]:
+            i = flagged[j]
+            outliers.append({
+                "trade": table.trade_raw[i],
+                "item": table.item_raw[i],
+                "unit_cost": rounded[j],
+                "iqr_flag": True
+            })
 
     # Coverage: ensure all plan trades appear in estimate lines
     plan_trades = set((features.get("trades_in_plan") or []))
-    est_trades = set([str(r.get("trade") or "").strip() for r in est_rows])
+    est_trades = set(table.trade_names)
     missing_trades = sorted([t for t in plan_trades if t and t not in est_trades])
     expected_trades_present = sorted(list(plan_trades))
     coverage_pass = (len(missing_trades) == 0)
 
     # Sensitivity: +/-10% on unit_costs (recompute totals)
-    def recompute_total(scale: float) -> float:
-        tot = 0.0
-        for r in est_rows:
-            q = _to_float(r.get("quantity"), 0.0)
-            uc = _to_float(r.get("unit_cost"), 0.0) * scale
-            tot += q * uc
-        return tot
-
-    unit_costs_plus10 = recompute_total(1.10)
-    unit_costs_minus10 = recompute_total(0.90)
+    unit_costs_plus10 = float((table.quantity * (uc * 1.10)).sum())
+    unit_costs_minus10 = float((table.quantity * (uc * 0.90)).sum())
 
     # Waste sensitivity (approximate as similar scaling, lacking explicit waste fields)
     waste_plus10 = estimate_total * 1.10 if estimate_total > 0 else unit_costs_plus10 * 1.10
@@ -342,61 +411,45 @@ def metrics(
             vendor_by_trade[t] = vendor_by_trade.get(t, 0.0) + vt
             vendor_total += vt
 
-        est_map: Dict[Tuple[str, str], float] = {}
-        for r in est_rows:
-            t = (r.get("trade") or "").strip()
-            i = (r.get("item") or "").strip()
-            lt = max(0.0, _to_float(r.get("line_total"), 0.0))
-            if lt <= 0.0:
-                lt = max(0.0, _to_float(r.get("quantity"), 0.0) * _to_float(r.get("unit_cost"), 0.0))
-            est_map[(t, i)] = est_map.get((t, i), 0.0) + lt
-
-        # Project MAPE
+        # Estimate extension per (trade, item), joined to vendor keys through table.keys
+        est_by_key = np.bincount(table.key_idx, weights=table.extension, minlength=len(table.keys)).tolist()
         ape_sum = 0.0
         count = 0
+        est_sub_by_trade: Dict[str, float] = {}
         for key, vtot in vendor_map.items():
+            k = table.keys.get(key)
+            est_tot = est_by_key[k] if k is not None else 0.0
+            est_sub_by_trade[key[0]] = est_sub_by_trade.get(key[0], 0.0) + est_tot
             if vtot <= 0:
                 continue
-            est_tot = est_map.get(key, 0.0)
-            ape = abs(est_tot - vtot) / vtot
-            ape_sum += ape
+            ape_sum += abs(est_tot - vtot) / vtot
             count += 1
+
+        # Project MAPE
         if count > 0:
             mape_project = round(ape_sum / count * 100.0, 2)
 
         # WAPE by trade
         for t, v_sub in vendor_by_trade.items():
             if v_sub > 0:
-                est_sub = 0.0
-                for (tt, ii), vtot in vendor_map.items():
-                    if tt == t:
-                        est_sub += est_map.get((tt, ii), 0.0)
-                wape = abs(est_sub - v_sub) / v_sub * 100.0
+                wape = abs(est_sub_by_trade.get(t, 0.0) - v_sub) / v_sub * 100.0
                 wape_by_trade.append({"trade": t, "wape": round(wape, 2)})
         wape_by_trade.sort(key=lambda x: x["wape"], reverse=True)
 
     # Bootstrap P50/P90 on $/SF via unit cost sigma
-    base_line_ext = []
-    for r in est_rows:
-        ext = _to_float(r.get("line_total"), 0.0)
-        if ext <= 0.0:
-            ext = _to_float(r.get("quantity"), 0.0) * _to_float(r.get("unit_cost"), 0.0)
-        base_line_ext.append(max(0.0, ext))
-
-    dpsf_samples: List[float] = []
-    if area_sqft > 0 and base_line_ext:
-        for _ in range(bootstrap_samples):
-            tot = 0.0
-            for ext in base_line_ext:
-                # Random factor ~ N(1, sigma)
-                factor = random.gauss(1.0, bootstrap_sigma)
-                if factor < 0:
-                    factor = 0.0
-                tot += ext * factor
-            dpsf_samples.append(tot / area_sqft if area_sqft > 0 else 0.0)
-
-    p50 = _percentile(dpsf_samples, 0.50) if dpsf_samples else dollars_per_sf
-    p90 = _percentile(dpsf_samples, 0.90) if dpsf_samples else dollars_per_sf
+    pcts = sorted(set([50.0, 90.0] + [float(p) for p in percentiles]))
+    dpsf_pcts: Dict[str, float] = {}
+    if area_sqft > 0 and n_lines:
+        sigma = line_sigmas(table.trade_names, bootstrap_sigma, trade_sigmas)[table.trade_idx]
+        shock_cov = None
+        if trade_shock_sigma > 0:
+            shock_cov = shock_covariance(trade_shock_sigma, n_trades, trade_shock_corr)
+        totals = simulate_totals(table.extension, bootstrap_samples, sigma, table.trade_idx, shock_cov,
+                                 seed=bootstrap_seed)
+        dpsf_pcts = percentile_map(totals / area_sqft, pcts)
+
+    p50 = dpsf_pcts.get("P50", dollars_per_sf)
+    p90 = dpsf_pcts.get("P90", dollars_per_sf)
 
     # Bands
     project_type = str((features or {}).get("project_type") or "SOD")
@@ -409,7 +462,7 @@ def metrics(
     warnings: List[str] = []
     if estimate_total <= 0:
         warnings.append("estimate_total_is_zero")
-    if not est_rows:
+    if not n_lines:
         warnings.append("no_estimate_lines_loaded")
     if area_sqft <= 0:
         warnings.append("area_sqft_missing_or_zero")
@@ -438,8 +491,13 @@ def metrics(
         "bootstrap": {
             "P50_dollars_per_sf": round(p50, 2),
             "P90_dollars_per_sf": round(p90, 2),
+            "percentiles_dollars_per_sf": {k: round(v, 2) for k, v in dpsf_pcts.items()},
             "sigma": bootstrap_sigma,
-            "samples": bootstrap_samples
+            "trade_sigmas": dict(trade_sigmas or {}),
+            "trade_shock_sigma": trade_shock_sigma,
+            "trade_shock_corr": trade_shock_corr,
+            "samples": bootstrap_samples,
+            "seed": bootstrap_seed
         },
         "band_provisional": band,
         "band_pass": band_pass,
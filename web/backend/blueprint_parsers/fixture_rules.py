@@ -0,0 +1,199 @@
+"""
+Compiled Fixture Rules
+======================
+Rule matcher for data/fixtures.rules.yaml plus the fixture keyword count used
+by TakeoffEngine, compiled once per rules file.
+
+- Each rule's regex is compiled once, and its parse tree is reduced to a set
+  of required literals ("atoms"): every match must contain at least one of
+  them (e.g. '\\bhose bibb?\\b|\\bhose bib\\b' -> {"hose bib"}).
+- scan() lowers the text once, checks every rule's atoms with str.find (C
+  speed, no regex backtracking) and runs the full regex only for rules whose
+  atoms occur. Rules with no usable literal are always run.
+- Hits report per-rule match counts and page positions instead of qty 1.
+- Keyword counts reuse the same lowered text.
+- get_fixture_rules(path) caches the compiled set per file and recompiles
+  when the file's mtime/size changes (hot reload, no per-call YAML parse).
+
+A single combined alternation was measured first; CPython's re tries every
+branch at every offset, which made it slower than the per-rule scans it was
+meant to replace (see scripts/bench_fixture_rules.py).
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse  # type: ignore
+
+try:
+    import yaml
+    _HAVE_YAML = True
+except Exception:
+    _HAVE_YAML = False
+
+# Positions reported per rule hit (counts are always exact)
+MAX_POSITIONS = 50
+# Shorter literals filter too little to be worth checking
+MIN_ATOM_LEN = 2
+
+_ZERO_WIDTH = (sre_parse.AT,)
+
+
+def _best(candidates: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Most selective candidate: longest shortest-atom, then fewest atoms."""
+    usable = [c for c in candidates if c and min(len(a) for a in c) >= MIN_ATOM_LEN]
+    if not usable:
+        return None
+    return max(usable, key=lambda c: (min(len(a) for a in c), -len(c)))
+
+
+def _required(items: Any) -> Optional[FrozenSet[str]]:
+    """Literals of which every match of this parsed sequence contains at least one."""
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if run:
+            candidates.append(frozenset(["".join(run).lower()]))
+            run.clear()
+
+    for op, arg in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+            continue
+        if op in _ZERO_WIDTH:
+            continue  # \b, ^, $ don't separate adjacent literals
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            sub = _required(arg[-1])
+        elif op is sre_parse.BRANCH:
+            subs = [_required(branch) for branch in arg[1]]
+            sub = frozenset().union(*subs) if all(subs) else None
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            sub = _required(arg[2]) if arg[0] >= 1 else None
+        else:
+            sub = None
+        if sub:
+            candidates.append(sub)
+    flush()
+    return _best(candidates)
+
+
+def required_atoms(pattern: str) -> Optional[FrozenSet[str]]:
+    """Lower-case literal prefilter for `pattern`, or None when none can be derived."""
+    try:
+        return _required(sre_parse.parse(pattern, re.IGNORECASE))
+    except Exception:
+        return None
+
+
+class FixtureRules:
+    """Compiled rule set + keyword list over one lowered copy of the text."""
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], keywords: Sequence[str] = ()) -> None:
+        self.rules: List[Dict[str, Any]] = []
+        self.keywords = [k.lower() for k in keywords if k]
+        self._compiled: List[Any] = []
+        self._atoms: List[Optional[FrozenSet[str]]] = []
+        for rule in rules or []:
+            pat = rule.get("pattern") if isinstance(rule, dict) else None
+            if not pat:
+                continue
+            try:
+                compiled = re.compile(pat, re.IGNORECASE)
+            except re.error:
+                # ignore bad patterns
+                continue
+            self.rules.append(rule)
+            self._compiled.append(compiled)
+            self._atoms.append(required_atoms(pat))
+
+    def scan(self, pages_text: Sequence[str], first_page: int = 1) -> Dict[str, Any]:
+        """
+        Returns {"fixtures": keyword count, "rule_hits": [...]}; each hit is
+        {trade, item, unit, qty, count, pages, positions} with qty = count x rule qty
+        and positions = [[page, offset within page], ...]. pages_text[0] is page
+        `first_page` (1-based), so a single page scanned alone keeps its number.
+        """
+        texts = [t or "" for t in pages_text]
+        blob = "\n".join(texts)
+        low = blob.lower()
+        starts: List[int] = []
+        off = 0
+        for t in texts:
+            starts.append(off)
+            off += len(t) + 1
+
+        fixtures = sum(low.count(kw) for kw in self.keywords)
+
+        hits: List[Dict[str, Any]] = []
+        for rule, compiled, atoms in zip(self.rules, self._compiled, self._atoms):
+            if atoms is not None and not any(a in low for a in atoms):
+                continue
+            count = 0
+            located: List[List[int]] = []
+            for m in compiled.finditer(blob):
+                count += 1
+                if len(located) < MAX_POSITIONS:
+                    k = bisect_right(starts, m.start()) - 1
+                    located.append([first_page + k, m.start() - starts[k]])
+            if not count:
+                continue
+            hits.append({
+                "trade": rule.get("trade", "misc"),
+                "item": rule.get("item", "unknown"),
+                "unit": str(rule.get("unit", "ea")).lower(),
+                "qty": float(count * float(rule.get("qty", 1) or 0)),
+                "count": count,
+                "pages": sorted({p for p, _ in located}),
+                "positions": located,
+            })
+        return {"fixtures": fixtures, "rule_hits": hits}
+
+
+def load_rule_list(path: str) -> List[Dict[str, Any]]:
+    """The `rules:` list of a rules YAML file ([] when missing or unreadable)."""
+    if _HAVE_YAML and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = yaml.safe_load(f) or {}
+            rules = doc.get("rules", [])
+            if isinstance(rules, list):
+                return rules
+        except Exception:
+            pass
+    return []
+
+
+_CACHE: Dict[Tuple[str, Tuple[str, ...]], Tuple[Optional[Tuple[int, int]], FixtureRules]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_fixture_rules(path: str, keywords: Sequence[str] = ()) -> FixtureRules:
+    """Compiled rules for `path`, rebuilt only when the file changes."""
+    key = (os.path.abspath(path), tuple(keywords))
+    stamp = _stamp(path)
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, FixtureRules(load_rule_list(path), keywords))
+            _CACHE[key] = cached
+    return cached[1]
@@ -7,7 +7,7 @@ Extracts and parses structured metadata for enhanced takeoff.
 
 import os
 import re
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Any
 from pathlib import Path
 
 try:
@@ -59,30 +59,44 @@ except ImportError:
 
 # Reuse existing scale patterns
 from .pdf_titleblock import find_scale_strings, normalize_scale
+from .pdf_document import PdfSource, as_document
+from .model_registry import get_model_registry
 
 # LayoutParser model path (will download on first use)
 MODEL_PATH = "lp://efficientdet/PubLayNet"
 
-def detect_regions(pdf_path: str) -> Dict[str, Any]:
+# Render zoom shared by region detection and OCR (bbox coords are scaled by it)
+RASTER_ZOOM = 2.0
+
+# Models are built once per process (on first use, or at startup with
+# TAKEOFF_PRELOAD_MODELS) and shared across requests.
+LAYOUT_MODEL = "layout"
+PADDLE_OCR = "paddleocr"
+_MODELS = get_model_registry()
+if _HAVE_LAYOUTPARSER:
+    _MODELS.register(LAYOUT_MODEL, lambda: lp.EfficientDetLayoutModel(MODEL_PATH))
+if _HAVE_PADDLEOCR:
+    _MODELS.register(PADDLE_OCR, lambda: PaddleOCR(use_angle_cls=True, lang='en'))
+
+def detect_regions(pdf: PdfSource) -> Dict[str, Any]:
     """
     Detect layout regions using LayoutParser.
+    `pdf` is a path or a shared PdfDocument (page render is reused by OCR).
     Returns: {"title_block": (x0,y0,x1,y1), "legend": (x0,y0,x1,y1), "notes": [(x0,y0,x1,y1), ...]}
     """
     if not _HAVE_LAYOUTPARSER or not _HAVE_OPENCV or not _HAVE_FITZ:
         return {"error": "layoutparser dependencies not available", "regions": {}}
 
+    document = None
+    owned = False
     try:
-        # Convert first page to image
-        doc = fitz.open(pdf_path)
-        page = doc.load_page(0)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x scaling for better detection
-        img_path = pdf_path + ".png"
-        pix.save(img_path)
-
-        # Load LayoutParser model
-        model = lp.EfficientDetLayoutModel(MODEL_PATH)
-        image = cv2.imread(img_path)
-        layout = model.detect(image)
+        document, owned = as_document(pdf)
+        # First page straight from the pixmap samples (2x scaling for better detection)
+        image = document.raster(0, zoom=RASTER_ZOOM)
+
+        # Shared LayoutParser model (loaded once per process)
+        with _MODELS.use(LAYOUT_MODEL) as model:
+            layout = model.detect(image)
 
         regions = {}
         notes_regions = []
@@ -105,65 +119,145 @@ def detect_regions(pdf_path: str) -> Dict[str, Any]:
 
         regions["notes"] = notes_regions[:3]  # Limit to 3 notes regions
 
-        # Cleanup
-        os.unlink(img_path)
-        doc.close()
-
         return {"regions": regions}
 
     except Exception as e:
         return {"error": str(e), "regions": {}}
 
-def extract_text(pdf_path: str, bbox: Tuple[float, float, float, float]) -> str:
-    """
-    Extract text from PDF bbox using pdfminer first, OCR fallback.
-    """
-    if not bbox or len(bbox) != 4:
-        return ""
-
-    x0, y0, x1, y1 = bbox
-
-    # Try pdfminer first
-    if _HAVE_PDFMINER and _HAVE_FITZ:
-        try:
-            # Get page dimensions
-            doc = fitz.open(pdf_path)
-            page = doc.load_page(0)
-            page_width = page.rect.width
-            page_height = page.rect.height
-
-            # Convert bbox to pdfminer coordinates (bottom-left origin)
-            # fitz uses top-left, pdfminer uses bottom-left
-            miner_bbox = (x0, page_height - y1, x1, page_height - y0)
+    finally:
+        if owned and document is not None:
+            document.close()
 
-            laparams = LAParams()
-            rsrcmgr = PDFResourceManager()
-            device = PDFPageAggregator(rsrcmgr, laparams=laparams)
-            interpreter = PDFPageInterpreter(rsrcmgr, device)
+BBox = Tuple[float, float, float, float]
 
-            with open(pdf_path, 'rb') as fp:
-                pages = PDFPage.get_pages(fp)
-                for page in pages:
-                    interpreter.process_page(page)
-                    layout = device.get_result()
 
-                    text_boxes = []
-                    for lt_obj in layout:
-                        if isinstance(lt_obj, LTTextBox) or isinstance(lt_obj, LTTextLine):
-                            if _bbox_overlap(lt_obj.bbox, miner_bbox):
-                                text_boxes.append(lt_obj.get_text())
-
-                    if text_boxes:
-                        doc.close()
-                        return "\n".join(text_boxes)
+class _TextBoxIndex:
+    """
+    Text boxes of one laid-out page, sorted by x0 for overlap queries.
+    A query bbox only scans boxes whose x0 <= its x1 (searchsorted), then
+    filters the rest of the overlap test vectorized; hits come back in the
+    page's layout order, like the per-bbox scan they replace.
+    """
 
-            doc.close()
+    def __init__(self, boxes: List[Tuple[BBox, str]]) -> None:
+        self.texts = [t for _, t in boxes]
+        coords = np.asarray([b for b, _ in boxes], dtype=np.float64).reshape(-1, 4)
+        self.order = np.argsort(coords[:, 0], kind="stable")
+        self.coords = coords[self.order]
+
+    def query(self, bbox: BBox) -> List[str]:
+        x0, y0, x1, y1 = bbox
+        stop = int(np.searchsorted(self.coords[:, 0], x1, side="right"))
+        c = self.coords[:stop]
+        # inclusive edges, same as _bbox_overlap
+        hit = (c[:, 2] >= x0) & (c[:, 1] <= y1) & (c[:, 3] >= y0)
+        return [self.texts[i] for i in np.sort(self.order[:stop][hit])]
+
+
+def _pdfminer_text_boxes(document: Any) -> Iterator[List[Tuple[BBox, str]]]:
+    """One pdfminer layout pass per page, yielding that page's (bbox, text) boxes."""
+    laparams = LAParams()
+    rsrcmgr = PDFResourceManager()
+    device = PDFPageAggregator(rsrcmgr, laparams=laparams)
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    for miner_page in PDFPage.get_pages(document.stream()):
+        interpreter.process_page(miner_page)
+        layout = device.get_result()
+        yield [(lt_obj.bbox, lt_obj.get_text()) for lt_obj in layout
+               if isinstance(lt_obj, (LTTextBox, LTTextLine))]
+
+
+def extract_texts(pdf: PdfSource, bboxes: Sequence[Optional[BBox]]) -> List[str]:
+    """
+    Batch extract_text: text for many page-0 bboxes from a single pdfminer pass.
+    Each bbox gets the text boxes it overlaps on the first page that has any
+    (pages are laid out lazily and the pass stops once every bbox is filled);
+    bboxes with no PDF text fall back to OCR on the shared page raster.
+    `pdf` is a path or a shared PdfDocument.
+    """
+    out = ["" for _ in bboxes]
+    wanted = [i for i, bbox in enumerate(bboxes) if bbox and len(bbox) == 4]
+    if not wanted:
+        return out
 
-        except Exception:
-            pass
+    try:
+        document, owned = as_document(pdf)
+    except Exception:
+        return out
 
-    # Fallback to OCR
-    return _extract_text_ocr(pdf_path, bbox)
+    try:
+        pending = list(wanted)
+        if _HAVE_PDFMINER and _HAVE_FITZ and _HAVE_NUMPY:
+            try:
+                # fitz uses top-left, pdfminer uses bottom-left
+                page_height = document.page(0).rect.height
+                miner = {i: (bboxes[i][0], page_height - bboxes[i][3], bboxes[i][2], page_height - bboxes[i][1])
+                         for i in wanted}
+                for boxes in _pdfminer_text_boxes(document):
+                    if not boxes:
+                        continue
+                    index = _TextBoxIndex(boxes)
+                    still = []
+                    for i in pending:
+                        hits = index.query(miner[i])
+                        if hits:
+                            out[i] = "\n".join(hits)
+                        else:
+                            still.append(i)
+                    pending = still
+                    if not pending:
+                        break
+            except Exception:
+                pass
+
+        # Fallback to OCR
+        for i in pending:
+            out[i] = _extract_text_ocr(document, bboxes[i])
+        return out
+
+    finally:
+        if owned:
+            document.close()
+
+
+def extract_region_texts(pdf: PdfSource, regions: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Text for every region detect_regions returned, in one extract_texts call.
+    Single-bbox regions map to a string; list regions (notes) to a list of strings.
+    """
+    def _multi(value: Any) -> bool:
+        return isinstance(value, list) and all(isinstance(v, (list, tuple)) for v in value)
+
+    flat: List[BBox] = []
+    slots: List[Tuple[str, Optional[int]]] = []
+    for name, value in regions.items():
+        if _multi(value):
+            for k, bbox in enumerate(value):
+                flat.append(bbox)
+                slots.append((name, k))
+        else:
+            flat.append(value)
+            slots.append((name, None))
+
+    texts = extract_texts(pdf, flat)
+    out: Dict[str, Any] = {name: [] if _multi(value) else ""
+                           for name, value in regions.items()}
+    for (name, k), text in zip(slots, texts):
+        if k is None:
+            out[name] = text
+        else:
+            out[name].append(text)
+    return out
+
+
+def extract_text(pdf: PdfSource, bbox: BBox) -> str:
+    """
+    Extract text from PDF bbox using pdfminer first, OCR fallback.
+    `pdf` is a path or a shared PdfDocument. For several regions use extract_texts.
+    """
+    if not bbox or len(bbox) != 4:
+        return ""
+    return extract_texts(pdf, [bbox])[0]
 
 def _bbox_overlap(bbox1: Tuple[float, ...], bbox2: Tuple[float, ...]) -> bool:
     """Check if two bboxes overlap."""
@@ -171,47 +265,42 @@ def _bbox_overlap(bbox1: Tuple[float, ...], bbox2: Tuple[float, ...]) -> bool:
     x0_2, y0_2, x1_2, y1_2 = bbox2
     return not (x1_1 < x0_2 or x1_2 < x0_1 or y1_1 < y0_2 or y1_2 < y0_1)
 
-def _extract_text_ocr(pdf_path: str, bbox: Tuple[float, float, float, float]) -> str:
+def _extract_text_ocr(pdf: PdfSource, bbox: Tuple[float, float, float, float]) -> str:
     """Extract text using OCR from bbox."""
-    if not _HAVE_FITZ or not _HAVE_OPENCV:
+    if not _HAVE_FITZ or not _HAVE_NUMPY:
         return ""
 
+    document = None
+    owned = False
     try:
-        doc = fitz.open(pdf_path)
-        page = doc.load_page(0)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        nparr = np.frombuffer(img_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        document, owned = as_document(pdf)
+        # Same cached render detect_regions used; cropping is a view
+        img = document.raster(0, zoom=RASTER_ZOOM)
 
         # Crop to bbox (scale coordinates)
-        scale = 2.0
-        x0, y0, x1, y1 = [int(coord * scale) for coord in bbox]
+        x0, y0, x1, y1 = [int(coord * RASTER_ZOOM) for coord in bbox]
         cropped = img[y0:y1, x0:x1]
 
         if _HAVE_TESSERACT:
-            text = pytesseract.image_to_string(cropped)
-            doc.close()
-            return text
+            return pytesseract.image_to_string(cropped)
 
         elif _HAVE_PADDLEOCR:
-            ocr = PaddleOCR(use_angle_cls=True, lang='en')
-            result = ocr.ocr(cropped, cls=True)
+            with _MODELS.use(PADDLE_OCR) as ocr:
+                result = ocr.ocr(cropped, cls=True)
             text = ""
             if result and result[0]:
                 for line in result[0]:
                     if line and len(line) > 1:
                         text += line[1][0] + "\n"
-            doc.close()
             return text
 
-        doc.close()
-
     except Exception:
         pass
 
+    finally:
+        if owned and document is not None:
+            document.close()
+
     return ""
 
 def parse_titleblock(text: str) -> Dict[str, Any]:
@@ -0,0 +1,151 @@
+"""
+Process-wide Model Registry
+===========================
+Heavy models (LayoutParser detector, PaddleOCR) are built once per process and
+shared by every request, instead of being constructed on each call.
+
+- register(name, factory): factory() builds the model; nothing loads until first use.
+- get(name): lazy, thread-safe (per-model lock, double-checked) construction.
+- use(name): context manager that also serializes inference on that model, for
+  engines that are not safe to call from several threads at once.
+- warm_up(names): load ahead of the first request (see TAKEOFF_PRELOAD_MODELS).
+- stats(): load time, RSS growth during load and use counts per model.
+
+Knob (environment):
+  TAKEOFF_PRELOAD_MODELS   "true" = every registered model, or a comma list
+                           (e.g. "layout,paddleocr"); empty = load on first use
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where it can't be read cheaply."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss is a high-water mark (KiB on Linux, bytes on macOS); still a usable delta
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return None
+
+
+class _Entry:
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self.factory = factory
+        self.model: Any = None
+        self.loaded = False
+        self.error: Optional[str] = None
+        self.load_s: Optional[float] = None
+        self.rss_delta: Optional[int] = None
+        self.uses = 0
+        self.load_lock = threading.Lock()
+        self.use_lock = threading.RLock()
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Register (or replace, dropping any loaded instance) a model factory."""
+        with self._lock:
+            self._entries[name] = _Entry(factory)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"unknown model: {name}")
+        return entry
+
+    def get(self, name: str) -> Any:
+        """The shared instance, built on first call; factory errors propagate (and are retried next call)."""
+        entry = self._entry(name)
+        if entry.loaded:
+            return entry.model
+        with entry.load_lock:
+            if not entry.loaded:
+                rss0 = _rss_bytes()
+                t0 = time.perf_counter()
+                try:
+                    entry.model = entry.factory()
+                except Exception as e:
+                    entry.error = str(e)
+                    raise
+                entry.load_s = time.perf_counter() - t0
+                rss1 = _rss_bytes()
+                entry.rss_delta = (rss1 - rss0) if (rss0 is not None and rss1 is not None) else None
+                entry.error = None
+                entry.loaded = True
+        return entry.model
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """Borrow the model with exclusive access for one inference call."""
+        model = self.get(name)
+        entry = self._entry(name)
+        with entry.use_lock:
+            entry.uses += 1
+            yield model
+
+    def warm_up(self, names: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """Load the given (default: all) models now. Returns {name: error or None}."""
+        out: Dict[str, Optional[str]] = {}
+        for name in names or self.names():
+            try:
+                self.get(name)
+                out[name] = None
+            except Exception as e:
+                out[name] = str(e)
+        return out
+
+    def unload(self, name: str) -> None:
+        entry = self._entry(name)
+        with entry.load_lock:
+            entry.model = None
+            entry.loaded = False
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for name, e in self._entries.items():
+            models[name] = {
+                "loaded": e.loaded,
+                "load_s": round(e.load_s, 3) if e.load_s is not None else None,
+                "rss_delta_bytes": e.rss_delta,
+                "uses": e.uses,
+                "error": e.error,
+            }
+        loaded_rss = [m["rss_delta_bytes"] for m in models.values() if m["loaded"] and m["rss_delta_bytes"]]
+        return {"models": models, "loaded_rss_bytes": sum(loaded_rss), "process_rss_bytes": _rss_bytes()}
+
+
+_REGISTRY = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _REGISTRY
+
+
+def preload_names(registry: Optional[ModelRegistry] = None) -> List[str]:
+    """Models named by TAKEOFF_PRELOAD_MODELS (see module docstring)."""
+    registry = registry or _REGISTRY
+    flag = os.environ.get("TAKEOFF_PRELOAD_MODELS", "").strip()
+    if not flag or flag.lower() in ("0", "false", "no"):
+        return []
+    if flag.lower() in ("1", "true", "yes", "all"):
+        return registry.names()
+    wanted = [n.strip() for n in flag.split(",") if n.strip()]
+    return [n for n in wanted if n in registry.names()]
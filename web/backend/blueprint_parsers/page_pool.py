@@ -0,0 +1,112 @@
+"""
+Process-pool page sharding for large plan sets.
+
+Pages are split into contiguous shards (a few per worker for load balance) and
+handed to a ProcessPoolExecutor. Each worker opens the document itself from a
+path or the raw bytes; per-page results are merged back in page order so the
+output is identical to a sequential run.
+
+The pool is created once per process and reused across extractions. Workers
+are spawned, not forked: the API server runs threads (run log writer, job
+queue, model warm-up, retrain scheduler) and a forked child can inherit a lock
+one of them was holding. A pool broken by a dead worker is dropped and rebuilt
+on the next call.
+
+Knob: TAKEOFF_WORKERS (default 1 = sequential; 0 = one per CPU).
+"""
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple
+
+# Below this many pages a process pool costs more than it saves
+PARALLEL_MIN_PAGES = 8
+SHARDS_PER_WORKER = 4
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Explicit worker count, else TAKEOFF_WORKERS env, else 1. 0 means os.cpu_count()."""
+    if workers is None:
+        try:
+            workers = int(os.environ.get("TAKEOFF_WORKERS", "1"))
+        except ValueError:
+            workers = 1
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def shard_pages(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into contiguous (start, stop) shards."""
+    n_shards = max(1, min(page_count, workers * SHARDS_PER_WORKER))
+    base, extra = divmod(page_count, n_shards)
+    shards: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(n_shards):
+        stop = start + base + (1 if i < extra else 0)
+        if stop > start:
+            shards.append((start, stop))
+        start = stop
+    return shards
+
+
+def use_pool(page_count: int, workers: int) -> bool:
+    return workers > 1 and page_count >= PARALLEL_MIN_PAGES
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The shared spawn pool, rebuilt when the worker count changes."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL, _POOL_WORKERS = None, 0
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_pool() -> None:
+    """Stop the shared pool's workers (also run at interpreter exit)."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        pool, _POOL, _POOL_WORKERS = _POOL, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def map_page_ranges(worker: Callable[[Any, int, int], List[Any]],
+                    source: Any,
+                    page_count: int,
+                    workers: int) -> List[Any]:
+    """
+    Run worker(source, start, stop) -> [per-page result, ...] over every shard
+    in the shared process pool; returns the per-page results in page order.
+    `worker` must be a module-level function and `source` picklable (path or bytes).
+    """
+    shards = shard_pages(page_count, workers)
+    pool = _get_pool(workers)
+    try:
+        futures = [pool.submit(worker, source, a, b) for a, b in shards]
+        return [page for fut in futures for page in fut.result()]
+    except BrokenProcessPool:
+        _drop_pool(pool)
+        raise
@@ -0,0 +1,181 @@
+"""
+Shared PDF Document Handle
+==========================
+Opens a plan set once per request and shares the parsed document across the
+takeoff stages (TakeoffEngine, layout_stage region detection, text extraction
+and the OCR fallback).
+
+Holds:
+  - the raw PDF bytes (base64 uploads are decoded exactly once)
+  - the PyMuPDF Document (opened lazily from the bytes)
+  - loaded pages, per-page text and rendered page pixmaps, cached on first use
+  - page rasters as NumPy arrays over the pixmap samples, keyed by (page, zoom),
+    so region detection and OCR cropping share one render with no PNG round-trip
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import fitz  # PyMuPDF
+    _HAVE_FITZ = True
+except ImportError:
+    _HAVE_FITZ = False
+
+try:
+    import numpy as np
+    _HAVE_NUMPY = True
+except ImportError:
+    _HAVE_NUMPY = False
+
+
+INLINE_SOURCE = "<inline-base64>"
+
+
+class PdfDocument:
+    """Per-request handle over one PDF; every stage reuses the same parse."""
+
+    def __init__(self, data: bytes, source: str, path: Optional[str] = None) -> None:
+        self.data = data
+        self.source = source
+        self.path = path
+        self._doc: Any = None
+        self._sha256: Optional[str] = None
+        self._pages: Dict[int, Any] = {}
+        self._text: Dict[int, str] = {}
+        self._pixmaps: Dict[Tuple[int, float], Any] = {}
+        self._rasters: Dict[Tuple[int, float, bool], Any] = {}
+
+    # -------------------- CONSTRUCTION --------------------
+
+    @classmethod
+    def from_path(cls, pdf_path: str) -> "PdfDocument":
+        if not (pdf_path and os.path.exists(pdf_path)):
+            raise FileNotFoundError(f"PDF not found at path: {pdf_path}")
+        with open(pdf_path, "rb") as f:
+            data = f.read()
+        return cls(data, source=pdf_path, path=pdf_path)
+
+    @classmethod
+    def from_base64(cls, pdf_base64: str) -> "PdfDocument":
+        return cls(base64.b64decode(pdf_base64), source=INLINE_SOURCE)
+
+    @classmethod
+    def from_request(cls, pdf_path: Optional[str] = None, pdf_base64: Optional[str] = None) -> "PdfDocument":
+        """Build from the A/B request shapes; base64 wins when both are present."""
+        if pdf_base64:
+            return cls.from_base64(pdf_base64)
+        return cls.from_path(pdf_path or "")
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path) if self.path else self.source
+
+    @property
+    def sha256(self) -> str:
+        """Content digest of the raw bytes (cache key material)."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    # -------------------- PARSED VIEWS --------------------
+
+    @property
+    def doc(self) -> Any:
+        """The PyMuPDF Document, opened once from the in-memory bytes."""
+        if not _HAVE_FITZ:
+            raise RuntimeError("PyMuPDF not available")
+        if self._doc is None:
+            self._doc = fitz.open(stream=self.data, filetype="pdf")
+        return self._doc
+
+    @property
+    def page_count(self) -> int:
+        return len(self.doc)
+
+    def page(self, index: int) -> Any:
+        if index not in self._pages:
+            self._pages[index] = self.doc.load_page(index)
+        return self._pages[index]
+
+    def page_text(self, index: int) -> str:
+        if index not in self._text:
+            self._text[index] = self.page(index).get_text("text") or ""
+        return self._text[index]
+
+    def pages_text(self, max_pages: Optional[int] = None) -> List[str]:
+        n = self.page_count if max_pages is None else min(self.page_count, max_pages)
+        return [self.page_text(i) for i in range(n)]
+
+    def pixmap(self, index: int, zoom: float = 2.0) -> Any:
+        """Rendered page at `zoom`, shared by region detection and OCR cropping."""
+        key = (index, float(zoom))
+        if key not in self._pixmaps:
+            self._pixmaps[key] = self.page(index).get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return self._pixmaps[key]
+
+    def raster(self, index: int, zoom: float = 2.0, bgr: bool = True) -> Any:
+        """
+        Rendered page as a uint8 (H, W, C) array, cached per (page, zoom).
+        bgr=False is a zero-copy view over the pixmap samples (RGB, read-only);
+        bgr=True (OpenCV / LayoutParser order) costs one contiguous copy.
+        Arrays are only valid until close().
+        """
+        if not _HAVE_NUMPY:
+            raise RuntimeError("numpy not available")
+        key = (index, float(zoom), bool(bgr))
+        if key not in self._rasters:
+            if bgr:
+                rgb = self.raster(index, zoom, bgr=False)
+                img = np.ascontiguousarray(rgb[:, :, 2::-1]) if rgb.shape[2] >= 3 else rgb.copy()
+            else:
+                pix = self.pixmap(index, zoom)
+                samples = getattr(pix, "samples_mv", None)
+                if samples is None:  # older PyMuPDF: bytes copy
+                    samples = pix.samples
+                rows = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+                img = rows[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+            self._rasters[key] = img
+        return self._rasters[key]
+
+    def stream(self) -> io.BytesIO:
+        """Fresh binary stream over the raw bytes (for pdfminer and friends)."""
+        return io.BytesIO(self.data)
+
+    # -------------------- LIFECYCLE --------------------
+
+    def close(self) -> None:
+        self._pages.clear()
+        self._text.clear()
+        self._rasters.clear()
+        self._pixmaps.clear()
+        if self._doc is not None:
+            try:
+                self._doc.close()
+            except Exception:
+                pass
+            self._doc = None
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+PdfSource = Union[str, PdfDocument]
+
+
+def as_document(pdf: PdfSource) -> Tuple[PdfDocument, bool]:
+    """
+    Accept a path or an open PdfDocument.
+    Returns (document, owned); owned=True means the caller opened it and must close it.
+    """
+    if isinstance(pdf, PdfDocument):
+        return pdf, False
+    return PdfDocument.from_path(pdf), True
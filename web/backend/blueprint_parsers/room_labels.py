@@ -0,0 +1,76 @@
+"""
+Room Labels (R2.2)
+==================
+Text-based room finder: plan sheets label each room on a line of its own
+("BEDROOM 2", "MASTER BATH", "KITCHEN 12'-0\" x 14'-6\""). A line counts as a
+room label only when the whole line is a known room name, optionally followed
+by a number and/or dimensions, so notes such as "PROVIDE EXHAUST FAN IN ALL
+BATHROOMS" are not counted.
+
+Rooms repeated on other sheets (e.g. the electrical plan) count once: each
+label counts the largest number of times it appears on any single page.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+# room type -> alternatives (matched case-insensitively against the whole label)
+ROOM_TYPES: Dict[str, str] = {
+    "bedroom": r"(?:master\s+|primary\s+)?bed(?:room)?|master\s+suite",
+    "bathroom": r"(?:master\s+|primary\s+|half\s+)?bath(?:room)?|powder(?:\s+room)?",
+    "kitchen": r"kitchen|kitchenette",
+    "living": r"living(?:\s+room)?|family(?:\s+room)?|great\s+room",
+    "dining": r"dining(?:\s+room)?|breakfast(?:\s+nook)?",
+    "garage": r"garage",
+    "laundry": r"laundry(?:\s+room)?|mud\s*room|utility(?:\s+room)?",
+    "closet": r"(?:walk-in\s+)?closet|w\.?i\.?c\.?|pantry",
+    "office": r"office|study|den",
+    "entry": r"entry|foyer",
+}
+
+_DIMENSION = r"\d+'\s*-?\s*\d*\"?\s*[xX×]\s*\d+'\s*-?\s*\d*\"?"
+_LABEL_RE = re.compile(
+    r"(?P<name>" + "|".join(f"(?P<{t}>{alt})" for t, alt in ROOM_TYPES.items()) + r")"
+    r"(?:\s*#?\s*(?P<num>\d{1,3}))?(?:\s+" + _DIMENSION + r")?",
+    re.IGNORECASE,
+)
+
+
+def parse_room_labels(text: str) -> List[Dict[str, str]]:
+    """[{type, label}, ...] for every line of `text` that is a room label, in line order."""
+    found: List[Dict[str, str]] = []
+    for line in (text or "").splitlines():
+        m = _LABEL_RE.fullmatch(" ".join(line.split()))
+        if m is None:
+            continue
+        room_type = next(t for t in ROOM_TYPES if m.group(t))
+        label = " ".join(m.group("name").upper().split())
+        if m.group("num"):
+            label = f"{label} {m.group('num')}"
+        found.append({"type": room_type, "label": label})
+    return found
+
+
+def find_rooms(pages_text: Sequence[str]) -> Dict[str, Any]:
+    """
+    {"rooms": [{type, label, page}], "room_count", "by_type": {type: count}}
+    over per-page texts (1-based pages); a label keeps the first page it is seen on.
+    """
+    best: Dict[str, int] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    for page_no, text in enumerate(pages_text, start=1):
+        counts = Counter()
+        for room in parse_room_labels(text):
+            counts[room["label"]] += 1
+            first.setdefault(room["label"], {**room, "page": page_no})
+        for label, n in counts.items():
+            best[label] = max(best.get(label, 0), n)
+
+    rooms: List[Dict[str, Any]] = []
+    for label, room in first.items():
+        rooms.extend(dict(room) for _ in range(best[label]))
+    rooms.sort(key=lambda r: r["page"])
+    by_type = Counter(r["type"] for r in rooms)
+    return {"rooms": rooms, "room_count": len(rooms), "by_type": dict(by_type)}
@@ -0,0 +1,159 @@
+"""
+Wall-pair detection via an angle-bucketed grid hash.
+
+Finds every pair of near-parallel segments whose faces sit 1-30 pt apart and
+whose extents overlap along the wall, across the whole sheet:
+
+  1. Segments are grouped by page and bucketed by direction (0..180 deg,
+     ANGLE_TOL_DEG wide). Each segment is also entered in the next bucket, so
+     any two segments within the tolerance share at least one bucket.
+  2. Inside a bucket, coordinates are rotated onto the bucket axis: u runs along
+     the wall, v across it. Each segment is inserted into every u-cell its
+     extent covers.
+  3. Entries are sorted by (page, bucket, u-cell, v); a searchsorted window over v
+     yields candidate pairs in O(N log N + pairs).
+  4. Candidates are deduplicated and filtered exactly: angle difference,
+     perpendicular gap (midpoint of b to the line through a) and overlap.
+
+Pure NumPy; inputs are the x0, y0, x1, y1 columns of the extracted segments.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ANGLE_TOL_DEG = 5.0
+MIN_GAP_PT = 1.0
+MAX_GAP_PT = 30.0
+CELL_PT = 64.0
+# Upper bound on candidate pairs materialized at once (memory guard)
+PAIR_CHUNK = 4_000_000
+
+
+def _expand_windows(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For rows i with half-open windows [lo_i, hi_i) return flat (i, j) arrays."""
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lo), dtype=np.int64), counts)
+    starts = np.cumsum(counts) - counts
+    j = lo[rows] + (np.arange(total, dtype=np.int64) - starts[rows])
+    return rows, j
+
+
+def find_wall_pairs(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                    page: Optional[np.ndarray] = None,
+                    min_gap: float = MIN_GAP_PT,
+                    max_gap: float = MAX_GAP_PT,
+                    angle_tol_deg: float = ANGLE_TOL_DEG,
+                    cell: float = CELL_PT) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (a, b, gap): index arrays into the inputs (a < b) and the
+    perpendicular gap in PDF points for every parallel, overlapping pair.
+    Segments only pair within the same `page` (all on one page when omitted).
+    """
+    x0, y0, x1, y1 = (np.asarray(c, dtype=np.float64) for c in (x0, y0, x1, y1))
+    n = len(x0)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    if n < 2:
+        return empty
+
+    dx, dy = x1 - x0, y1 - y0
+    length = np.hypot(dx, dy)
+    ang = np.mod(np.arctan2(dy, dx), np.pi)
+    tol = np.deg2rad(angle_tol_deg)
+    n_buckets = max(1, int(np.ceil(np.pi / tol)))
+    bucket = np.minimum((ang / tol).astype(np.int64), n_buckets - 1)
+
+    # each segment goes to its own bucket and the next one (wrapping at 180 deg);
+    # bucket k's frame is rotated to k * tol, so its members sit within +/- tol of the axis
+    seg = np.concatenate([np.arange(n), np.arange(n)])
+    bkt = np.concatenate([bucket, (bucket + 1) % n_buckets])
+    if page is None:
+        page_id = np.zeros(2 * n, dtype=np.int64)
+    else:
+        page_id = np.tile(np.unique(np.asarray(page), return_inverse=True)[1].astype(np.int64), 2)
+    theta = bkt * tol
+    c, s = np.cos(theta), np.sin(theta)
+    ua = x0[seg] * c + y0[seg] * s
+    ub = x1[seg] * c + y1[seg] * s
+    va = -x0[seg] * s + y0[seg] * c
+    vb = -x1[seg] * s + y1[seg] * c
+    du = ub - ua
+    slope = np.divide(vb - va, du, out=np.zeros_like(du), where=np.abs(du) > 1e-9)
+
+    # rasterize each entry over the u-cells its extent covers
+    u_origin = min(ua.min(), ub.min())
+    c0 = np.floor((np.minimum(ua, ub) - u_origin) / cell).astype(np.int64)
+    c1 = np.floor((np.maximum(ua, ub) - u_origin) / cell).astype(np.int64)
+    entry, cell_idx = _expand_windows(c0, c1 + 1)
+    n_cells = int(c1.max()) + 1
+    key = (page_id[entry] * n_buckets + bkt[entry]) * n_cells + cell_idx
+    # v of the segment's line at the cell centre: parallel faces sharing a cell
+    # differ by ~their gap there, however far apart their midpoints are
+    u_centre = u_origin + (cell_idx + 0.5) * cell
+    v = va[entry] + slope[entry] * (u_centre - ua[entry])
+
+    # composite sort key: groups by (page, bucket, u-cell), then v within the group
+    window = max_gap * 1.25 + 1.0  # slack for segments off the bucket axis
+    v = v - v.min()
+    span = float(v.max()) + 2.0 * window + 1.0
+    comp = key.astype(np.float64) * span + v
+    order = np.argsort(comp, kind="stable")
+    comp = comp[order]
+    owner = seg[entry[order]]
+
+    m = len(comp)
+    lo = np.arange(m, dtype=np.int64) + 1
+    hi = np.searchsorted(comp, comp + window, side="right")
+    csum = np.cumsum(np.maximum(hi - lo, 0))
+
+    pair_keys = []
+    start = 0
+    while start < m:
+        base = int(csum[start - 1]) if start else 0
+        stop = max(int(np.searchsorted(csum, base + PAIR_CHUNK, side="right")), start + 1)
+        i, j = _expand_windows(lo[start:stop], hi[start:stop])
+        a, b = owner[i + start], owner[j]
+        keep = a != b
+        a, b = np.minimum(a[keep], b[keep]), np.maximum(a[keep], b[keep])
+        pair_keys.append(np.unique(a * n + b))
+        start = stop
+    uniq = np.unique(np.concatenate(pair_keys))
+    a, b = uniq // n, uniq % n
+
+    # exact filters
+    ok = (length[a] > 0) & (length[b] > 0)
+    dang = np.abs(ang[a] - ang[b])
+    dang = np.minimum(dang, np.pi - dang)
+    ok &= dang <= tol
+    ux, uy = dx[a] / np.where(length[a] > 0, length[a], 1.0), dy[a] / np.where(length[a] > 0, length[a], 1.0)
+    mx, my = 0.5 * (x0[b] + x1[b]), 0.5 * (y0[b] + y1[b])
+    gap = np.abs((mx - x0[a]) * -uy + (my - y0[a]) * ux)
+    ok &= (gap >= min_gap) & (gap <= max_gap)
+    # overlap of b's projection with a along a's direction
+    tb0 = (x0[b] - x0[a]) * ux + (y0[b] - y0[a]) * uy
+    tb1 = (x1[b] - x0[a]) * ux + (y1[b] - y0[a]) * uy
+    ok &= (np.maximum(tb0, tb1) > 0.0) & (np.minimum(tb0, tb1) < length[a])
+    return a[ok], b[ok], gap[ok]
+
+
+def gap_histogram(gaps: np.ndarray,
+                  min_gap: float = MIN_GAP_PT,
+                  max_gap: float = MAX_GAP_PT,
+                  bin_pt: float = 0.5) -> Dict[str, object]:
+    """Histogram of pair gaps (PDF points) for diagnostics."""
+    edges = np.arange(min_gap, max_gap + bin_pt, bin_pt)
+    counts, edges = np.histogram(np.asarray(gaps, dtype=np.float64), bins=edges)
+    mode = None
+    if counts.sum():
+        k = int(np.argmax(counts))
+        mode = float((edges[k] + edges[k + 1]) / 2.0)
+    return {
+        "bin_pt": bin_pt,
+        "edges_pt": [round(float(e), 3) for e in edges],
+        "counts": counts.astype(int).tolist(),
+        "mode_pt": mode,
+    }
@@ -0,0 +1,199 @@
+"""
+Background Job Queue
+====================
+Runs CPU-heavy plan work (TakeoffEngine, the AI takeoff pipeline, Excel
+reports) off the request path. Submitting returns a job id immediately; a
+bounded thread pool works through the jobs while the API keeps serving
+/health, /v1/estimate and everything else.
+
+Each job lives in its own directory so state survives a restart:
+
+  output/JOBS/<job_id>/job.json      status record (kind, status, progress, timestamps, error)
+  output/JOBS/<job_id>/input.pdf     uploaded plan set
+  output/JOBS/<job_id>/result.json   handler result (when succeeded)
+  output/JOBS/<job_id>/<artifact>    optional files written by the handler (e.g. result.xlsx)
+
+On startup, jobs left "queued" or "running" by a previous process are queued
+again (up to MAX_ATTEMPTS) since their input is on disk.
+
+Knobs (environment):
+  JOBS_DIR          default output/JOBS
+  JOBS_WORKERS      default 2
+  JOBS_MAX_PENDING  default 32 (submit raises QueueFull beyond this)
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_DIR = os.path.join("output", "JOBS")
+MAX_ATTEMPTS = 3
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# handler(job_dir, params, progress) -> result dict; progress(**fields) updates job.json
+JobHandler = Callable[[str, Dict[str, Any], Callable[..., None]], Dict[str, Any]]
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime())
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+class JobQueue:
+    def __init__(self, root: str = DEFAULT_DIR, workers: int = 2, max_pending: int = 32) -> None:
+        self.root = root
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self._handlers: Dict[str, JobHandler] = {}
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    # -------------------- REGISTRY --------------------
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    # -------------------- STORAGE --------------------
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir(job_id), "job.json")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # ids are generated hex; refuse anything that could escape the jobs dir
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._record_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.get(job_id) is None:
+            return None
+        try:
+            with open(os.path.join(self.job_dir(job_id), "result.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _update(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        with self._lock:
+            record = self.get(job_id) or {"id": job_id}
+            record.update(fields)
+            _write_json(self._record_path(job_id), record)
+            return record
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        try:
+            ids = [e.name for e in os.scandir(self.root) if e.is_dir()]
+        except FileNotFoundError:
+            return []
+        records = [r for r in (self.get(i) for i in ids) if r]
+        records.sort(key=lambda r: r.get("created", ""), reverse=True)
+        return records[:limit]
+
+    # -------------------- SUBMIT / RUN --------------------
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, pdf_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        if kind not in self._handlers:
+            raise KeyError(f"unknown job kind: {kind}")
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} jobs pending")
+            self._pending += 1
+        job_id = uuid.uuid4().hex
+        try:
+            os.makedirs(self.job_dir(job_id), exist_ok=True)
+            if pdf_bytes is not None:
+                with open(os.path.join(self.job_dir(job_id), "input.pdf"), "wb") as f:
+                    f.write(pdf_bytes)
+            record = self._update(job_id, kind=kind, status=QUEUED, params=params or {},
+                                  progress={}, attempts=0, created=_now(), error=None)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._pool.submit(self._run, job_id)
+        return record
+
+    def _run(self, job_id: str) -> None:
+        try:
+            record = self.get(job_id) or {}
+            handler = self._handlers.get(record.get("kind", ""))
+            self._update(job_id, status=RUNNING, started=_now(), attempts=int(record.get("attempts", 0)) + 1)
+            if handler is None:
+                raise KeyError(f"unknown job kind: {record.get('kind')}")
+
+            def progress(**fields: Any) -> None:
+                self._update(job_id, progress=fields)
+
+            result = handler(self.job_dir(job_id), record.get("params") or {}, progress)
+            _write_json(os.path.join(self.job_dir(job_id), "result.json"), result or {})
+            self._update(job_id, status=SUCCEEDED, finished=_now())
+        except Exception as e:
+            self._update(job_id, status=FAILED, finished=_now(), error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def recover(self) -> List[str]:
+        """Re-queue jobs a previous process left queued/running; returns their ids."""
+        requeued = []
+        for record in self.list_jobs(limit=10_000):
+            if record.get("status") not in (QUEUED, RUNNING):
+                continue
+            job_id = record["id"]
+            if int(record.get("attempts", 0)) >= MAX_ATTEMPTS:
+                self._update(job_id, status=FAILED, finished=_now(), error="interrupted too many times")
+                continue
+            self._update(job_id, status=QUEUED, progress={})
+            with self._lock:
+                self._pending += 1
+            self._pool.submit(self._run, job_id)
+            requeued.append(job_id)
+        return requeued
+
+    def stats(self) -> Dict[str, Any]:
+        return {"root": self.root, "workers": self.workers, "pending": self._pending, "max_pending": self.max_pending}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_DEFAULT_QUEUE: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue configured from the environment."""
+    global _DEFAULT_QUEUE
+    if _DEFAULT_QUEUE is None:
+        _DEFAULT_QUEUE = JobQueue(
+            root=os.environ.get("JOBS_DIR", DEFAULT_DIR),
+            workers=int(os.environ.get("JOBS_WORKERS", "2")),
+            max_pending=int(os.environ.get("JOBS_MAX_PENDING", "32")),
+        )
+    return _DEFAULT_QUEUE
@@ -3,6 +3,8 @@ import os
 import re
 from typing import Any, Dict, List, Optional, Tuple
 
+from .blueprint_parsers.pdf_document import PdfDocument, PdfSource, as_document
+
 # Prefer PyMuPDF for page-wise text and size if available
 try:
     import fitz  # PyMuPDF
@@ -133,41 +135,46 @@ def _guess_sheet_info(page_text: str, page_no: int) -> Dict[str, Optional[str]]:
 
 # --------------------------- Main extractor ---------------------------
 
-def extract_plan_features(pdf_path: str) -> Dict[str, Any]:
+def extract_plan_features(pdf: PdfSource) -> Dict[str, Any]:
     """
     Extract doc meta, per-page scales (raw + normalized), and sheet index (sheet_id/name)
+    `pdf` is a path or a shared PdfDocument (e.g. a decoded base64 upload).
     Returns PlanFeaturesV0 dict conforming to schemas/plan_features.schema.json.
     """
-    if not pdf_path or not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    if not isinstance(pdf, PdfDocument) and (not pdf or not os.path.exists(pdf)):
+        raise FileNotFoundError(f"PDF not found: {pdf}")
 
-    doc_meta_file_name = os.path.basename(pdf_path)
-    page_count: int = 0
-    page_sizes: List[str] = []
-    pages_text: List[str] = []
+    document, owned = as_document(pdf)
+    try:
+        doc_meta_file_name = document.name
+        page_count: int = 0
+        page_sizes: List[str] = []
+        pages_text: List[str] = []
 
-    if _HAVE_FITZ:
-        with fitz.open(pdf_path) as doc:
-            page_count = len(doc)
+        if _HAVE_FITZ:
+            page_count = document.page_count
             for i in range(page_count):
-                page = doc.load_page(i)
+                page = document.page(i)
                 # size in points (72 pt/inch)
                 w, h = page.rect.width, page.rect.height
                 page_sizes.append(_page_size_label(w, h))
-                pages_text.append(page.get_text("text") or "")
-    else:
-        # Without fitz, we can't reliably get page sizes; return "Unknown"
-        if _HAVE_PDFMINER:
-            text_all = pdfminer_extract_text(pdf_path) or ""
-            # Heuristic split into up to 3 pages of text to keep deterministic
-            pages_text = _split_text_equal(text_all, 3)
-            page_count = max(len(pages_text), 1)
-            page_sizes = ["Unknown"] * page_count
+            pages_text = document.pages_text()
         else:
-            # Last resort: minimal placeholders
-            pages_text = [""]
-            page_count = 1
-            page_sizes = ["Unknown"]
+            # Without fitz, we can't reliably get page sizes; return "Unknown"
+            if _HAVE_PDFMINER:
+                text_all = pdfminer_extract_text(document.stream()) or ""
+                # Heuristic split into up to 3 pages of text to keep deterministic
+                pages_text = _split_text_equal(text_all, 3)
+                page_count = max(len(pages_text), 1)
+                page_sizes = ["Unknown"] * page_count
+            else:
+                # Last resort: minimal placeholders
+                pages_text = [""]
+                page_count = 1
+                page_sizes = ["Unknown"]
+    finally:
+        if owned:
+            document.close()
 
     # Build scales
     scales: List[Dict[str, Any]] = []
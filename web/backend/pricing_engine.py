@@ -2,6 +2,9 @@ from __future__ import annotations
 import csv
 import hashlib
 import io
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple, Any
 
@@ -9,6 +12,10 @@ import math
 import json
 import yaml
 
+import numpy as np
+
+from .stage_timing import stage, timed
+
 # ---- Data structures ---------------------------------------------------------
 
 @dataclass
@@ -136,8 +143,105 @@ def _resolve_unit_cost(
     # fallback: 0 with policy_defaults source
     return 0.0, "policy_defaults"
 
+def _resolution_index(
+    policy: Policy,
+    vendor: Dict[Tuple[str,str], float],
+    unit: Dict[Tuple[str,str], float],
+) -> Dict[Tuple[str,str], Tuple[float, str]]:
+    """
+    {(trade, code): (unit_cost, source)} merged once in policy.resolution_order,
+    so a line resolves with one dict lookup (same answer as _resolve_unit_cost).
+    """
+    index: Dict[Tuple[str,str], Tuple[float, str]] = {}
+    for source in policy.resolution_order:
+        table = vendor if source == "vendor_quotes" else unit if source == "unit_costs" else None
+        if table is None:
+            continue
+        for key, cost in table.items():
+            index.setdefault(key, (cost, source))
+    return index
+
+# ---- Pricing context -----------------------------------------------------------
+
+DEFAULT_POLICY_PATH = "schemas/pricing_policy.v0.yaml"
+# Distinct (policy, region, cost tables) combinations kept parsed
+CONTEXT_CACHE_SIZE = 32
+
+_FILE_TEXT: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def read_text_cached(path: str) -> str:
+    """File contents, re-read only when the file's mtime/size changes."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(path)
+    cached = _FILE_TEXT.get(key)
+    if cached is None or cached[0] != stamp:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (stamp, f.read())
+        _FILE_TEXT[key] = cached
+    return cached[1]
+
+
+class PricingContext:
+    """
+    Everything price_quantities derives from policy + cost tables, built once:
+    the parsed Policy, the vendor/unit dicts, the merged resolution index and
+    the input digests. Shared (read-only) across requests with the same inputs.
+    """
+
+    def __init__(self, policy_text: str, region: Optional[str],
+                 unit_costs_csv: Optional[str], vendor_quotes_csv: Optional[str]) -> None:
+        self.policy = _load_policy(policy_text, region)
+        self.vendor = _parse_csv_kv(vendor_quotes_csv)
+        self.unit = _parse_csv_kv(unit_costs_csv)
+        self.index = _resolution_index(self.policy, self.vendor, self.unit)
+        self.digests = _digests([], policy_text, unit_costs_csv, vendor_quotes_csv)
+        del self.digests["quantities_json_sha256"]
+
+    def digests_for(self, quantities: Any) -> Dict[str, str]:
+        """Full input digests for one quantities payload (same as _digests)."""
+        q_bytes = json.dumps(quantities, sort_keys=True).encode("utf-8")
+        return {"quantities_json_sha256": _sha256_hex(q_bytes), **self.digests}
+
+    def resolve(self, trade: str, code: str) -> Tuple[float, str]:
+        return self.index.get((trade.lower(), code.lower()), (0.0, "policy_defaults"))
+
+
+_CONTEXTS: "OrderedDict[Tuple[Any, ...], PricingContext]" = OrderedDict()
+_CONTEXT_LOCK = threading.Lock()
+
+
+def get_pricing_context(
+    policy_yaml: Optional[str] = None,
+    region: Optional[str] = None,
+    unit_costs_csv: Optional[str] = None,
+    vendor_quotes_csv: Optional[str] = None,
+) -> PricingContext:
+    """
+    Cached PricingContext keyed by the content digests of its inputs.
+    policy_yaml=None uses schemas/pricing_policy.v0.yaml, re-read when it changes;
+    any edited input text produces a new key, so stale contexts are never served.
+    """
+    policy_text = policy_yaml or read_text_cached(DEFAULT_POLICY_PATH)
+    key = tuple(_sha256_hex(t.encode("utf-8")) if t is not None else None
+                for t in (policy_text, unit_costs_csv, vendor_quotes_csv)) + (region,)
+    with _CONTEXT_LOCK:
+        ctx = _CONTEXTS.get(key)
+        if ctx is not None:
+            _CONTEXTS.move_to_end(key)
+            return ctx
+    with stage("pricing.build_context"):
+        ctx = PricingContext(policy_text, region, unit_costs_csv, vendor_quotes_csv)
+    with _CONTEXT_LOCK:
+        _CONTEXTS[key] = ctx
+        while len(_CONTEXTS) > CONTEXT_CACHE_SIZE:
+            _CONTEXTS.popitem(last=False)
+    return ctx
+
 # ---- Core API ----------------------------------------------------------------
 
+@timed("pricing.price_quantities")
 def price_quantities(
     *,
     quantities: List[dict],
@@ -148,10 +252,11 @@ def price_quantities(
 ) -> Dict[str, Any]:
     """
     Returns an object conforming to schemas/estimate_response.schema.json (v0)
+    Policy and cost tables come from the cached PricingContext for these inputs;
+    unit costs resolve through its prebuilt index (one lookup per line).
     """
-    policy = _load_policy(policy_yaml, region)
-    vendor = _parse_csv_kv(vendor_quotes_csv)
-    unit = _parse_csv_kv(unit_costs_csv)
+    ctx = get_pricing_context(policy_yaml, region, unit_costs_csv, vendor_quotes_csv)
+    policy = ctx.policy
 
     priced: List[PricedItem] = []
     trade_totals: Dict[str, float] = {}
@@ -166,7 +271,7 @@ def price_quantities(
             qty=float(raw.get("qty", 0.0)),
             notes=raw.get("notes")
         )
-        base_unit, source = _resolve_unit_cost(qi.trade, qi.code, policy, vendor, unit)
+        base_unit, source = ctx.resolve(qi.trade, qi.code)
         waste_pct = _waste_pct_for(qi.trade, policy)
         extended_base = qi.qty * base_unit
         extended_with_waste = extended_base * (1.0 + waste_pct)
@@ -219,6 +324,114 @@ def price_quantities(
         "line_items": line_items,
         "grand_total": grand_total,
         "warnings": warnings,
-        "digests": _digests(quantities, policy_yaml or open("schemas/pricing_policy.v0.yaml","r",encoding="utf-8").read(), unit_costs_csv, vendor_quotes_csv),
+        "digests": ctx.digests_for(quantities),
     }
     return response
+
+
+@timed("pricing.price_quantities_batch")
+def price_quantities_batch(
+    *,
+    estimates: List[List[dict]],
+    policy_yaml: Optional[str],
+    region: Optional[str],
+    unit_costs_csv: Optional[str],
+    vendor_quotes_csv: Optional[str],
+) -> List[Dict[str, Any]]:
+    """
+    price_quantities for many quantity lists sharing one policy and cost tables.
+    Policy and CSVs come from one PricingContext; every line of every estimate is priced in
+    one set of NumPy column operations. Each response equals what
+    price_quantities returns for that list (same float operation order; the
+    per-trade sums accumulate in line order).
+    """
+    ctx = get_pricing_context(policy_yaml, region, unit_costs_csv, vendor_quotes_csv)
+    policy = ctx.policy
+
+    # flatten: one row per line item, remembering its estimate
+    rows: List[Tuple[str, str, str, str]] = []
+    qty_list: List[float] = []
+    est_of_row: List[int] = []
+    for e, quantities in enumerate(estimates):
+        for raw in quantities:
+            rows.append((raw["trade"], raw["code"], raw.get("description",""), raw.get("uom","EA")))
+            qty_list.append(float(raw.get("qty", 0.0)))
+            est_of_row.append(e)
+    n = len(rows)
+
+    # per distinct (trade, code) / trade lookups instead of per line
+    key_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+    waste_cache: Dict[str, float] = {}
+    base_unit = np.empty(n)
+    waste_pct = np.empty(n)
+    sources: List[str] = []
+    for i, (trade, code, _, _) in enumerate(rows):
+        hit = key_cache.get((trade, code))
+        if hit is None:
+            hit = key_cache[(trade, code)] = ctx.resolve(trade, code)
+        base_unit[i] = hit[0]
+        sources.append(hit[1])
+        w = waste_cache.get(trade)
+        if w is None:
+            w = waste_cache[trade] = _waste_pct_for(trade, policy)
+        waste_pct[i] = w
+
+    qty = np.asarray(qty_list, dtype=np.float64)
+    overhead_pct = float(policy.markups.get("overhead_pct", 0.0))
+    profit_pct = float(policy.markups.get("profit_pct", 0.0))
+    extended_base = qty * base_unit
+    extended_with_waste = extended_base * (1.0 + waste_pct)
+    overhead = extended_with_waste * overhead_pct
+    profit = (extended_with_waste + overhead) * profit_pct
+    subtotal_before_tax = extended_with_waste + overhead + profit
+    tax = subtotal_before_tax * float(policy.tax_pct)
+    escalated = subtotal_before_tax * float(policy.escalation_pct)
+    total = subtotal_before_tax + tax + escalated
+
+    # trade subtotals per estimate: bincount adds in row order, like the per-call loop
+    group_ids: Dict[Tuple[int, str], int] = {}
+    groups = np.fromiter((group_ids.setdefault((est_of_row[i], rows[i][0]), len(group_ids)) for i in range(n)),
+                         dtype=np.int64, count=n)
+    group_totals = np.bincount(groups, weights=total, minlength=len(group_ids)).tolist() if n else []
+
+    cols = [c.tolist() for c in (base_unit, waste_pct, extended_base, extended_with_waste, overhead,
+                                 profit, subtotal_before_tax, tax, total)]
+    qty_out = qty.tolist()
+
+    responses: List[Dict[str, Any]] = []
+    for quantities in estimates:
+        responses.append({
+            "version": "v0",
+            "policy_id": policy.id,
+            "region": policy.region,
+            "trades": [],
+            "line_items": [],
+            "grand_total": 0.0,
+            "warnings": [],
+            "digests": ctx.digests_for(quantities),
+        })
+    for i, (trade, code, description, uom) in enumerate(rows):
+        u, w, eb, ew, oh, pr, sb, tx, tot = (c[i] for c in cols)
+        resp = responses[est_of_row[i]]
+        resp["line_items"].append({
+            "trade": trade, "code": code, "description": description, "uom": uom, "qty": qty_out[i],
+            "unit_cost": round(u, 4), "waste_pct": round(w, 4),
+            "extended_base": round(eb, 2),
+            "extended_with_waste": round(ew, 2),
+            "markup_overhead": round(oh, 2),
+            "markup_profit": round(pr, 2),
+            "subtotal_before_tax": round(sb, 2),
+            "tax": round(tx, 2),
+            "total": round(tot, 2),
+            "source": sources[i]
+        })
+        if u == 0.0 and sources[i] == "policy_defaults":
+            resp["warnings"].append(f"Missing cost for {trade}/{code}; defaulted to 0.0")
+
+    trade_totals: List[Dict[str, float]] = [{} for _ in estimates]
+    for (e, trade), g in group_ids.items():
+        trade_totals[e][trade] = group_totals[g]
+    for resp, totals in zip(responses, trade_totals):
+        resp["trades"] = [{"trade": t, "subtotal": round(v, 2)} for t, v in sorted(totals.items())]
+        resp["grand_total"] = round(sum(totals.values()), 2)
+    return responses
@@ -0,0 +1,327 @@
+"""
+Incremental Pricing Session
+===========================
+Keeps one priced estimate in memory (line columns, trade subtotals, grand
+total) and re-prices only what a change touches:
+
+  - quantities      {line_index: qty}                        -> those lines
+  - unit_costs /    {(trade, code): unit_cost or None}       -> lines with that
+    vendor_quotes   (or [{"trade","code","unit_cost"}])         key (re-resolved)
+  - waste_defaults  {trade or "global_pct": pct}             -> lines of that trade
+                                                                 (all for global_pct)
+  - markups / tax_pct / escalation_pct                       -> every line
+                                                                 (vectorized)
+
+Only the trades owning a recomputed line are re-summed. apply() returns a diff
+(changed line items, changed trade subtotals, grand total); response() gives
+the full v0 estimate, equal to price_quantities on the same edited inputs
+apart from `digests` (line arithmetic and subtotal accumulation follow the
+same order). Its digests cover the current quantities and the session's
+original policy/cost tables, plus session_overrides_sha256 over the applied
+edits once there are any.
+
+Sessions for the HTTP API live in a bounded in-process store
+(PRICING_SESSIONS_MAX, default 64; least recently used evicted).
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .pricing_engine import _resolve_unit_cost, _sha256_hex, _waste_pct_for, get_pricing_context
+
+Key = Tuple[str, str]
+
+_COLUMNS = ("extended_base", "extended_with_waste", "markup_overhead", "markup_profit",
+            "subtotal_before_tax", "tax", "total")
+
+
+def _cost_changes(changes: Any) -> Dict[Key, Optional[float]]:
+    """{(trade, code): cost|None} from a dict or a [{"trade","code","unit_cost"}] list."""
+    if not changes:
+        return {}
+    if isinstance(changes, dict):
+        items: Iterable[Tuple[Any, Any]] = changes.items()
+    else:
+        items = (((row.get("trade", ""), row.get("code", "")), row.get("unit_cost")) for row in changes)
+    out: Dict[Key, Optional[float]] = {}
+    for (trade, code), cost in items:
+        key = (str(trade).strip().lower(), str(code).strip().lower())
+        out[key] = None if cost is None else float(cost)
+    return out
+
+
+class PricingSession:
+    def __init__(
+        self,
+        quantities: List[dict],
+        *,
+        policy_yaml: Optional[str] = None,
+        region: Optional[str] = None,
+        unit_costs_csv: Optional[str] = None,
+        vendor_quotes_csv: Optional[str] = None,
+    ) -> None:
+        ctx = get_pricing_context(policy_yaml, region, unit_costs_csv, vendor_quotes_csv)
+        # private copies: edits must not leak into the shared, cached context
+        self.policy = replace(ctx.policy, markups=dict(ctx.policy.markups),
+                              waste_defaults=dict(ctx.policy.waste_defaults))
+        self.vendor = dict(ctx.vendor)
+        self.unit = dict(ctx.unit)
+        self._base_digests = dict(ctx.digests)
+        self._overrides: List[Dict[str, Any]] = []
+        # held by callers around apply() when a session is shared between requests
+        self.lock = threading.Lock()
+
+        self.quantities = [dict(q) for q in quantities]
+        self.trades = [q["trade"] for q in self.quantities]
+        self.codes = [q["code"] for q in self.quantities]
+        n = len(self.quantities)
+        self.qty = np.asarray([float(q.get("qty", 0.0)) for q in self.quantities], dtype=np.float64).reshape(n)
+        self.unit_cost = np.zeros(n)
+        self.waste_pct = np.zeros(n)
+        self.sources: List[str] = [""] * n
+        self.cols = {c: np.zeros(n) for c in _COLUMNS}
+
+        self._by_key: Dict[Key, List[int]] = {}
+        self._by_trade: Dict[str, List[int]] = {}
+        for i, (t, c) in enumerate(zip(self.trades, self.codes)):
+            self._by_key.setdefault((t.lower(), c.lower()), []).append(i)
+            self._by_trade.setdefault(t, []).append(i)
+
+        self._resolve(list(self._by_key))
+        self._set_waste(list(self._by_trade))
+        self._compute(np.arange(n))
+        self.trade_totals: Dict[str, float] = {}
+        self._sum_trades(list(self._by_trade))
+
+    # -------------------- INTERNALS --------------------
+
+    def _resolve(self, keys: Iterable[Key]) -> List[int]:
+        touched: List[int] = []
+        for key in keys:
+            rows = self._by_key.get(key)
+            if not rows:
+                continue
+            cost, source = _resolve_unit_cost(key[0], key[1], self.policy, self.vendor, self.unit)
+            self.unit_cost[rows] = cost
+            for i in rows:
+                self.sources[i] = source
+            touched.extend(rows)
+        return touched
+
+    def _set_waste(self, trades: Iterable[str]) -> List[int]:
+        touched: List[int] = []
+        for trade in trades:
+            rows = self._by_trade.get(trade, [])
+            self.waste_pct[rows] = _waste_pct_for(trade, self.policy)
+            touched.extend(rows)
+        return touched
+
+    def _compute(self, idx: np.ndarray) -> None:
+        """Same operation order as price_quantities, on the selected rows."""
+        if len(idx) == 0:
+            return
+        p = self.policy
+        extended_base = self.qty[idx] * self.unit_cost[idx]
+        extended_with_waste = extended_base * (1.0 + self.waste_pct[idx])
+        overhead = extended_with_waste * float(p.markups.get("overhead_pct", 0.0))
+        profit = (extended_with_waste + overhead) * float(p.markups.get("profit_pct", 0.0))
+        subtotal_before_tax = extended_with_waste + overhead + profit
+        tax = subtotal_before_tax * float(p.tax_pct)
+        escalated = subtotal_before_tax * float(p.escalation_pct)
+        total = subtotal_before_tax + tax + escalated
+        for name, col in zip(_COLUMNS, (extended_base, extended_with_waste, overhead, profit,
+                                        subtotal_before_tax, tax, total)):
+            self.cols[name][idx] = col
+
+    def _sum_trades(self, trades: Iterable[str]) -> None:
+        total = self.cols["total"]
+        for trade in trades:
+            acc = 0.0
+            for v in total[self._by_trade[trade]].tolist():
+                acc += v
+            self.trade_totals[trade] = acc
+
+    def _line(self, i: int) -> Dict[str, Any]:
+        q = self.quantities[i]
+        c = {name: float(col[i]) for name, col in self.cols.items()}
+        return {
+            "trade": self.trades[i], "code": self.codes[i], "description": q.get("description", ""),
+            "uom": q.get("uom", "EA"), "qty": float(self.qty[i]),
+            "unit_cost": round(float(self.unit_cost[i]), 4), "waste_pct": round(float(self.waste_pct[i]), 4),
+            "extended_base": round(c["extended_base"], 2),
+            "extended_with_waste": round(c["extended_with_waste"], 2),
+            "markup_overhead": round(c["markup_overhead"], 2),
+            "markup_profit": round(c["markup_profit"], 2),
+            "subtotal_before_tax": round(c["subtotal_before_tax"], 2),
+            "tax": round(c["tax"], 2),
+            "total": round(c["total"], 2),
+            "source": self.sources[i],
+        }
+
+    def _trade_rows(self) -> List[Dict[str, Any]]:
+        return [{"trade": t, "subtotal": round(v, 2)} for t, v in sorted(self.trade_totals.items())]
+
+    # -------------------- API --------------------
+
+    @property
+    def grand_total(self) -> float:
+        return round(sum(self.trade_totals.values()), 2)
+
+    def warnings(self) -> List[str]:
+        return [f"Missing cost for {self.trades[i]}/{self.codes[i]}; defaulted to 0.0"
+                for i in range(len(self.trades))
+                if self.unit_cost[i] == 0.0 and self.sources[i] == "policy_defaults"]
+
+    def response(self) -> Dict[str, Any]:
+        """Full v0 estimate for the current state (digests include session_overrides_sha256 after edits)."""
+        q_bytes = json.dumps(self.quantities, sort_keys=True).encode("utf-8")
+        digests = {"quantities_json_sha256": _sha256_hex(q_bytes), **self._base_digests}
+        if self._overrides:
+            digests["session_overrides_sha256"] = _sha256_hex(
+                json.dumps(self._overrides, sort_keys=True, default=str).encode("utf-8"))
+        return {
+            "version": "v0",
+            "policy_id": self.policy.id,
+            "region": self.policy.region,
+            "trades": self._trade_rows(),
+            "line_items": [self._line(i) for i in range(len(self.trades))],
+            "grand_total": self.grand_total,
+            "warnings": self.warnings(),
+            "digests": digests,
+        }
+
+    def apply(
+        self,
+        *,
+        quantities: Optional[Dict[Any, float]] = None,
+        unit_costs: Any = None,
+        vendor_quotes: Any = None,
+        waste_defaults: Optional[Dict[str, float]] = None,
+        markups: Optional[Dict[str, float]] = None,
+        tax_pct: Optional[float] = None,
+        escalation_pct: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Apply deltas and re-price only the affected lines.
+        Returns {"lines": [{"index", **line_item}], "trades": [{"trade","subtotal"}],
+        "grand_total", "grand_total_delta", "recomputed"} listing only what changed.
+        """
+        n = len(self.trades)
+        before_total = self.grand_total
+        before_trades = {t: round(v, 2) for t, v in self.trade_totals.items()}
+        dirty: List[int] = []
+        full = False
+
+        for raw_index, value in (quantities or {}).items():
+            i = int(raw_index)
+            if not 0 <= i < n:
+                raise IndexError(f"line index out of range: {i}")
+            self.qty[i] = float(value)
+            self.quantities[i]["qty"] = float(value)
+            dirty.append(i)
+
+        cost_keys: List[Key] = []
+        for table, changes in ((self.unit, unit_costs), (self.vendor, vendor_quotes)):
+            for key, cost in _cost_changes(changes).items():
+                if cost is None:
+                    table.pop(key, None)
+                else:
+                    table[key] = cost
+                cost_keys.append(key)
+        dirty.extend(self._resolve(cost_keys))
+
+        if waste_defaults:
+            self.policy.waste_defaults.update({str(k).lower() if k != "global_pct" else k: float(v)
+                                               for k, v in waste_defaults.items()})
+            if "global_pct" in waste_defaults:
+                dirty.extend(self._set_waste(list(self._by_trade)))
+            else:
+                changed = {str(k).lower() for k in waste_defaults}
+                dirty.extend(self._set_waste([t for t in self._by_trade if t.lower() in changed]))
+
+        if markups:
+            self.policy.markups.update({k: float(v) for k, v in markups.items()})
+            full = True
+        if tax_pct is not None:
+            self.policy.tax_pct = float(tax_pct)
+            full = True
+        if escalation_pct is not None:
+            self.policy.escalation_pct = float(escalation_pct)
+            full = True
+
+        delta = {k: v for k, v in (("quantities", quantities), ("unit_costs", unit_costs),
+                                   ("vendor_quotes", vendor_quotes), ("waste_defaults", waste_defaults),
+                                   ("markups", markups), ("tax_pct", tax_pct),
+                                   ("escalation_pct", escalation_pct)) if v not in (None, {}, [])}
+        if delta:
+            self._overrides.append({k: ({str(a): b for a, b in v.items()} if isinstance(v, dict) else v)
+                                    for k, v in delta.items()})
+
+        rows = np.arange(n) if full else np.unique(np.asarray(dirty, dtype=np.int64))
+        before = np.stack([self.cols[c][rows] for c in _COLUMNS]) if len(rows) else None
+        self._compute(rows)
+        self._sum_trades(list(self._by_trade) if full else sorted({self.trades[int(i)] for i in rows}))
+
+        lines = []
+        if len(rows):
+            after = np.stack([self.cols[c][rows] for c in _COLUMNS])
+            # qty / cost / waste edits always show up in extended_base onwards; a zero-qty
+            # line can still change source or unit cost, so dirty (non-full) rows are all listed
+            moved = np.any(after != before, axis=0) if full else np.ones(len(rows), dtype=bool)
+            lines = [{"index": i, **self._line(i)} for i in rows[moved].tolist()]
+        trades = [row for row in self._trade_rows() if before_trades.get(row["trade"]) != row["subtotal"]]
+        grand_total = self.grand_total
+        return {
+            "lines": lines,
+            "trades": trades,
+            "grand_total": grand_total,
+            "grand_total_delta": round(grand_total - before_total, 2),
+            "recomputed": int(len(rows)),
+        }
+
+
+class SessionStore:
+    """In-process sessions by id, least recently used evicted beyond `max_sessions`."""
+
+    def __init__(self, max_sessions: int = 64) -> None:
+        self.max_sessions = max(1, int(max_sessions))
+        self._sessions: "OrderedDict[str, PricingSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, session: PricingSession) -> str:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[PricingSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+_STORE: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store sized by PRICING_SESSIONS_MAX (default 64)."""
+    global _STORE
+    if _STORE is None:
+        _STORE = SessionStore(int(os.environ.get("PRICING_SESSIONS_MAX", "64")))
+    return _STORE
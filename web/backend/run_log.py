@@ -0,0 +1,202 @@
+"""
+Buffered Run Log
+================
+Shared writer for the run logs (output/TAKEOFF_RUN.log,
+output/INTERACTIVE/INTERACTIVE_RUN.log, output/INTERACTIVE/route_errors.log).
+Request handlers only enqueue a record; a background thread batches records,
+writes each file once per batch and rotates files by size, so a hot path never
+opens a file or waits on disk.
+
+Records are JSON lines:
+  {"timestamp": "...", "request_id": "...", "msg": "...", <fields>}
+request_id comes from the current request context (see bind_request_id; the
+API middleware binds X-Request-ID or a fresh id per request) unless a field
+overrides it.
+
+If the queue is full the record is dropped and counted (stats()["dropped"]);
+logging never blocks the caller.
+
+Knobs (environment):
+  RUN_LOG_QUEUE_MAX      default 10000 pending records
+  RUN_LOG_MAX_BYTES      default 5 MB per file before rotation (0 = never rotate)
+  RUN_LOG_BACKUPS        default 3 (<file>.1 .. <file>.N kept)
+  RUN_LOG_FLUSH_S        default 0.2; max delay before a batch is written
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TAKEOFF_LOG = os.path.join("output", "TAKEOFF_RUN.log")
+INTERACTIVE_LOG = os.path.join("output", "INTERACTIVE", "INTERACTIVE_RUN.log")
+
+# Records written per file per batch at most
+BATCH_MAX = 1000
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("run_log_request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def bind_request_id(request_id: Optional[str]) -> Iterator[Optional[str]]:
+    """Tag every record logged in this context (and tasks/threads copying it) with request_id."""
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+class RunLog:
+    def __init__(self, max_pending: int = 10_000, max_bytes: int = 5_000_000, backups: int = 3,
+                 flush_s: float = 0.2) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self.flush_s = max(0.0, float(flush_s))
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._sizes: Dict[str, int] = {}
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    # -------------------- PRODUCER --------------------
+
+    def log(self, path: str, msg: Optional[str] = None, **fields: Any) -> None:
+        """Queue one JSON record for `path`; returns immediately."""
+        record: Dict[str, Any] = {"timestamp": datetime.now().isoformat(), "request_id": _request_id.get()}
+        if msg is not None:
+            record["msg"] = msg.rstrip()
+        record.update(fields)
+        try:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        except Exception:
+            line = json.dumps({"timestamp": record["timestamp"], "request_id": record["request_id"],
+                               "msg": str(msg), "error": "unserializable fields"})
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((path, line))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="run-log", daemon=True)
+                self._thread.start()
+
+    # -------------------- WRITER --------------------
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch: List[Optional[Tuple[str, str]]] = [item]
+            deadline = time.monotonic() + self.flush_s
+            while item is not None and len(batch) < BATCH_MAX:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            by_path: Dict[str, List[str]] = {}
+            for entry in batch:
+                if entry is not None:
+                    by_path.setdefault(entry[0], []).append(entry[1])
+            for path, lines in by_path.items():
+                self._write(path, lines)
+            self.batches += 1
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, path: str, lines: List[str]) -> None:
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            size = self._sizes.get(path)
+            if size is None:
+                parent = os.path.dirname(path)
+                if parent:
+                    os.makedirs(parent, exist_ok=True)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+            if self.max_bytes and size and size + len(data) > self.max_bytes:
+                self._rotate(path)
+                size = 0
+            with open(path, "ab") as f:
+                f.write(data)
+            self._sizes[path] = size + len(data)
+            self.written += len(lines)
+        except Exception:
+            self._sizes.pop(path, None)
+            self.errors += 1
+
+    def _rotate(self, path: str) -> None:
+        if self.backups <= 0:
+            os.remove(path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+    # -------------------- CONTROL --------------------
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued record is on disk (True) or `timeout` passes (False)."""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)  # wakes the writer so it doesn't sit out flush_s
+        except queue.Full:
+            return False
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "batches": self.batches, "errors": self.errors,
+                "max_bytes": self.max_bytes, "backups": self.backups}
+
+
+_DEFAULT: Optional[RunLog] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_run_log() -> RunLog:
+    """Process-wide writer configured from the environment; flushed at exit."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = RunLog(
+                    max_pending=int(os.environ.get("RUN_LOG_QUEUE_MAX", "10000")),
+                    max_bytes=int(os.environ.get("RUN_LOG_MAX_BYTES", "5000000")),
+                    backups=int(os.environ.get("RUN_LOG_BACKUPS", "3")),
+                    flush_s=float(os.environ.get("RUN_LOG_FLUSH_S", "0.2")),
+                )
+                atexit.register(_DEFAULT.flush, 2.0)
+    return _DEFAULT
+
+
+def log_event(path: str, msg: Optional[str] = None, **fields: Any) -> None:
+    """Shorthand for get_run_log().log(...)."""
+    get_run_log().log(path, msg, **fields)
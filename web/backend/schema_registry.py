@@ -0,0 +1,202 @@
+"""
+JSON Schema Registry
+====================
+Every schemas/*.json file is loaded, checked and compiled into a validator
+once per process (at startup), instead of each request re-reading the file
+and building a new validator.
+
+- validate(name, instance): raises jsonschema.ValidationError like
+  jsonschema.validate (best-matching error); name is the file name without
+  ".schema.json" / ".json" (e.g. "trade_quantities").
+- validator(name): the cached jsonschema validator (draft from "$schema").
+- Fast path: when fastjsonschema is installed, draft-04/06/07 schemas are
+  also compiled to Python code and valid instances are accepted by it alone;
+  a rejection is re-checked by jsonschema so errors read the same either way.
+  2020-12 schemas always use jsonschema (fastjsonschema doesn't support them).
+- stats(): per-schema validation count, failures, total/max time, fast-path use.
+
+Knobs (environment):
+  SCHEMAS_DIR          default schemas
+  SCHEMAS_HOT_RELOAD   "true" (dev) = recompile a schema when its file changes
+                       and pick up new files; default off
+  SCHEMAS_FAST_PATH    "false" disables the fastjsonschema fast path
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import jsonschema
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+try:
+    import fastjsonschema
+    _HAVE_FASTJSONSCHEMA = True
+except Exception:
+    _HAVE_FASTJSONSCHEMA = False
+
+DEFAULT_DIR = "schemas"
+_FAST_DRAFTS = ("draft-04", "draft-06", "draft-07")
+
+
+def schema_name(file_name: str) -> str:
+    """"trade_quantities.schema.json" -> "trade_quantities"."""
+    for suffix in (".schema.json", ".json"):
+        if file_name.endswith(suffix):
+            return file_name[: -len(suffix)]
+    return file_name
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class _Entry:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stamp = _stamp(path)
+        self.error: Optional[str] = None
+        self.validator: Any = None
+        self.fast: Optional[Callable[[Any], Any]] = None
+        self.count = 0
+        self.failures = 0
+        self.fast_hits = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                schema = json.load(f)
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            self.validator = cls(schema)
+        except Exception as e:
+            self.error = str(e)
+            return
+        if _HAVE_FASTJSONSCHEMA and any(d in str(schema.get("$schema", "")) for d in _FAST_DRAFTS):
+            try:
+                # use_default=False: never write schema defaults into the instance (jsonschema does not)
+                self.fast = fastjsonschema.compile(schema, use_default=False)
+            except Exception:
+                self.fast = None
+
+
+class SchemaRegistry:
+    def __init__(self, root: str = DEFAULT_DIR, hot_reload: bool = False, fast_path: bool = True) -> None:
+        self.root = root
+        self.hot_reload = hot_reload
+        self.fast_path = fast_path
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> List[str]:
+        """(Re)compile every *.json schema under root; returns the loaded names."""
+        try:
+            files = sorted(f for f in os.listdir(self.root) if f.endswith(".json"))
+        except FileNotFoundError:
+            files = []
+        entries = {schema_name(f): _Entry(os.path.join(self.root, f)) for f in files}
+        with self._lock:
+            self._entries = entries
+        return list(entries)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if self.hot_reload:
+            if entry is None:
+                path = os.path.join(self.root, f"{name}.schema.json")
+                if not os.path.exists(path):
+                    path = os.path.join(self.root, f"{name}.json")
+                if os.path.exists(path):
+                    entry = _Entry(path)
+            elif _stamp(entry.path) != entry.stamp:
+                entry = _Entry(entry.path)
+            if entry is not None and self._entries.get(name) is not entry:
+                with self._lock:
+                    self._entries[name] = entry
+        if entry is None:
+            raise KeyError(f"unknown schema: {name}")
+        if entry.error is not None:
+            raise jsonschema.SchemaError(f"schema {name} failed to load: {entry.error}")
+        return entry
+
+    def validator(self, name: str) -> Any:
+        return self._entry(name).validator
+
+    def is_valid(self, name: str, instance: Any) -> bool:
+        try:
+            self.validate(name, instance)
+            return True
+        except jsonschema.ValidationError:
+            return False
+
+    def validate(self, name: str, instance: Any) -> None:
+        """Raise the best-matching jsonschema.ValidationError if `instance` doesn't conform."""
+        entry = self._entry(name)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            if self.fast_path and entry.fast is not None:
+                try:
+                    entry.fast(instance)
+                    entry.fast_hits += 1
+                    return
+                except Exception:
+                    pass
+            error = best_match(entry.validator.iter_errors(instance))
+        finally:
+            elapsed = time.perf_counter() - t0
+            entry.count += 1
+            entry.total_s += elapsed
+            entry.max_s = max(entry.max_s, elapsed)
+            if error is not None:
+                entry.failures += 1
+        if error is not None:
+            raise error
+
+    def stats(self) -> Dict[str, Any]:
+        schemas = {}
+        for name, e in self._entries.items():
+            schemas[name] = {
+                "loaded": e.error is None,
+                "error": e.error,
+                "fast_path": e.fast is not None and self.fast_path,
+                "validations": e.count,
+                "failures": e.failures,
+                "fast_path_hits": e.fast_hits,
+                "total_ms": round(e.total_s * 1000.0, 3),
+                "mean_ms": round(e.total_s * 1000.0 / e.count, 3) if e.count else None,
+                "max_ms": round(e.max_s * 1000.0, 3),
+            }
+        return {"root": self.root, "hot_reload": self.hot_reload,
+                "fastjsonschema": _HAVE_FASTJSONSCHEMA, "schemas": schemas}
+
+
+_REGISTRY: Optional[SchemaRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_schema_registry() -> SchemaRegistry:
+    """Process-wide registry configured from the environment, compiled on first use."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                registry = SchemaRegistry(
+                    root=os.environ.get("SCHEMAS_DIR", DEFAULT_DIR),
+                    hot_reload=os.environ.get("SCHEMAS_HOT_RELOAD", "").lower() == "true",
+                    fast_path=os.environ.get("SCHEMAS_FAST_PATH", "true").lower() != "false",
+                )
+                registry.load_all()
+                _REGISTRY = registry
+    return _REGISTRY
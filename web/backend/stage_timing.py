@@ -0,0 +1,237 @@
+"""
+Stage Timing, Metrics and Request Profiling
+===========================================
+Instrumentation for the estimate pipeline (PDF decode, drawing extraction,
+scale detection, summaries, ML estimate, pricing, Excel).
+
+- stage(name) / @timed(name): times a block. Every timing feeds a process-wide
+  histogram (render_prometheus() -> GET /metrics) and, inside a request, the
+  request's Timings (bound by the API middleware; contextvars carry it into
+  run_in_threadpool workers).
+- Timings.as_ms(): {stage: total ms} for the request, returned as `timings_ms`
+  in responses and as a Server-Timing header when the client opts in
+  (X-Timings: 1 header or ?timings=true).
+- SamplingProfiler: optional per-request sampler. Every interval it records the
+  stacks of the threads that worked on the request (the request's own thread
+  plus every worker that entered a stage for it) and writes them in collapsed
+  "frame;frame;frame count" form (flamegraph.pl / speedscope) to
+  <STAGE_PROFILE_DIR>/<request_id>.folded. Samples of the event-loop thread can
+  include other requests' async code.
+
+Knobs (environment):
+  STAGE_PROFILE              "" (default, off) | "header" (requests with X-Profile: 1) | "all"
+  STAGE_PROFILE_INTERVAL_MS  default 5
+  STAGE_PROFILE_DIR          default output/PROFILES
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Histogram bucket upper bounds (seconds); +Inf is implicit
+BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Deepest stack kept per profiler sample
+MAX_STACK_DEPTH = 64
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label value (Prometheus histogram semantics)."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float] = BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, List[float]] = {}  # value -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {v: {"count": s[-2], "sum_s": s[-1]} for v, s in self._series.items()}
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {v: list(s) for v, s in self._series.items()}
+        for value in sorted(series):
+            s = series[value]
+            lbl = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(self.buckets, s):
+                out.append(f'{self.name}_bucket{{{lbl},le="{bound:g}"}} {int(count)}')
+            out.append(f'{self.name}_bucket{{{lbl},le="+Inf"}} {int(s[-2])}')
+            out.append(f"{self.name}_sum{{{lbl}}} {s[-1]:.6f}")
+            out.append(f"{self.name}_count{{{lbl}}} {int(s[-2])}")
+        return out
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram("jcw_stage_duration_seconds", "Estimate pipeline stage duration.", "stage")
+HTTP_SECONDS = Histogram("jcw_http_request_duration_seconds", "HTTP request duration by route.", "route")
+
+
+def render_prometheus() -> str:
+    """Text exposition format (version 0.0.4) of every histogram."""
+    return "\n".join(STAGE_SECONDS.render() + HTTP_SECONDS.render()) + "\n"
+
+
+class Timings:
+    """Stage timings collected for one request."""
+
+    def __init__(self, request_id: Optional[str] = None, expose: bool = False) -> None:
+        self.request_id = request_id
+        self.expose = expose
+        self.records: List[Tuple[str, float]] = []  # (stage, seconds), in completion order
+        self.threads = {threading.get_ident()}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.records.append((name, seconds))
+
+    def as_ms(self) -> Dict[str, float]:
+        """{stage: total ms}; repeated stages (e.g. per page) are summed."""
+        totals: Dict[str, float] = {}
+        for name, seconds in list(self.records):
+            totals[name] = totals.get(name, 0.0) + seconds
+        return {name: round(s * 1000.0, 3) for name, s in totals.items()}
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_ms().items())
+
+
+_current: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar("stage_timings", default=None)
+
+
+def current_timings() -> Optional[Timings]:
+    return _current.get()
+
+
+@contextmanager
+def request_timings(request_id: Optional[str] = None, expose: bool = False) -> Iterator[Timings]:
+    """Bind a fresh Timings for the duration of a request."""
+    timings = Timings(request_id, expose)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is not None:
+        timings.threads.add(threading.get_ident())
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(name, elapsed)
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of stage(name)."""
+    def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def attach_timings(body: Any) -> Any:
+    """Add `timings_ms` to a dict response when the client asked for timings."""
+    timings = _current.get()
+    if timings is not None and timings.expose and isinstance(body, dict):
+        body["timings_ms"] = timings.as_ms()
+    return body
+
+
+# -------------------- PROFILER --------------------
+
+def profile_mode() -> str:
+    return os.environ.get("STAGE_PROFILE", "").strip().lower()
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of one request's threads on a background thread."""
+
+    def __init__(self, timings: Timings, interval_s: float = 0.005) -> None:
+        self.timings = timings
+        self.interval_s = max(0.001, float(interval_s))
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            for ident in list(self.timings.threads):
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack: List[str] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self, out_dir: Optional[str] = None) -> Optional[str]:
+        """Stop sampling and write the collapsed stacks; returns the file path (None if no samples)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if not self.samples:
+            return None
+        out_dir = out_dir or os.environ.get("STAGE_PROFILE_DIR", os.path.join("output", "PROFILES"))
+        # Basename only: the request id may come from a client header
+        name = os.path.basename(self.timings.request_id or "").lstrip(".")
+        path = os.path.join(out_dir, f"{name or f'profile-{int(time.time() * 1000)}'}.folded")
+        os.makedirs(out_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def start_profiler(timings: Timings, requested: bool) -> Optional[SamplingProfiler]:
+    """A running profiler when STAGE_PROFILE allows it for this request, else None."""
+    mode = profile_mode()
+    if mode == "all" or (mode == "header" and requested):
+        interval_ms = float(os.environ.get("STAGE_PROFILE_INTERVAL_MS", "5"))
+        return SamplingProfiler(timings, interval_ms / 1000.0).start()
+    return None
@@ -0,0 +1,184 @@
+"""
+Takeoff Result Cache
+====================
+Content-addressed, disk-backed cache for takeoff stage outputs.
+
+- Key: SHA-256 of the PDF bytes + a namespace ("takeoff", "plan_features", ...)
+  + the settings that change the result (max_pages, fixtures.rules.yaml digest,
+  layout/roomfinder flags) + CACHE_FORMAT, so a format bump orphans old entries.
+- Value: JSON document with the stage outputs, one file per key.
+- Eviction: least-recently-used (file mtime is touched on every hit) once the
+  directory exceeds the entry count or byte size cap.
+
+Knobs (environment):
+  TAKEOFF_CACHE_ENABLED      default "true"
+  TAKEOFF_CACHE_DIR          default output/CACHE/takeoff
+  TAKEOFF_CACHE_MAX_MB       default 256
+  TAKEOFF_CACHE_MAX_ENTRIES  default 512
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Part of every key: bump when a cached stage's output changes shape or meaning
+# (v2: array-based geometry, rule hits with count x qty and pages/positions)
+CACHE_FORMAT = "takeoff-cache.v2"
+DEFAULT_DIR = os.path.join("output", "CACHE", "takeoff")
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: Any) -> str:
+    """SHA-256 of a file's bytes; empty string when missing/unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return sha256_bytes(f.read())
+    except Exception:
+        return ""
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy scalars / arrays and tuples from stage outputs
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+class TakeoffCache:
+    def __init__(self,
+                 root: str = DEFAULT_DIR,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 max_entries: int = 512,
+                 enabled: bool = True) -> None:
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # -------------------- KEYS --------------------
+
+    @staticmethod
+    def key(pdf_sha256: str, namespace: str, settings: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps(
+            {"format": CACHE_FORMAT, "pdf": pdf_sha256, "ns": namespace, "settings": settings or {}},
+            sort_keys=True, default=str,
+        )
+        return sha256_bytes(payload.encode("utf-8"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    # -------------------- GET / PUT --------------------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("format") != CACHE_FORMAT:
+                raise ValueError("stale cache format")
+            os.utime(path, None)  # LRU: mark as recently used
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.get("value")
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            blob = json.dumps({"format": CACHE_FORMAT, "key": key, "value": value}, default=_json_default)
+            tmp = self._path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(blob)
+            os.replace(tmp, self._path(key))
+            self._evict()
+        except Exception:
+            # Cache is best-effort; never fail the request on a write error
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Returns (value, hit)."""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    # -------------------- EVICTION --------------------
+
+    def _entries(self) -> list:
+        out = []
+        try:
+            with os.scandir(self.root) as it:
+                for e in it:
+                    if e.is_file() and e.name.endswith(".json"):
+                        st = e.stat()
+                        out.append((st.st_mtime, st.st_size, e.path))
+        except FileNotFoundError:
+            pass
+        return out
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = sorted(self._entries())  # oldest first
+            total = sum(size for _, size, _ in entries)
+            while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+                _, size, path = entries.pop(0)
+                try:
+                    os.unlink(path)
+                except Exception:
+                    pass
+                total -= size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "enabled": self.enabled,
+            "root": self.root,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_DEFAULT_CACHE: Optional[TakeoffCache] = None
+
+
+def get_default_cache() -> TakeoffCache:
+    """Process-wide cache configured from the environment."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = TakeoffCache(
+            root=os.environ.get("TAKEOFF_CACHE_DIR", DEFAULT_DIR),
+            max_bytes=int(float(os.environ.get("TAKEOFF_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            max_entries=int(os.environ.get("TAKEOFF_CACHE_MAX_ENTRIES", "512")),
+            enabled=os.environ.get("TAKEOFF_CACHE_ENABLED", "true").lower() == "true",
+        )
+    return _DEFAULT_CACHE
@@ -1,19 +1,18 @@
 from __future__ import annotations
-import base64
-import io
 import os
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from .blueprint_parsers.pdf_titleblock import find_scale_strings, normalize_scale
-from .blueprint_parsers.layout_stage import detect_regions, extract_text, parse_titleblock, parse_legend
+from .blueprint_parsers.layout_stage import detect_regions, extract_region_texts, parse_titleblock, parse_legend
+from .blueprint_parsers.pdf_document import PdfDocument, PdfSource
+from .blueprint_parsers.fixture_rules import FixtureRules, get_fixture_rules
+from .blueprint_parsers.page_pool import map_page_ranges, resolve_workers, use_pool
+from .blueprint_parsers.room_labels import find_rooms
+from .takeoff_cache import TakeoffCache, file_digest
+from .run_log import TAKEOFF_LOG, log_event
+from .stage_timing import timed
 from pathlib import Path
-import re
-try:
-    import yaml
-    _HAVE_YAML = True
-except Exception:
-    _HAVE_YAML = False
 
 # Optional imports guarded for determinism
 try:
@@ -30,16 +29,45 @@ except Exception:
     _HAVE_PDFMINER = False
 
 
-LOG_PATH = os.path.join("output", "TAKEOFF_RUN.log")
+LOG_PATH = TAKEOFF_LOG
 
 
 def _log(msg: str) -> None:
+    # queued; written by the run_log writer thread
+    log_event(LOG_PATH, msg, source="takeoff_engine")
+
+
+def _page_geometry(page: Any) -> Tuple[float, float]:
+    """(wall_lf, slab_sf) heuristics for one fitz page."""
+    wall_lf = 0.0
+    slab_sf = 0.0
+    # Approximate: sum lengths of stroke line segments as "walls"
+    for d in page.get_drawings():
+        for item in d["items"]:
+            itype = item[0]
+            if itype == "l":  # line
+                p1, p2 = item[1], item[2]
+                dx = float(p2.x - p1.x)
+                dy = float(p2.y - p1.y)
+                seg = (dx * dx + dy * dy) ** 0.5
+                wall_lf += seg / 12.0  # convert points->inches->feet approx; heuristic
+            elif itype == "re":  # rectangle path (proxy for slab regions)
+                rect = item[1]
+                # approximate area in square feet
+                slab_sf += (float(rect.width) * float(rect.height)) / (12.0 * 12.0)
+    return wall_lf, slab_sf
+
+
+def _geometry_page_range(source: Any, start: int, stop: int) -> List[Tuple[float, float]]:
+    """Process-pool worker: open the PDF independently and measure pages [start, stop)."""
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=bytes(source), filetype="pdf")
+    else:
+        doc = fitz.open(source)
     try:
-        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(msg.rstrip() + "\n")
-    except Exception:
-        pass
+        return [_page_geometry(doc.load_page(i)) for i in range(start, stop)]
+    finally:
+        doc.close()
 
 
 @dataclass
@@ -50,53 +78,49 @@ class PdfMeta:
 
 
 class TakeoffEngine:
-    def __init__(self, max_pages: int = 3) -> None:
+    def __init__(self, max_pages: int = 3, workers: Optional[int] = None) -> None:
         self.max_pages = max_pages
+        # Parallel page extraction (TAKEOFF_WORKERS when not given; 1 = sequential)
+        self.workers = resolve_workers(workers)
         self.rules_path = Path("data/fixtures.rules.yaml")
+        # Shared per-request document; set by load_pdf and reused by later stages
+        self.document: Optional[PdfDocument] = None
 
     # -------------------- LOADING --------------------
 
-    def load_pdf(self, pdf_path: Optional[str] = None, pdf_base64: Optional[str] = None) -> Tuple[PdfMeta, List[Any], List[str]]:
+    @timed("takeoff.load_pdf")
+    def load_pdf(self,
+                 pdf_path: Optional[str] = None,
+                 pdf_base64: Optional[str] = None,
+                 document: Optional[PdfDocument] = None) -> Tuple[PdfMeta, List[Any], List[str]]:
         """
         Returns (pdf_meta, pages, pages_text_list).
         pages: engine-specific page objects if fitz available, else empty list
         pages_text_list: extracted text per page (first N pages)
+        Pass `document` to reuse an already-opened PdfDocument; otherwise one is
+        built from pdf_path|pdf_base64 and kept on `self.document` for later stages.
         """
         _log("[F2] TakeoffEngine.load_pdf: start")
-        source_pdf = "<inline-base64>" if pdf_base64 else (pdf_path or "<unknown-path>")
+        if document is None:
+            document = PdfDocument.from_request(pdf_path=pdf_path, pdf_base64=pdf_base64)
+        self.document = document
+        source_pdf = document.source
 
         if _HAVE_FITZ:
             _log("[F2] Using PyMuPDF for parsing")
-            if pdf_base64:
-                data = base64.b64decode(pdf_base64)
-                doc = fitz.open(stream=data, filetype="pdf")
-            else:
-                if not (pdf_path and os.path.exists(pdf_path)):
-                    raise FileNotFoundError(f"PDF not found at path: {pdf_path}")
-                doc = fitz.open(pdf_path)
-
-            scan_pages = min(len(doc), self.max_pages)
-            pages = [doc.load_page(i) for i in range(scan_pages)]
-            pages_text = [pages[i].get_text("text") or "" for i in range(scan_pages)]
+            scan_pages = min(document.page_count, self.max_pages)
+            pages = [document.page(i) for i in range(scan_pages)]
+            pages_text = document.pages_text(scan_pages)
             meta = PdfMeta(project_id="", source_pdf=source_pdf, pages_scanned=scan_pages)
             _log(f"[F2] Loaded {scan_pages} pages from {source_pdf}")
             return meta, pages, pages_text
 
         # Fallback: try pdfminer text only
         _log("[F2] PyMuPDF not available; falling back to text-only extraction with pdfminer (if present)")
-        data_bytes: bytes
-        if pdf_base64:
-            data_bytes = base64.b64decode(pdf_base64)
-        else:
-            if not (pdf_path and os.path.exists(pdf_path)):
-                raise FileNotFoundError(f"PDF not found at path: {pdf_path}")
-            with open(pdf_path, "rb") as f:
-                data_bytes = f.read()
-
         pages_text: List[str] = []
         if _HAVE_PDFMINER:
             # pdfminer doesn't easily split per-page with the simple API; for determinism, extract all
-            text_all = pdfminer_extract_text(io.BytesIO(data_bytes))
+            text_all = pdfminer_extract_text(document.stream())
             # Approximate per-page split: just take first N chunks of equal length
             chunks = self._split_text_equal(text_all or "", self.max_pages)
             pages_text = chunks
@@ -119,6 +143,7 @@ class TakeoffEngine:
 
     # -------------------- DETECT SCALE --------------------
 
+    @timed("takeoff.detect_scale")
     def detect_scale(self, pages_text: List[str]) -> Dict[str, Any]:
         combined = "\n".join(pages_text or [])
         labels = find_scale_strings(combined)
@@ -144,39 +169,29 @@ class TakeoffEngine:
 
     # -------------------- GEOMETRY --------------------
 
+    @timed("takeoff.extract_geometry")
     def extract_geometry(self, pages: List[Any]) -> Dict[str, Any]:
         """
         Returns wall_lf (linear feet), slab_sf (square feet), and signals (list).
         Deterministic heuristics; clamps to >= 0.
+        With workers > 1 and enough pages, pages are sharded across a process pool
+        (each worker re-opens the document); per-page sums merge in page order.
         """
         signals: List[str] = []
-        wall_lf: float = 0.0
-        slab_sf: float = 0.0
 
         if _HAVE_FITZ and pages:
             try:
-                for p in pages:
-                    # Approximate: sum lengths of stroke line segments as "walls"
-                    drawings = p.get_drawings()
-                    for d in drawings:
-                        for item in d["items"]:
-                            itype = item[0]
-                            if itype == "l":  # line
-                                _, p1, p2 = item
-                                dx = float(p2.x - p1.x)
-                                dy = float(p2.y - p1.y)
-                                seg = (dx * dx + dy * dy) ** 0.5
-                                wall_lf += seg / 12.0  # convert points->inches->feet approx; heuristic
-                            elif itype == "re":  # rectangle path (proxy for slab regions)
-                                _, rect = item
-                                # approximate area in square feet
-                                slab_sf += (float(rect.width) * float(rect.height)) / (12.0 * 12.0)
-                signals.append("geometry:fitz:used")
-                _log(f"[F2] extract_geometry: wall_lf~{wall_lf:.2f} LF, slab_sf~{slab_sf:.2f} SF")
+                if self.document is not None and use_pool(len(pages), self.workers):
+                    source = self.document.path or self.document.data
+                    per_page = map_page_ranges(_geometry_page_range, source, len(pages), self.workers)
+                    signals.append("geometry:parallel")
+                else:
+                    per_page = [_page_geometry(p) for p in pages]
+                return self._geometry_totals(per_page, signals)
             except Exception as e:
                 _log(f"[F2] extract_geometry: error {e}; using deterministic fallback")
                 wall_lf, slab_sf = self._fallback_geom(len(pages))
-                signals.append("geometry:fallback")
+                signals = ["geometry:fallback"]
         else:
             wall_lf, slab_sf = self._fallback_geom(len(pages))
             signals.append("geometry:fallback")
@@ -187,6 +202,20 @@ class TakeoffEngine:
         slab_sf = max(0.0, slab_sf)
         return {"wall_lf": float(round(wall_lf, 2)), "slab_sf": float(round(slab_sf, 2)), "signals": signals}
 
+    @staticmethod
+    def _geometry_totals(per_page: List[Tuple[float, float]], signals: List[str]) -> Dict[str, Any]:
+        """Sum per-page (wall_lf, slab_sf) in page order into the extract_geometry result."""
+        wall_lf: float = 0.0
+        slab_sf: float = 0.0
+        for page_wall_lf, page_slab_sf in per_page:
+            wall_lf += page_wall_lf
+            slab_sf += page_slab_sf
+        signals.append("geometry:fitz:used")
+        _log(f"[F2] extract_geometry: wall_lf~{wall_lf:.2f} LF, slab_sf~{slab_sf:.2f} SF")
+        wall_lf = max(0.0, wall_lf)
+        slab_sf = max(0.0, slab_sf)
+        return {"wall_lf": float(round(wall_lf, 2)), "slab_sf": float(round(slab_sf, 2)), "signals": signals}
+
     @staticmethod
     def _fallback_geom(page_count: int) -> Tuple[float, float]:
         # Deterministic simple heuristics by page count
@@ -197,52 +226,28 @@ class TakeoffEngine:
 # -------------------- FIXTURE DETECTION (rules + keywords) --------------------
 
     def _load_rules(self) -> List[Dict[str, Any]]:
-        if _HAVE_YAML and self.rules_path.exists():
-            try:
-                with open(self.rules_path, "r", encoding="utf-8") as f:
-                    doc = yaml.safe_load(f) or {}
-                    rules = doc.get("rules", [])
-                    if isinstance(rules, list):
-                        return rules
-            except Exception:
-                pass
-        return []
+        return self._fixture_rules().rules
+
+    def _fixture_rules(self) -> FixtureRules:
+        """Compiled rules + keywords; recompiled only when the rules file changes."""
+        return get_fixture_rules(str(self.rules_path), self.FIXTURE_KEYWORDS)
 
     def detect_fixture_rules(self, text_blob: str) -> List[Dict[str, Any]]:
         """
-        Very simple regex-driven detection → list of {trade,item,unit,qty}.
-        First-match-wins per rule; multiple rules may match.
+        Regex-driven detection → list of {trade,item,unit,qty,count,pages,positions}.
+        One pass for all rules; qty scales with the number of matches.
         """
-        results: List[Dict[str, Any]] = []
-        rules = self._load_rules()
-        src = text_blob or ""
-        for rule in rules:
-            pat = rule.get("pattern")
-            if not pat:
-                continue
-            try:
-                if re.search(pat, src, flags=re.IGNORECASE):
-                    results.append({
-                        "trade": rule.get("trade", "misc"),
-                        "item": rule.get("item", "unknown"),
-                        "unit": str(rule.get("unit", "ea")).lower(),
-                        "qty": float(rule.get("qty", 1) or 0)
-                    })
-            except Exception:
-                # ignore bad patterns
-                continue
-        return results
+        return self._fixture_rules().scan([text_blob or ""])["rule_hits"]
 
 # -------------------- FIXTURE KEYWORDS --------------------
 
+    FIXTURE_KEYWORDS = ["fixtures", "toilet", "sink", "lav", "lavatory", "shower", "bath", "wh", "hose bibb"]
+
+    @timed("takeoff.detect_fixtures")
     def detect_fixtures(self, pages_text: List[str]) -> Dict[str, Any]:
-        blob = "\n".join(pages_text or [])
-        text = blob.lower()
-        keywords = ["fixtures", "toilet", "sink", "lav", "lavatory", "shower", "bath", "wh", "hose bibb"]
-        total = 0
-        for kw in keywords:
-            total += text.count(kw)
-        rule_hits = self.detect_fixture_rules(blob)
+        scan = self._fixture_rules().scan(pages_text or [])
+        total = scan["fixtures"]
+        rule_hits = scan["rule_hits"]
         signals = []
         if total > 0:
             signals.append("legend:fixtures:found")
@@ -253,23 +258,28 @@ class TakeoffEngine:
 
     # -------------------- LAYOUT STAGE (R2.1) --------------------
 
-    def detect_layout(self, pdf_path: str) -> Dict[str, Any]:
+    @timed("takeoff.detect_layout")
+    def detect_layout(self, pdf: Optional[PdfSource] = None) -> Dict[str, Any]:
         """
         Run layout analysis to detect title block, legend, and notes regions.
+        `pdf` is a path or PdfDocument; defaults to the document opened by load_pdf.
         Returns enriched metadata dict.
         """
+        if pdf is None:
+            pdf = self.document
         result = {
             "layout_detected": False,
             "scale": None,
             "sheet": None,
             "project": None,
             "legend_terms": [],
+            "notes": [],
             "signals": []
         }
 
         try:
             # Detect regions
-            regions_result = detect_regions(pdf_path)
+            regions_result = detect_regions(pdf)
             regions = regions_result.get("regions", {})
 
             if regions_result.get("error"):
@@ -277,10 +287,12 @@ class TakeoffEngine:
                 result["signals"].append("layout:error")
                 return result
 
+            # One text-extraction pass covers title block, legend and notes
+            texts = extract_region_texts(pdf, regions)
+
             # Extract and parse title block
             if "title_block" in regions:
-                bbox = regions["title_block"]
-                text = extract_text(pdf_path, bbox)
+                text = texts["title_block"]
                 if text.strip():
                     parsed = parse_titleblock(text)
                     result.update({
@@ -292,8 +304,7 @@ class TakeoffEngine:
 
             # Extract and parse legend
             if "legend" in regions:
-                bbox = regions["legend"]
-                text = extract_text(pdf_path, bbox)
+                text = texts["legend"]
                 if text.strip():
                     legend_items = parse_legend(text)
                     result["legend_terms"] = [item["desc"] for item in legend_items if item.get("desc")]
@@ -312,6 +323,14 @@ class TakeoffEngine:
                                 "source": "legend"
                             })
 
+            # Notes regions (general notes, schedules): kept as text for downstream parsing
+            notes = [t.strip() for t in texts.get("notes", []) if t.strip()]
+            if notes:
+                result["notes"] = notes
+                result["signals"].append("layout:notes:parsed")
+                if not result["scale"]:
+                    result["scale"] = parse_titleblock("\n".join(notes)).get("scale")
+
             if regions:
                 result["layout_detected"] = True
                 _log(f"[R2.1] detect_layout: found regions {list(regions.keys())}")
@@ -322,15 +341,156 @@ class TakeoffEngine:
 
         return result
 
+    # -------------------- ROOMS STAGE (R2.2) --------------------
+
+    @timed("takeoff.detect_rooms")
+    def detect_rooms(self, document: Optional[PdfDocument] = None) -> Dict[str, Any]:
+        """
+        Room labels on the first max_pages pages (see blueprint_parsers/room_labels.py).
+        `document` defaults to the document opened by load_pdf.
+        Returns {rooms: [{type, label, page}], room_count, by_type, signals}.
+        """
+        if document is None:
+            document = self.document
+        result: Dict[str, Any] = {"rooms": [], "room_count": 0, "by_type": {}, "signals": []}
+        try:
+            if document is None:
+                raise ValueError("no document loaded")
+            result.update(find_rooms(document.pages_text(self.max_pages)))
+            result["signals"].append("rooms:labels:found" if result["room_count"] else "rooms:none")
+            _log(f"[R2.2] detect_rooms: rooms={result['room_count']} by_type={result['by_type']}")
+        except Exception as e:
+            _log(f"[R2.2] detect_rooms: exception {e}")
+            result["signals"].append("rooms:exception")
+        return result
+
+    # -------------------- STAGE RUNNER (cached) --------------------
+
+    def cache_settings(self, enable_layout: bool = False, enable_rooms: bool = False) -> Dict[str, Any]:
+        """Everything besides the PDF bytes that changes the stage outputs."""
+        return {
+            "max_pages": self.max_pages,
+            "fixtures_rules_sha256": file_digest(self.rules_path),
+            "layout": bool(enable_layout),
+            "rooms": bool(enable_rooms),
+        }
+
+    def run_stages(self,
+                   document: PdfDocument,
+                   enable_layout: bool = False,
+                   enable_rooms: bool = False,
+                   cache: Optional[TakeoffCache] = None) -> Tuple[PdfMeta, Dict[str, Any]]:
+        """
+        Run load -> scale -> geometry -> fixtures (-> layout -> rooms) over one document.
+        Returns (pdf_meta, stages) where stages = {pages_scanned, scale, geom, fixtures, layout, rooms}.
+        With a cache, outputs are keyed by the PDF digest + cache_settings() and reused on repeat uploads.
+        """
+        def compute() -> Dict[str, Any]:
+            meta, pages, pages_text = self.load_pdf(document=document)
+            return {
+                "pages_scanned": meta.pages_scanned,
+                "scale": self.detect_scale(pages_text),
+                "geom": self.extract_geometry(pages),
+                "fixtures": self.detect_fixtures(pages_text),
+                "layout": self.detect_layout(document) if enable_layout else None,
+                "rooms": self.detect_rooms(document) if enable_rooms else None,
+            }
+
+        if cache is None:
+            stages = compute()
+        else:
+            key = cache.key(document.sha256, "takeoff", self.cache_settings(enable_layout, enable_rooms))
+            stages, hit = cache.get_or_compute(key, compute)
+            _log(f"[F2] run_stages: cache {'hit' if hit else 'miss'} key={key[:12]}")
+
+        meta = PdfMeta(project_id="", source_pdf=document.source, pages_scanned=int(stages.get("pages_scanned") or 0))
+        return meta, stages
+
+    def iter_stages(self,
+                    document: PdfDocument,
+                    enable_layout: bool = False,
+                    enable_rooms: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming form of run_stages. Pages are loaded lazily and yielded as they finish:
+          ("start", {pages_total, pages_scanned, source_pdf})
+          ("page",  {page, scale, geometry, fixtures})   one per scanned page
+          ("layout", {...}) / ("rooms", {...})          when enabled
+          ("stages", stages)                           same shape as run_stages
+        Document-level scale/fixture results are rebuilt from the page texts (cheap);
+        geometry is the page-order sum of the per-page measurements.
+        """
+        _log("[F2] TakeoffEngine.iter_stages: start")
+        self.document = document
+        if not _HAVE_FITZ:
+            # Text-only fallback has no per-page objects; one pass, then the aggregate
+            meta, pages, pages_text = self.load_pdf(document=document)
+            scan_pages = meta.pages_scanned
+            pages_total = scan_pages
+        else:
+            pages_total = document.page_count
+            scan_pages = min(pages_total, self.max_pages)
+            pages_text = []
+        yield "start", {"pages_total": pages_total, "pages_scanned": scan_pages, "source_pdf": document.source}
+
+        per_page: List[Tuple[float, float]] = []
+        geometry_ok = _HAVE_FITZ
+        for i in range(scan_pages):
+            if _HAVE_FITZ:
+                text = document.page_text(i)
+                pages_text.append(text)
+                try:
+                    page_geom = _page_geometry(document.page(i))
+                except Exception as e:
+                    _log(f"[F2] iter_stages: page {i + 1} geometry error {e}")
+                    geometry_ok = False
+                    page_geom = self._fallback_geom(1)
+            else:
+                text = pages_text[i]
+                page_geom = (0.0, 0.0)
+            per_page.append(page_geom)
+            labels = find_scale_strings(text)
+            norm = normalize_scale(labels[0]) if labels else {}
+            yield "page", {
+                "page": i + 1,
+                "scale": {"scale_label": norm.get("label"), "ratio": norm.get("ratio")},
+                "geometry": {"wall_lf": float(round(page_geom[0], 2)), "slab_sf": float(round(page_geom[1], 2))},
+                "fixtures": self._fixture_rules().scan([text], first_page=i + 1),
+            }
+
+        if geometry_ok and per_page:
+            geom = self._geometry_totals(per_page, [])
+        else:
+            wall_lf, slab_sf = self._fallback_geom(scan_pages if _HAVE_FITZ else 0)
+            geom = {"wall_lf": float(round(wall_lf, 2)), "slab_sf": float(round(slab_sf, 2)),
+                    "signals": ["geometry:fallback"]}
+
+        layout = self.detect_layout(document) if enable_layout else None
+        if layout is not None:
+            yield "layout", layout
+        rooms = self.detect_rooms(document) if enable_rooms else None
+        if rooms is not None:
+            yield "rooms", rooms
+
+        yield "stages", {
+            "pages_scanned": scan_pages,
+            "scale": self.detect_scale(pages_text),
+            "geom": geom,
+            "fixtures": self.detect_fixtures(pages_text),
+            "layout": layout,
+            "rooms": rooms,
+        }
+
     # -------------------- QUANTITIES BUILDER --------------------
 
+    @timed("takeoff.to_quantities")
     def to_quantities(self,
                       project_id: str,
                       pdf_meta: PdfMeta,
                       geom: Dict[str, Any],
                       fixtures: Dict[str, Any],
                       scale: Dict[str, Any],
-                      layout: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                      layout: Optional[Dict[str, Any]] = None,
+                      rooms: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Build a v0-conformant trade quantities structure.
         Units must be lower-case to satisfy the v0 schema.
@@ -364,7 +524,8 @@ class TakeoffEngine:
                     "description": "Fixture (rule match)",
                     "unit": str(hit.get("unit", "ea")).lower(),
                     "quantity": float(hit.get("qty", 1) or 0),
-                    "notes": f"Detected by fixtures.rules: {hit.get('trade','plumbing')}/{hit.get('item','')}"
+                    "notes": (f"Detected by fixtures.rules: {hit.get('trade','plumbing')}/{hit.get('item','')}"
+                              + (f"; pages={','.join(str(p) for p in hit['pages'])}" if hit.get("pages") else ""))
                 })
             except Exception:
                 continue
@@ -390,6 +551,8 @@ class TakeoffEngine:
         signals.extend(fixtures.get("signals", []))
         if layout:
             signals.extend(layout.get("signals", []))
+        if rooms:
+            signals.extend(rooms.get("signals", []))
         if "scale:assumed" in signals:
             meta_notes.append("scale:assumed")
 